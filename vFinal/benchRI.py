@@ -0,0 +1,845 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+###############################
+###########SYNOPSIS############
+###############################
+#
+# Auteurs : Sotiria BAMPATZANI
+#           Morgane DEHARENG
+#
+# But : mesures de performance du moteur de recherche sur des corpus français synthétiques
+#       (débit d'indexation, taille de l'index, mémoire maximale, latence des requêtes)
+#
+# Usage : python3 benchRI.py run [--tailles 100 10000 1000000] [--dossier DOSSIER] [--sortie DOSSIER] [--memoire MO]
+#         python3 benchRI.py startup [--budget MS]
+#         python3 benchRI.py repair [--regles 10 100 1000 10000] [--type texte|motif]
+#         python3 benchRI.py matrix [--taille N] [--requetes N] [--ranking bm25]
+#         python3 benchRI.py tokenize [--taille N | --corpus DOSSIER]
+#         python3 benchRI.py backends [--taille N] [--lemmatizers spacy snowball lefff none] [--reference spacy]
+#         python3 benchRI.py generate --taille N --dossier DOSSIER
+#         python3 benchRI.py compare AVANT.json APRES.json
+#
+# Résultats : un fichier JSON par exécution dans le dossier de sortie (bench-AAAAMMJJ-HHMMSS.json),
+#             comparables entre eux avec la commande compare
+###############################
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import collections
+import platform
+import argparse
+import subprocess
+import requeteRI
+import reparationRI
+
+# tailles de corpus mesurées par défaut
+SIZES = (100, 10000, 1000000)
+# types de requêtes dont on mesure la latence
+QUERY_KINDS = ('simple', 'booleenne', 'phrase')
+# modules coûteux à importer, qui ne doivent pas l'être par une recherche dont les termes sont dans le cache
+HEAVY_MODULES = ('spacy', 'fr_core_news_sm', 'nltk', 'multiprocessing', 'numpy', 'scipy')
+# normalisations des tokens comparées par la commande backends, celles de moteurRI.LEMMATIZERS
+BACKENDS = ('spacy', 'snowball', 'lefff', 'none')
+
+MOTEUR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'moteurRI.py')
+
+# vocabulaire de base, complété par des mots synthétiques pour les termes rares
+WORDS = '''autobus chapeau cou pardessus bouton voyageur plateforme gare place jeune homme ami tresse galon
+ficelle voisin heure midi jour rue ligne arrêt ville Saint-Lazare côté conversation temps personne fois
+querelle siège monde regard nez lieu voiture porte passage foule histoire chose mot phrase style récit
+exercice lettre ton parole moment retour fin début main tête pied dos oeil coup pas bruit silence vent
+soleil pluie ciel nuit soir matin semaine année été hiver printemps automne route chemin pont quai
+monter descendre marcher courir voir regarder parler dire répondre demander penser croire savoir vouloir
+pouvoir devoir prendre donner rendre mettre tenir venir partir arriver rester passer tomber porter pousser
+marcher bousculer reprocher accuser plaindre remarquer conseiller ajouter rencontrer reconnaître rire
+grand petit long court haut bas vieux nouveau beau laid mou dur rouge bleu vert noir blanc gris étroit
+large lent rapide plein vide doux fort faible ridicule curieux étrange simple clair sombre chaud froid
+'''.split()
+# mots vides courants, pour que la suppression des mots vides ait du travail
+STOPWORDS = '''le la les de des du un une et à au aux en dans sur sous par pour avec sans il elle ils on nous
+vous je tu se ce cette ces son sa ses leur qui que quoi dont où mais ou donc car ne pas plus est était a'''.split()
+SYLLABLES = '''ba be bi bo bu ca ce ci co cu da de di do du fa fe fi fo fu ga ge gi go gu la le li lo lu
+ma me mi mo mu na ne ni no nu pa pe pi po pu ra re ri ro ru sa se si so su ta te ti to tu va ve vi vo vu
+tion ment eur ette ier oir'''.split()
+
+def buildVocabulary(size, rng):
+    '''
+    Construction du vocabulaire du corpus synthétique, les mots réels en tête (les plus fréquents)
+    :param size: Le nombre de mots du vocabulaire
+    :param rng: Le générateur aléatoire
+    :return: La liste des mots, triée par fréquence décroissante
+    :rtype: List
+    '''
+    vocabulary = list(dict.fromkeys(WORDS))
+    known = set(vocabulary)
+    while len(vocabulary) < size:
+        word = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in known:
+            known.add(word)
+            vocabulary.append(word)
+    return vocabulary[:size]
+
+def zipfWeights(size):
+    '''
+    Poids cumulés d'une loi de Zipf, pour tirer des mots avec random.choices
+    :param size: Le nombre de mots
+    :rtype: List
+    '''
+    total = 0.0
+    weights = list()
+    for rank in range(1, size + 1):
+        total += 1.0 / rank
+        weights.append(total)
+    return weights
+
+def generateText(rng, vocabulary, weights, nWords):
+    '''
+    Génération du corps d'un document : des phrases de mots tirés selon la loi de Zipf, entrecoupés de mots vides,
+    avec quelques élisions et guillemets comme dans les Exercices de style
+    :param rng: Le générateur aléatoire
+    :param vocabulary: Le vocabulaire
+    :param weights: Les poids cumulés du vocabulaire
+    :param nWords: Le nombre approximatif de mots
+    :rtype: String
+    '''
+    words = rng.choices(vocabulary, cum_weights=weights, k=nWords)
+    sentences = list()
+    start = 0
+    while start < nWords:
+        end = min(nWords, start + rng.randint(6, 15))
+        sentence = list()
+        for word in words[start:end]:
+            if rng.random() < 0.4:
+                sentence.append(rng.choice(STOPWORDS))
+            if rng.random() < 0.05 and word[0] in 'aeiouéè':
+                word = "l'" + word
+            sentence.append(word)
+        if rng.random() < 0.1:
+            sentence[0] = '« ' + sentence[0]
+            sentence[-1] += ' »'
+        text = ' '.join(sentence)
+        sentences.append(text[0].upper() + text[1:] + rng.choice('...!?'))
+        start = end
+    return ' '.join(sentences)
+
+def generateCorpus(path, nDocs, seed=0, wordsPerDoc=150):
+    '''
+    Génération d'un corpus synthétique organisé comme ExercicesDeStyle : un sous-dossier _txt de fichiers
+    exerciceN.txt dont la première ligne est "N. Titre" ; un corpus déjà généré avec les mêmes paramètres est réutilisé
+    :param path: Le dossier du corpus
+    :param nDocs: Le nombre de documents
+    :param seed: La graine du générateur aléatoire
+    :param wordsPerDoc: Le nombre moyen de mots par document
+    :return: Le nombre total d'octets du corpus
+    :rtype: int
+    '''
+    manifestPath = os.path.join(path, 'corpus.json')
+    manifest = {'documents': nDocs, 'graine': seed, 'motsParDocument': wordsPerDoc}
+    try:
+        with open(manifestPath, encoding='utf-8') as f:
+            previous = json.load(f)
+        if {key: previous.get(key) for key in manifest} == manifest:
+            return previous['octets']
+    except FileNotFoundError:
+        pass
+
+    rng = random.Random(seed)
+    # le vocabulaire croît avec le corpus, comme le prévoit la loi de Heaps
+    vocabulary = buildVocabulary(max(len(WORDS), int(30 * (nDocs * wordsPerDoc) ** 0.5)), rng)
+    weights = zipfWeights(len(vocabulary))
+    os.makedirs(os.path.join(path, '_txt'), exist_ok=True)
+    nBytes = 0
+    for docNo in range(1, nDocs + 1):
+        title = ' '.join(rng.choices(vocabulary[:200], k=rng.randint(1, 2))).capitalize()
+        body = generateText(rng, vocabulary, weights, max(10, int(rng.gauss(wordsPerDoc, wordsPerDoc / 4))))
+        content = '%d. %s\n%s\n' % (docNo, title, body)
+        with open(os.path.join(path, '_txt', 'exercice%d.txt' % docNo), 'w', encoding='utf-8') as f:
+            f.write(content)
+        nBytes += len(content.encode('utf-8'))
+    manifest['octets'] = nBytes
+    with open(manifestPath, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    return nBytes
+
+def runMeasured(command, log):
+    '''
+    Exécution d'une commande dans un processus fils, avec mesure de sa durée et de sa mémoire maximale
+    :param command: La commande et ses arguments
+    :param log: Le fichier recevant la sortie de la commande
+    :return: La durée en secondes, la mémoire maximale (RSS) en kilo-octets (None si inconnue) et la sortie standard
+    :rtype: tuple
+    '''
+    start = time.perf_counter()
+    with open(log, 'w', encoding='utf-8') as errors:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors)
+        output = process.stdout.read()
+        process.stdout.close()
+        if hasattr(os, 'wait4'):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            peakRss = usage.ru_maxrss
+            # macOS donne ru_maxrss en octets, Linux en kilo-octets
+            if sys.platform == 'darwin':
+                peakRss //= 1024
+        else:
+            # Windows : pas de mesure de la mémoire maximale des processus fils
+            process.wait()
+            peakRss = None
+    elapsed = time.perf_counter() - start
+    if process.returncode:
+        raise RuntimeError("Échec de %s (code %d), voir %s" % (' '.join(command), process.returncode, log))
+    return elapsed, peakRss, output.decode('utf-8')
+
+def directorySize(path):
+    '''
+    Taille totale des fichiers d'un dossier et de ses sous-dossiers
+    :param path: Le dossier
+    :return: La taille en octets
+    :rtype: int
+    '''
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+def percentile(values, p):
+    '''
+    Percentile d'une liste de mesures (méthode du rang le plus proche)
+    :param values: La liste triée des mesures
+    :param p: Le percentile, entre 0 et 100
+    :rtype: float
+    '''
+    if not values:
+        return None
+    rank = max(0, min(len(values) - 1, int(round(p / 100.0 * len(values) + 0.5)) - 1))
+    return values[rank]
+
+def makeQueries(corpus, nQueries, seed=0):
+    '''
+    Tirage des requêtes de chaque type à partir de documents du corpus, pour qu'elles aient des résultats
+    :param corpus: Le dossier du corpus
+    :param nQueries: Le nombre de requêtes de chaque type
+    :param seed: La graine du générateur aléatoire
+    :return: Les requêtes {type: [requêtes]}
+    :rtype: dict
+    '''
+    import moteurRI
+    rng = random.Random(seed)
+    documents = moteurRI.listDocuments(corpus)
+    queries = {kind: list() for kind in QUERY_KINDS}
+    while len(queries['phrase']) < nQueries:
+        f = moteurRI.openFile(rng.choice(documents))
+        moteurRI.extractTitle(f)
+        tokens = moteurRI.removeStopwords(moteurRI.normalizeFile(f))
+        f.close()
+        if len(tokens) < 4:
+            continue
+        queries['simple'].append(rng.choice(tokens))
+        a, b, c, d = rng.sample(tokens, 4)
+        queries['booleenne'].append(rng.choice(['%s AND (%s OR %s) NOT %s' % (a, b, c, d),
+                                                 '+%s +%s -%s' % (a, b, d), '%s %s %s' % (a, b, c)]))
+        start = rng.randrange(len(tokens) - 2)
+        queries['phrase'].append('"%s"' % ' '.join(tokens[start:start + rng.randint(2, 3)]))
+    return queries
+
+def indexLemmatizer(diskIndex):
+    '''
+    Lemmatiseur des requêtes d'un index : sa normalisation et son cache des lemmes
+    :param diskIndex: L'index ouvert avec moteurRI.loadIndex
+    :rtype: moteurRI.Lemmatizer
+    '''
+    import moteurRI
+    backend = moteurRI.queryBackend(diskIndex)
+    cache = moteurRI.LemmaCache.load(moteurRI.lemmaCachePath(diskIndex.path, backend))
+    return moteurRI.Lemmatizer(cache=cache, backend=backend)
+
+def measureQueries(index, queries, ranking='bm25', warmup=10):
+    '''
+    Mesure de la latence des requêtes sur un index, dans le processus courant
+    :param index: Le dossier de l'index
+    :param queries: Les requêtes {type: [requêtes]}
+    :param ranking: Le modèle de classement
+    :param warmup: Le nombre de requêtes de chaque type exécutées avant les mesures
+    :return: Les latences {type: {'n', 'p50Ms', 'p99Ms', 'moyenneMs', 'requetesParSeconde'}}
+    :rtype: dict
+    '''
+    import moteurRI
+    diskIndex = moteurRI.loadIndex(index)
+    lemmatizer = indexLemmatizer(diskIndex)
+    results = dict()
+    with diskIndex:
+        for kind, kindQueries in queries.items():
+            for query in kindQueries[:warmup]:
+                moteurRI.answerQuery(query, diskIndex, lemmatizer, ranking)
+            latencies = list()
+            for query in kindQueries:
+                start = time.perf_counter()
+                moteurRI.answerQuery(query, diskIndex, lemmatizer, ranking)
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            total = sum(latencies)
+            results[kind] = {
+                'n': len(latencies),
+                'p50Ms': percentile(latencies, 50) * 1000,
+                'p99Ms': percentile(latencies, 99) * 1000,
+                'moyenneMs': total / len(latencies) * 1000,
+                'requetesParSeconde': len(latencies) / total if total else None,
+            }
+    return results
+
+def benchSize(nDocs, args):
+    '''
+    Mesures complètes pour une taille de corpus : génération, indexation dans un processus fils,
+    puis latence des requêtes dans un autre processus fils
+    :param nDocs: Le nombre de documents du corpus
+    :param args: Les arguments de la ligne de commande
+    :return: Les mesures
+    :rtype: dict
+    '''
+    corpus = os.path.join(args.dossier, 'corpus-%d' % nDocs)
+    index = os.path.join(args.dossier, 'index-%d' % nDocs)
+    print("Corpus de %d documents : %s" % (nDocs, corpus))
+    nBytes = generateCorpus(corpus, nDocs, args.graine)
+
+    command = [sys.executable, MOTEUR, 'index', '--corpus', corpus, '--index', index, '--full', '--positions',
+               '--workers', str(args.workers)]
+    if args.memoire:
+        command += ['--memoire', str(args.memoire)]
+    elapsed, peakRss, _ = runMeasured(command, os.path.join(args.dossier, 'index-%d.log' % nDocs))
+    with open(os.path.join(index, 'index.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    result = {
+        'documents': nDocs,
+        'corpusOctets': nBytes,
+        'indexation': {
+            'secondes': elapsed,
+            'documentsParSeconde': nDocs / elapsed,
+            'megaOctetsParSeconde': nBytes / elapsed / 1e6,
+            'rssMaxKo': peakRss,
+            'workers': args.workers,
+            'memoireMo': args.memoire,
+        },
+        'index': {
+            'octets': directorySize(os.path.join(index, meta['dossier'])),
+            'termes': meta['termes'],
+            'postings': meta['postings'],
+        },
+    }
+    result['index']['octetsParDocument'] = result['index']['octets'] / nDocs
+    print("  indexation : %.1f s, %.1f documents/s, RSS max %s Ko, index %d octets"
+          % (elapsed, nDocs / elapsed, peakRss, result['index']['octets']))
+
+    command = [sys.executable, os.path.abspath(__file__), 'queries', '--corpus', corpus, '--index', index,
+               '--requetes', str(args.requetes), '--graine', str(args.graine), '--ranking', args.ranking]
+    _, peakRss, output = runMeasured(command, os.path.join(args.dossier, 'requetes-%d.log' % nDocs))
+    result['requetes'] = json.loads(output)
+    result['requetes']['rssMaxKo'] = peakRss
+    for kind in QUERY_KINDS:
+        latency = result['requetes'][kind]
+        print("  requêtes %-9s : p50 %.3f ms, p99 %.3f ms" % (kind, latency['p50Ms'], latency['p99Ms']))
+    return result
+
+def gitRevision():
+    '''
+    Révision git de l'arbre mesuré
+    :return: Le hash du commit courant, None hors d'un dépôt git
+    :rtype: String
+    '''
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(MOTEUR),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def commandRun(args):
+    '''
+    Commande "run" : mesures pour chaque taille de corpus et sauvegarde des résultats en JSON
+    :param args: Les arguments de la ligne de commande
+    '''
+    os.makedirs(args.dossier, exist_ok=True)
+    os.makedirs(args.sortie, exist_ok=True)
+    report = {
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': gitRevision(),
+        'machine': {'python': platform.python_version(), 'plateforme': platform.platform(),
+                    'processeurs': os.cpu_count()},
+        'parametres': {'graine': args.graine, 'requetes': args.requetes, 'ranking': args.ranking},
+        'tailles': [benchSize(nDocs, args) for nDocs in args.tailles],
+    }
+    path = os.path.join(args.sortie, time.strftime('bench-%Y%m%d-%H%M%S.json'))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print("Résultats :", path)
+    return 0
+
+def commandQueries(args):
+    '''
+    Commande "queries" (interne) : mesure de la latence des requêtes, résultats en JSON sur la sortie standard
+    :param args: Les arguments de la ligne de commande
+    '''
+    queries = makeQueries(args.corpus, args.requetes, args.graine)
+    json.dump(measureQueries(args.index, queries, args.ranking), sys.stdout)
+    return 0
+
+def importProfile(command):
+    '''
+    Modules importés par une commande Python, avec leur durée d'import (option -X importtime)
+    :param command: Les arguments de la commande, après l'interpréteur
+    :return: Les durées cumulées d'import en microsecondes {module de premier niveau: durée}
+    :rtype: dict
+    '''
+    completed = subprocess.run([sys.executable, '-X', 'importtime'] + command, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.PIPE, check=True)
+    modules = dict()
+    for line in completed.stderr.decode('utf-8', 'replace').splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+def timeCommand(command, repeat):
+    '''
+    Durées d'exécution d'une commande Python lancée plusieurs fois, après une exécution de chauffe
+    :param command: Les arguments de la commande, après l'interpréteur
+    :param repeat: Le nombre d'exécutions mesurées
+    :return: La liste triée des durées en secondes
+    :rtype: List
+    '''
+    timings = list()
+    for i in range(repeat + 1):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        if i:
+            timings.append(time.perf_counter() - start)
+    return sorted(timings)
+
+def commandStartup(args):
+    '''
+    Commande "startup" : durée de démarrage de l'aide et d'une recherche sur un index déjà construit,
+    comparée au budget ; échoue si le budget est dépassé ou si la recherche importe la pile NLP
+    :param args: Les arguments de la ligne de commande
+    '''
+    corpus = os.path.join(args.dossier, 'corpus-%d' % args.taille)
+    index = os.path.join(args.dossier, 'index-demarrage-%d' % args.taille)
+    os.makedirs(args.dossier, exist_ok=True)
+    generateCorpus(corpus, args.taille, args.graine)
+    # l'indexation remplit le cache des lemmes : les termes de la requête y sont tous
+    runMeasured([sys.executable, MOTEUR, 'index', '--corpus', corpus, '--index', index],
+                os.path.join(args.dossier, 'index-demarrage.log'))
+    term = makeQueries(corpus, 1, args.graine)['simple'][0]
+
+    commands = {
+        'aide': [MOTEUR, '--help'],
+        'search': [MOTEUR, 'search', '--index', index, '--ranking', 'bm25', term],
+    }
+    report = {'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'revision': gitRevision(), 'budgetMs': args.budget,
+              'commandes': dict()}
+    status = 0
+    for name, command in commands.items():
+        timings = timeCommand(command, args.repetitions)
+        modules = importProfile(command)
+        heavy = sorted(module for module in modules if module.split('.')[0] in HEAVY_MODULES)
+        slowest = sorted(modules.items(), key=lambda item: -item[1])[:5]
+        median = percentile(timings, 50) * 1000
+        report['commandes'][name] = {'medianeMs': median, 'minMs': timings[0] * 1000,
+                                     'maxMs': timings[-1] * 1000, 'modulesLourds': heavy,
+                                     'importsLesPlusLentsMs': {module: us / 1000 for module, us in slowest}}
+        print("%-7s : médiane %.1f ms (min %.1f, max %.1f) - imports les plus lents : %s"
+              % (name, median, timings[0] * 1000, timings[-1] * 1000,
+                 ", ".join("%s %.1f ms" % (module, us / 1000) for module, us in slowest)))
+        if heavy:
+            print("          modules lourds importés :", ", ".join(heavy))
+            status = 1
+        if median > args.budget:
+            print("          budget de %.0f ms dépassé" % args.budget)
+            status = 1
+
+    os.makedirs(args.sortie, exist_ok=True)
+    path = os.path.join(args.sortie, time.strftime('demarrage-%Y%m%d-%H%M%S.json'))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print("Résultats :", path)
+    return status
+
+def commandRepair(args):
+    '''
+    Commande "repair" : débit de la réparation des documents selon le nombre de règles littérales (ou de motifs
+    à début fixe avec --type motif), qui doit rester à peu près constant grâce à leur compilation en arbre préfixe
+    :param args: Les arguments de la ligne de commande
+    '''
+    rng = random.Random(args.graine)
+    vocabulary = buildVocabulary(20000 + max(args.regles), rng)
+    weights = zipfWeights(20000)
+    text = generateText(rng, vocabulary[:20000], weights, args.mots)
+    nBytes = len(text.encode('utf-8'))
+    # dix règles corrigent des mots du texte, les autres des mots absents : le nombre de remplacements
+    # est le même pour toutes les mesures, seul le nombre de règles change
+    candidates = vocabulary[len(WORDS):len(WORDS) + 10] + vocabulary[20000:]
+    report = {'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'revision': gitRevision(), 'octets': nBytes,
+              'type': args.type, 'regles': dict()}
+    for nRules in args.regles:
+        if args.type == 'motif':
+            # le mot suivi d'une lettre en trop, comme les règles d'exercice73!.txt
+            rules = [{'motif': r'\b' + re.escape(word[:-1]) + r'\w\b', 'remplacement': word.upper()}
+                     for word in candidates[:nRules]]
+        else:
+            rules = [{'texte': word, 'remplacement': word.upper()} for word in candidates[:nRules]]
+        rules = reparationRI.RepairRules(rules)
+        repairer = rules.repairer('exercice1.txt')
+        timings = list()
+        for _ in range(args.repetitions):
+            start = time.perf_counter()
+            repairer.repair(text)
+            timings.append(time.perf_counter() - start)
+        median = percentile(sorted(timings), 50)
+        report['regles'][str(nRules)] = {'medianeMs': median * 1000, 'moParSeconde': nBytes / median / 1e6}
+        print("%6d règle(s) : médiane %.2f ms, %.1f Mo/s" % (nRules, median * 1000, nBytes / median / 1e6))
+
+    os.makedirs(args.sortie, exist_ok=True)
+    path = os.path.join(args.sortie, time.strftime('reparation-%Y%m%d-%H%M%S.json'))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print("Résultats :", path)
+    return 0
+
+def commandMatrix(args):
+    '''
+    Commande "matrix" : débit du classement d'un lot de requêtes, une à une par requeteRI puis toutes ensemble
+    sur la matrice termes-documents (moteurRI.py batch --matrice) ; échoue si les résultats diffèrent
+    :param args: Les arguments de la ligne de commande
+    '''
+    import moteurRI
+    import matriceRI
+    corpus = os.path.join(args.dossier, 'corpus-%d' % args.taille)
+    index = os.path.join(args.dossier, 'index-matrice-%d' % args.taille)
+    os.makedirs(args.dossier, exist_ok=True)
+    generateCorpus(corpus, args.taille, args.graine)
+    runMeasured([sys.executable, MOTEUR, 'index', '--corpus', corpus, '--index', index],
+                os.path.join(args.dossier, 'index-matrice.log'))
+    queries = makeQueries(corpus, args.requetes, args.graine)
+    queries = queries['simple'] + queries['booleenne']
+
+    with moteurRI.loadIndex(index) as diskIndex:
+        lemmatizer = indexLemmatizer(diskIndex)
+        # l'analyse des requêtes est commune aux deux mesures
+        tokenizer = moteurRI.queryTokenizer(diskIndex)
+        plans = [moteurRI.word2index(query, lemmatizer, tokenizer=tokenizer).expand(diskIndex) for query in queries]
+        start = time.perf_counter()
+        expected = [moteurRI.rankedSearch(plan, diskIndex, args.top, args.ranking) for plan in plans]
+        engine = time.perf_counter() - start
+        start = time.perf_counter()
+        matrix = matriceRI.MatrixIndex(diskIndex)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        results = matrix.rankBatch(plans, args.top, args.ranking)
+        batch = time.perf_counter() - start
+
+    nDiffer = sum(1 for result, reference in zip(results, expected) if result is not None and result != reference)
+    nVectorized = sum(1 for result in results if result is not None)
+    report = {'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'revision': gitRevision(), 'documents': args.taille,
+              'requetes': len(plans), 'vectorisees': nVectorized, 'differences': nDiffer, 'ranking': args.ranking,
+              'top': args.top, 'postings': matrix.nPostings,
+              'requeteRI': {'secondes': engine, 'requetesParSeconde': len(plans) / engine},
+              'matrice': {'constructionSecondes': build, 'secondes': batch,
+                          'requetesParSeconde': nVectorized / batch if batch else None}}
+    print("requeteRI : %d requêtes en %.3f s, %.1f requêtes/s" % (len(plans), engine, len(plans) / engine))
+    print("matrice   : construction %.3f s, %d requêtes en %.3f s, %.1f requêtes/s"
+          % (build, nVectorized, batch, nVectorized / batch if batch else 0.0))
+    if nDiffer:
+        print("          %d requête(s) aux résultats différents" % nDiffer)
+
+    os.makedirs(args.sortie, exist_ok=True)
+    path = os.path.join(args.sortie, time.strftime('matrice-%Y%m%d-%H%M%S.json'))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print("Résultats :", path)
+    return 1 if nDiffer else 0
+
+def commandTokenize(args):
+    '''
+    Commande "tokenize" : débit en tokens par seconde des deux découpages de moteurRI.removeStopwords (nltk et regex)
+    et accord entre eux sur le corpus ; échoue si un token produit par nltk manque au découpage regex,
+    qui peut seulement en produire davantage en détachant les élisions (l'homme -> homme)
+    :param args: Les arguments de la ligne de commande
+    '''
+    import moteurRI
+    corpus = args.corpus
+    if corpus is None:
+        corpus = os.path.join(args.dossier, 'corpus-%d' % args.taille)
+        generateCorpus(corpus, args.taille, args.graine)
+    texts = list()
+    for filename in moteurRI.listDocuments(corpus):
+        with moteurRI.openFile(filename) as f:
+            moteurRI.extractTitle(f)
+            texts.append(moteurRI.normalizeFile(f))
+    nBytes = sum(len(text.encode('utf-8')) for text in texts)
+    # chargement des mots vides hors des mesures
+    moteurRI.stopWords()
+
+    report = {'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'revision': gitRevision(), 'corpus': corpus,
+              'documents': len(texts), 'octets': nBytes, 'tokenizers': dict()}
+    tokens = dict()
+    for tokenizer in moteurRI.TOKENIZERS:
+        timings = list()
+        for _ in range(args.repetitions):
+            start = time.perf_counter()
+            tokens[tokenizer] = [moteurRI.removeStopwords(text, tokenizer=tokenizer) for text in texts]
+            timings.append(time.perf_counter() - start)
+        median = percentile(sorted(timings), 50)
+        nTokens = sum(len(listWords) for listWords in tokens[tokenizer])
+        report['tokenizers'][tokenizer] = {'tokens': nTokens, 'medianeMs': median * 1000,
+                                           'tokensParSeconde': nTokens / median, 'moParSeconde': nBytes / median / 1e6}
+        print("%-5s : %d tokens, médiane %.1f ms, %.0f tokens/s, %.1f Mo/s"
+              % (tokenizer, nTokens, median * 1000, nTokens / median, nBytes / median / 1e6))
+
+    missing = collections.Counter()
+    extra = collections.Counter()
+    nSame = 0
+    for reference, fast in zip(tokens['nltk'], tokens['regex']):
+        nSame += reference == fast
+        referenceCounts, fastCounts = collections.Counter(reference), collections.Counter(fast)
+        missing += referenceCounts - fastCounts
+        extra += fastCounts - referenceCounts
+    report['accord'] = {'documentsIdentiques': nSame, 'tokensManquants': sum(missing.values()),
+                        'tokensEnPlus': sum(extra.values()), 'manquantsFrequents': dict(missing.most_common(20)),
+                        'enPlusFrequents': dict(extra.most_common(20))}
+    print("accord : %d/%d documents identiques, %d token(s) nltk manquant(s), %d token(s) en plus (élisions)"
+          % (nSame, len(texts), sum(missing.values()), sum(extra.values())))
+    if missing:
+        print("          manquants :", ", ".join("%s (%d)" % item for item in missing.most_common(10)))
+
+    os.makedirs(args.sortie, exist_ok=True)
+    path = os.path.join(args.sortie, time.strftime('tokenisation-%Y%m%d-%H%M%S.json'))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print("Résultats :", path)
+    return 1 if missing else 0
+
+def commandBackends(args):
+    '''
+    Commande "backends" : durée de construction de l'index et recouvrement des résultats selon la normalisation
+    des tokens (moteurRI.py index --lemmatizer) ; les k premiers documents de chaque requête sont comparés à ceux
+    de la normalisation de référence, une normalisation indisponible étant signalée et ignorée
+    :param args: Les arguments de la ligne de commande
+    '''
+    import moteurRI
+    corpus = os.path.join(args.dossier, 'corpus-%d' % args.taille)
+    os.makedirs(args.dossier, exist_ok=True)
+    generateCorpus(corpus, args.taille, args.graine)
+    queries = makeQueries(corpus, args.requetes, args.graine)
+    queries = queries['simple'] + queries['booleenne']
+
+    report = {'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'revision': gitRevision(), 'documents': args.taille,
+              'requetes': len(queries), 'ranking': args.ranking, 'top': args.top, 'normalisations': dict()}
+    # noms des fichiers des k premiers documents de chaque requête : les docNo peuvent différer d'un index à l'autre
+    rankings = dict()
+    for backend in args.lemmatizers:
+        index = os.path.join(args.dossier, 'index-%s-%d' % (backend, args.taille))
+        try:
+            elapsed, peakRss, _ = runMeasured([sys.executable, MOTEUR, 'index', '--full', '--corpus', corpus,
+                                               '--index', index, '--lemmatizer', backend],
+                                              os.path.join(args.dossier, 'index-%s.log' % backend))
+        except RuntimeError as error:
+            print("%-8s : indisponible (%s)" % (backend, error))
+            report['normalisations'][backend] = None
+            continue
+        with moteurRI.loadIndex(index) as diskIndex:
+            lemmatizer = indexLemmatizer(diskIndex)
+            latencies = list()
+            rankings[backend] = list()
+            for query in queries:
+                start = time.perf_counter()
+                results = moteurRI.answerQuery(query, diskIndex, lemmatizer, args.ranking, args.top)
+                latencies.append(time.perf_counter() - start)
+                rankings[backend].append([diskIndex.document(docNo)[0] for _, docNo, _ in results])
+            nTerms = len(diskIndex)
+        latencies.sort()
+        report['normalisations'][backend] = {
+            'indexationSecondes': elapsed, 'documentsParSeconde': args.taille / elapsed, 'memoireMaxKo': peakRss,
+            'octetsIndex': directorySize(index), 'termes': nTerms,
+            'requetesAvecResultats': sum(1 for documents in rankings[backend] if documents),
+            'p50Ms': percentile(latencies, 50) * 1000}
+        print("%-8s : indexation %.2f s (%.0f documents/s), %d termes, médiane des requêtes %.2f ms"
+              % (backend, elapsed, args.taille / elapsed, nTerms, percentile(latencies, 50) * 1000))
+
+    reference = args.reference if args.reference in rankings else next(iter(rankings), None)
+    report['reference'] = reference
+    for backend in rankings:
+        if backend == reference:
+            continue
+        overlaps, jaccards = list(), list()
+        for documents, expected in zip(rankings[backend], rankings[reference]):
+            common = len(set(documents) & set(expected))
+            union = len(set(documents) | set(expected))
+            # deux listes vides sont en accord parfait
+            overlaps.append(common / max(len(documents), len(expected)) if union else 1.0)
+            jaccards.append(common / union if union else 1.0)
+        report['normalisations'][backend]['recouvrement'] = {
+            'reference': reference, 'recouvrementMoyen': sum(overlaps) / len(overlaps),
+            'jaccardMoyen': sum(jaccards) / len(jaccards),
+            'requetesIdentiques': sum(1 for documents, expected in zip(rankings[backend], rankings[reference])
+                                      if documents == expected)}
+        print("%-8s : recouvrement des %d premiers avec %s %.3f, Jaccard %.3f"
+              % (backend, args.top, reference, sum(overlaps) / len(overlaps), sum(jaccards) / len(jaccards)))
+
+    os.makedirs(args.sortie, exist_ok=True)
+    path = os.path.join(args.sortie, time.strftime('normalisations-%Y%m%d-%H%M%S.json'))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print("Résultats :", path)
+    return 0 if rankings else 1
+
+def commandGenerate(args):
+    '''
+    Commande "generate" : génération d'un corpus synthétique seul
+    :param args: Les arguments de la ligne de commande
+    '''
+    nBytes = generateCorpus(args.dossier, args.taille, args.graine)
+    print("%d documents, %d octets : %s" % (args.taille, nBytes, args.dossier))
+    return 0
+
+def flatten(report, prefix=''):
+    '''
+    Mise à plat des mesures numériques d'un rapport
+    :param report: Le rapport, ou une de ses parties
+    :param prefix: Le chemin de la partie dans le rapport
+    :return: Les mesures {chemin: valeur}
+    :rtype: dict
+    '''
+    values = dict()
+    for key, value in report.items():
+        if isinstance(value, dict):
+            values.update(flatten(value, prefix + key + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[prefix + key] = value
+    return values
+
+def commandCompare(args):
+    '''
+    Commande "compare" : comparaison des mesures de deux exécutions, taille par taille
+    :param args: Les arguments de la ligne de commande
+    '''
+    reports = list()
+    for path in (args.avant, args.apres):
+        with open(path, encoding='utf-8') as f:
+            reports.append({size['documents']: flatten(size) for size in json.load(f)['tailles']})
+    before, after = reports
+    for nDocs in sorted(set(before) & set(after)):
+        print("\n%d documents :" % nDocs)
+        for key in sorted(set(before[nDocs]) & set(after[nDocs])):
+            old, new = before[nDocs][key], after[nDocs][key]
+            ratio = "x%.2f" % (new / old) if old else "-"
+            print("  %-40s %14.3f %14.3f  %s" % (key, old, new, ratio))
+    return 0
+
+def parseArgs(argv=None):
+    '''
+    Analyse de la ligne de commande
+    :param argv: La liste des arguments, sys.argv par défaut
+    :return: Les arguments analysés
+    :rtype: argparse.Namespace
+    '''
+    parser = argparse.ArgumentParser(description="Mesures de performance du moteur de recherche")
+    subparsers = parser.add_subparsers(dest='commande')
+    subparsers.required = True
+
+    parserRun = subparsers.add_parser('run', help="génération des corpus, indexation et requêtes")
+    parserRun.add_argument('--tailles', type=int, nargs='+', default=list(SIZES), help="nombres de documents")
+    parserRun.add_argument('--dossier', default='bench', help="dossier des corpus et des index générés")
+    parserRun.add_argument('--sortie', default=os.path.join('bench', 'resultats'), help="dossier des résultats JSON")
+    parserRun.add_argument('--workers', type=int, default=1, help="nombre de processus d'indexation")
+    parserRun.add_argument('--memoire', type=int, default=0, metavar='MO',
+                           help="budget mémoire de l'indexation par blocs (0 pour tout garder en mémoire)")
+    parserRun.add_argument('--requetes', type=int, default=200, help="nombre de requêtes mesurées par type")
+    parserRun.add_argument('--ranking', choices=requeteRI.RANKINGS, default='bm25', help="classement")
+    parserRun.add_argument('--graine', type=int, default=0, help="graine des tirages aléatoires")
+    parserRun.set_defaults(func=commandRun)
+
+    parserQueries = subparsers.add_parser('queries', help="(interne) latence des requêtes sur un index")
+    parserQueries.add_argument('--corpus', required=True)
+    parserQueries.add_argument('--index', required=True)
+    parserQueries.add_argument('--requetes', type=int, default=200)
+    parserQueries.add_argument('--ranking', default='bm25')
+    parserQueries.add_argument('--graine', type=int, default=0)
+    parserQueries.set_defaults(func=commandQueries)
+
+    parserStartup = subparsers.add_parser('startup', help="durée de démarrage de la recherche, comparée à un budget")
+    parserStartup.add_argument('--budget', type=float, default=200.0,
+                               help="durée médiane maximale d'une recherche, en millisecondes")
+    parserStartup.add_argument('--repetitions', type=int, default=10, help="nombre d'exécutions mesurées")
+    parserStartup.add_argument('--taille', type=int, default=100, help="nombre de documents du corpus")
+    parserStartup.add_argument('--dossier', default='bench', help="dossier du corpus et de l'index générés")
+    parserStartup.add_argument('--sortie', default=os.path.join('bench', 'resultats'), help="dossier des résultats JSON")
+    parserStartup.add_argument('--graine', type=int, default=0, help="graine des tirages aléatoires")
+    parserStartup.set_defaults(func=commandStartup)
+
+    parserRepair = subparsers.add_parser('repair', help="débit de la réparation selon le nombre de règles")
+    parserRepair.add_argument('--regles', type=int, nargs='+', default=[10, 100, 1000, 10000],
+                              help="nombres de règles littérales mesurés")
+    parserRepair.add_argument('--type', choices=('texte', 'motif'), default='texte',
+                              help="règles littérales ou motifs à début fixe")
+    parserRepair.add_argument('--mots', type=int, default=200000, help="nombre de mots du texte réparé")
+    parserRepair.add_argument('--repetitions', type=int, default=5, help="nombre de mesures par nombre de règles")
+    parserRepair.add_argument('--sortie', default=os.path.join('bench', 'resultats'), help="dossier des résultats JSON")
+    parserRepair.add_argument('--graine', type=int, default=0, help="graine des tirages aléatoires")
+    parserRepair.set_defaults(func=commandRepair)
+
+    parserMatrix = subparsers.add_parser('matrix', help="débit du classement par lot sur la matrice termes-documents")
+    parserMatrix.add_argument('--taille', type=int, default=10000, help="nombre de documents du corpus")
+    parserMatrix.add_argument('--requetes', type=int, default=1000, help="nombre de requêtes de chaque type")
+    parserMatrix.add_argument('--ranking', choices=('bm25', 'tfidf'), default='bm25', help="classement")
+    parserMatrix.add_argument('--top', type=requeteRI.topArgument, default=10, help="nombre de documents renvoyés par requête")
+    parserMatrix.add_argument('--dossier', default='bench', help="dossier du corpus et de l'index générés")
+    parserMatrix.add_argument('--sortie', default=os.path.join('bench', 'resultats'), help="dossier des résultats JSON")
+    parserMatrix.add_argument('--graine', type=int, default=0, help="graine des tirages aléatoires")
+    parserMatrix.set_defaults(func=commandMatrix)
+
+    parserTokenize = subparsers.add_parser('tokenize', help="débit et accord des découpages en tokens nltk et regex")
+    parserTokenize.add_argument('--corpus', help="dossier d'un corpus existant (par défaut, un corpus généré)")
+    parserTokenize.add_argument('--taille', type=int, default=10000, help="nombre de documents du corpus généré")
+    parserTokenize.add_argument('--repetitions', type=int, default=3, help="nombre de mesures par découpage")
+    parserTokenize.add_argument('--dossier', default='bench', help="dossier du corpus généré")
+    parserTokenize.add_argument('--sortie', default=os.path.join('bench', 'resultats'), help="dossier des résultats JSON")
+    parserTokenize.add_argument('--graine', type=int, default=0, help="graine des tirages aléatoires")
+    parserTokenize.set_defaults(func=commandTokenize)
+
+    parserBackends = subparsers.add_parser('backends', help="durée d'indexation et recouvrement des résultats "
+                                                            "selon la normalisation des tokens")
+    parserBackends.add_argument('--taille', type=int, default=2000, help="nombre de documents du corpus")
+    parserBackends.add_argument('--lemmatizers', nargs='+', choices=BACKENDS,
+                                default=list(BACKENDS), help="normalisations mesurées")
+    parserBackends.add_argument('--reference', default='spacy',
+                                help="normalisation de référence du recouvrement (par défaut la première disponible "
+                                     "si elle ne l'est pas)")
+    parserBackends.add_argument('--requetes', type=int, default=200, help="nombre de requêtes de chaque type")
+    parserBackends.add_argument('--ranking', choices=('bm25', 'tfidf'), default='bm25', help="classement")
+    parserBackends.add_argument('--top', type=requeteRI.topArgument, default=10, help="nombre de documents comparés par requête")
+    parserBackends.add_argument('--dossier', default='bench', help="dossier du corpus et des index générés")
+    parserBackends.add_argument('--sortie', default=os.path.join('bench', 'resultats'), help="dossier des résultats JSON")
+    parserBackends.add_argument('--graine', type=int, default=0, help="graine des tirages aléatoires")
+    parserBackends.set_defaults(func=commandBackends)
+
+    parserGenerate = subparsers.add_parser('generate', help="génération d'un corpus synthétique")
+    parserGenerate.add_argument('--taille', type=int, required=True, help="nombre de documents")
+    parserGenerate.add_argument('--dossier', required=True, help="dossier du corpus")
+    parserGenerate.add_argument('--graine', type=int, default=0, help="graine des tirages aléatoires")
+    parserGenerate.set_defaults(func=commandGenerate)
+
+    parserCompare = subparsers.add_parser('compare', help="comparaison de deux fichiers de résultats")
+    parserCompare.add_argument('avant')
+    parserCompare.add_argument('apres')
+    parserCompare.set_defaults(func=commandCompare)
+
+    return parser.parse_args(argv)
+
+# main
+if __name__ == "__main__":
+    args = parseArgs()
+    sys.exit(args.func(args))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+###############################
+###########SYNOPSIS############
+###############################
+#
+# Auteurs : Sotiria BAMPATZANI
+#           Morgane DEHARENG
+#
+# But : extraits des documents trouvés, les termes de la requête mis en évidence dans leur contexte (KWIC)
+#
+# Usage : module importé par moteurRI.py et serveurRI.py (option --extraits, paramètre extraits=1 de l'URL)
+#
+# Principe : la fiche de chaque document dans le magasin de l'index (voir indexRI, magasin.bin) donne la position
+#            et le lemme de chaque token indexé : un extrait ne relit que le corps de son document (dans le fichier
+#            source, ou le texte conservé avec --textes) et ne refait ni la tokenisation ni la lemmatisation
+###############################
+
+import os
+from collections import Counter
+
+# largeur par défaut d'un extrait, en caractères
+WIDTH = 160
+# marques entourant un terme trouvé
+MARKS = ('[', ']')
+# marque d'un extrait coupé au début ou à la fin du document
+ELLIPSIS = '…'
+
+def readBody(stored):
+    '''
+    Lecture du corps normalisé d'un document, tel qu'il a été tokenisé à l'indexation
+    :param stored: La fiche du document (voir indexRI.decodeStoredDocument)
+    :return: Le corps du document, None si le fichier source a disparu ou changé depuis l'indexation
+    :rtype: String
+    '''
+    if stored['texte'] is not None:
+        return stored['texte']
+    try:
+        stat = os.stat(stored['source'])
+        if stat.st_size != stored['taille'] or stat.st_mtime_ns != stored['mtime']:
+            return None
+        with open(stored['source'], 'rb') as f:
+            # seuls les octets du corps sont lus
+            f.seek(stored['debut'])
+            data = f.read(stored['taille'] - stored['debut'])
+    except OSError:
+        return None
+    # mêmes fins de ligne que la lecture en mode texte de moteurRI.normalizeFile
+    return data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n').replace('\n', ' ')
+
+def bestWindow(tokens, matches, width):
+    '''
+    Fenêtre de l'extrait : celle d'au plus width caractères qui contient le plus de termes distincts trouvés,
+    puis le plus d'occurrences, la première en cas d'égalité
+    :param tokens: Les tokens (début, fin, numéro du lemme) du document
+    :param matches: Les rangs croissants des tokens trouvés, au moins un
+    :param width: La largeur de la fenêtre en caractères
+    :return: Les rangs dans matches de la première et de la dernière occurrence de la fenêtre
+    :rtype: tuple
+    '''
+    best = None
+    counts = Counter()
+    last = 0
+    for first, rank in enumerate(matches):
+        # extension de la fenêtre qui commence à l'occurrence first (deux pointeurs : parcours linéaire)
+        while last < len(matches) and (last <= first or tokens[matches[last]][1] - tokens[rank][0] <= width):
+            counts[tokens[matches[last]][2]] += 1
+            last += 1
+        key = (len(counts), last - first)
+        if best is None or key > best[0]:
+            best = (key, first, last - 1)
+        number = tokens[rank][2]
+        counts[number] -= 1
+        if not counts[number]:
+            del counts[number]
+    return best[1], best[2]
+
+def snippet(stored, terms, width=WIDTH, marks=MARKS):
+    '''
+    Extrait d'un document autour des termes trouvés, mis en évidence par des marques
+    :param stored: La fiche du document (voir indexRI.decodeStoredDocument)
+    :param terms: Les termes trouvés (lemmes du lexique), vide pour le début du document
+    :param width: La largeur approximative de l'extrait en caractères
+    :param marks: Les marques placées avant et après chaque terme trouvé
+    :return: L'extrait, None si le corps du document est illisible
+    :rtype: String
+    '''
+    body = readBody(stored)
+    if body is None:
+        return None
+    tokens = stored['tokens']
+    numbers = set(number for number, lemma in enumerate(stored['lemmes']) if lemma in terms)
+    matches = [rank for rank, token in enumerate(tokens) if token[2] in numbers]
+    if matches:
+        first, last = bestWindow(tokens, matches, width)
+        matchStart, matchEnd = tokens[matches[first]][0], tokens[matches[last]][1]
+        # contexte réparti de part et d'autre des occurrences retenues, un tiers avant
+        margin = max(0, width - (matchEnd - matchStart))
+        start = max(0, matchStart - margin // 3)
+        end = min(len(body), matchEnd + margin - (matchStart - start))
+        marked = [tokens[rank] for rank in matches[first:last + 1]]
+    else:
+        matchStart = matchEnd = 0
+        start, end = 0, min(len(body), width)
+        marked = list()
+    # coupure entre deux mots, sans perdre les occurrences retenues
+    if start > 0:
+        space = body.find(' ', start, matchStart)
+        start = space + 1 if space >= 0 else matchStart
+    if end < len(body):
+        space = body.rfind(' ', matchEnd, end)
+        end = space if space > 0 else max(end, matchEnd)
+
+    parts = list()
+    cursor = start
+    for tokenStart, tokenEnd, _ in marked:
+        parts.append(body[cursor:tokenStart])
+        parts.append(marks[0] + body[tokenStart:tokenEnd] + marks[1])
+        cursor = tokenEnd
+    parts.append(body[cursor:end])
+    text = ' '.join(''.join(parts).split())
+    return (ELLIPSIS if start > 0 else '') + text + (ELLIPSIS if end < len(body) else '')
+
+def documentSnippet(index, docNo, terms, width=WIDTH, marks=MARKS):
+    '''
+    Extrait d'un document trouvé, lu à partir de sa seule fiche dans le magasin de l'index
+    :param index: L'index ouvert avec moteurRI.loadIndex
+    :param docNo: L'identifiant du document
+    :param terms: Les termes trouvés, les clés {mot: fréqLocale} d'un résultat
+    :return: L'extrait, None si le document n'a pas de fiche ou si son corps est illisible
+    :rtype: String
+    '''
+    stored = index.storedDocument(docNo)
+    if stored is None:
+        return None
+    return snippet(stored, terms, width, marks)
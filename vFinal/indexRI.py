@@ -0,0 +1,1374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+###############################
+###########SYNOPSIS############
+###############################
+#
+# Auteurs : Sotiria BAMPATZANI
+#           Morgane DEHARENG
+#
+# But : format binaire de l'index inversé sur disque, lu à l'aide de mmap
+#
+# Usage : module importé par moteurRI.py
+#
+# Format : un dossier d'index contient un fichier index.json (description de la génération courante)
+#          et un sous-dossier par génération contenant :
+#          - lexique.bin   : en-tête, puis un enregistrement de taille fixe par terme, trié par terme,
+#                            (position du terme, longueur du terme, position des postings, nombre de postings,
+#                            position des positions) puis les termes encodés en UTF-8 les uns à la suite des autres
+#          - postings.bin  : pour chaque terme, une table de pointeurs de saut de taille fixe puis les postings
+#                            compressés : écart avec le docNo précédent et fréqLocale en entiers de taille variable
+#                            (varint), suivis pour un index positionnel de la taille en octets de ses positions
+#          - positions.bin : (index positionnel uniquement) pour chaque posting, les positions du terme
+#                            dans le document, codées en varint par différence avec la position précédente
+#          - permuterm.bin : en-tête, puis un enregistrement (rang du terme, décalage) par rotation "suffixe \0 préfixe"
+#                            de chaque terme, trié par rotation, pour les requêtes avec joker (*dessus, ch*au)
+#          - kgrammes.bin  : en-tête, puis un enregistrement par trigramme de caractères des termes bordés de '$', trié,
+#                            (position du trigramme, longueur, position de sa liste, nombre de termes), les trigrammes,
+#                            puis les listes des rangs des termes qui les contiennent (varint, par différence)
+#          - documents.bin : en-tête, puis un enregistrement de taille fixe par document, trié par docNo,
+#                            (docNo, position, longueur, nombre de lemmes, position et longueur dans magasin.bin)
+#                            puis les descriptions JSON [nom du fichier, titre]
+#          - magasin.bin   : en-tête, puis la fiche de chaque document, pour les extraits des résultats : chemin
+#                            du fichier source, position en octets du corps du document (après la ligne de titre),
+#                            taille et date du fichier, texte compressé (zlib) facultatif, nombre de tokens indexés,
+#                            écart en caractères de chaque token avec la fin du précédent et sa longueur, numéro de son
+#                            lemme parmi ceux du document, puis rangs dans le lexique des lemmes distincts du document
+#                            dans l'ordre de leur première apparition, en varint
+#          - fichiers.json : l'empreinte de chaque fichier indexé, utilisée pour la réindexation incrémentale
+#
+#          Un index partitionné (--partitions N) contient à la place, dans le sous-dossier de chaque génération,
+#          un index complet par partition (partition-K, avec son propre index.json) regroupant les documents
+#          dont le docNo vaut K modulo N ; son index.json indique le nombre de partitions et les statistiques globales
+#
+#          L'indexation à mémoire bornée écrit en outre des blocs temporaires (bloc-N.bin) : en-tête, puis pour
+#          chaque terme, dans l'ordre, sa longueur, le terme, le nombre de postings et les postings sans pointeurs
+#          de saut (écart de docNo, puis fréqLocale ou nombre de positions et positions par différence), en varint ;
+#          toute indexation écrit les fiches des documents, à la suite et sans en-tête, dans des fichiers temporaires
+#          (magasin-*.bin, un par processus), relus fiche par fiche à l'écriture de magasin.bin
+###############################
+
+import os
+import re
+import json
+import math
+import mmap
+import zlib
+import heapq
+import shutil
+import struct
+import itertools
+
+# description de la génération courante de l'index
+META = 'index.json'
+LEXICON = 'lexique.bin'
+POSTINGS = 'postings.bin'
+POSITIONS = 'positions.bin'
+DOCUMENTS = 'documents.bin'
+STORE = 'magasin.bin'
+PERMUTERM = 'permuterm.bin'
+KGRAMS = 'kgrammes.bin'
+FINGERPRINTS = 'fichiers.json'
+PARTITION = 'partition-%d'
+
+FORMAT_VERSION = 7
+
+# en-tête des fichiers binaires : signature, version, nombre d'enregistrements
+HEADER = struct.Struct('<4sIQ')
+LEXICON_MAGIC = b'RILX'
+DOCUMENTS_MAGIC = b'RIDC'
+STORE_MAGIC = b'RIMG'
+PERMUTERM_MAGIC = b'RIPT'
+KGRAMS_MAGIC = b'RIKG'
+RUN_MAGIC = b'RIBL'
+# enregistrement du lexique : position du terme, longueur du terme, position des postings, nombre de postings,
+# position des positions du terme dans positions.bin
+LEXICON_RECORD = struct.Struct('<QIQIQ')
+# enregistrement de la table des documents : docNo, position de la description, longueur de la description,
+# nombre de lemmes du document (pour le classement), position et longueur de sa fiche dans le magasin
+DOCUMENT_RECORD = struct.Struct('<IQIIQI')
+# rotation d'un terme dans l'index permuterm : rang du terme dans le lexique, décalage en octets de la rotation
+ROTATION = struct.Struct('<II')
+# séparateur entre la fin et le début du terme dans une rotation, absent des termes
+ROTATION_MARK = b'\0'
+# enregistrement de l'index des k-grammes : position du k-gramme, longueur, position de la liste, nombre de termes
+KGRAM_RECORD = struct.Struct('<IIQI')
+# longueur des k-grammes et bord ajouté de chaque côté des termes (les termes indexés sont alphabétiques)
+KGRAM_SIZE = 3
+KGRAM_MARK = '$'
+# nombre de termes candidats examinés, par terme autorisé, pour un motif à plusieurs jokers
+EXPANSION_SCAN = 20
+# pointeur de saut vers le premier posting d'un bloc : son docNo, sa position dans les postings compressés
+# et la position de ses positions, relatives au début des données du terme
+SKIP = struct.Struct('<III')
+# nombre minimal de postings par bloc entre deux pointeurs de saut
+SKIP_MIN = 8
+# taille d'un posting non compressé (docNo, fréqLocale) en entiers de 32 bits, et d'une position
+FIXED_POSTING_SIZE = 8
+FIXED_POSITION_SIZE = 4
+# taille du tampon d'écriture des blocs temporaires
+RUN_BUFFER = 1 << 20
+
+def encodeVarint(value, out):
+    '''
+    Codage d'un entier positif sur un nombre variable d'octets, 7 bits par octet, poids faibles d'abord
+    :param value: L'entier
+    :param out: Le tampon auquel les octets sont ajoutés
+    '''
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def decodeVarint(data, pos):
+    '''
+    Décodage d'un entier codé par encodeVarint
+    :param data: Les données
+    :param pos: La position du premier octet
+    :return: L'entier et la position de l'octet suivant
+    :rtype: tuple
+    '''
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def skipStep(count):
+    '''
+    Nombre de postings entre deux pointeurs de saut pour une liste de postings
+    :param count: Le nombre de postings
+    :rtype: int
+    '''
+    return max(SKIP_MIN, math.isqrt(count))
+
+def skipCount(count):
+    '''
+    Nombre de pointeurs de saut d'une liste de postings : un au début de chaque bloc sauf le premier
+    :param count: Le nombre de postings
+    :rtype: int
+    '''
+    return (count - 1) // skipStep(count) if count else 0
+
+def sortedPostings(indexInverse):
+    '''
+    Parcours d'un index inversé en mémoire dans l'ordre attendu par writeIndex
+    :param indexInverse: L'index inversé {terme: {docNo: fréqLocale}}, ou {terme: {docNo: [positions]}}
+    :return: Un générateur de couples (terme, liste des (docNo, fréqLocale ou positions) triée par docNo), triés par terme
+    :rtype: generator
+    '''
+    for term in sorted(indexInverse, key=lambda t: t.encode('utf-8')):
+        yield term, sorted(indexInverse[term].items())
+
+def writeIndex(path, terms, allTitle, fingerprints=None, nextDocNo=None, positional=False, preprocessing=None,
+               storedEntry=None):
+    '''
+    Écriture d'une nouvelle génération de l'index sur disque
+    La génération est écrite dans un nouveau sous-dossier puis rendue visible en remplaçant index.json,
+    de sorte qu'un lecteur voit toujours un index complet
+    :param path: Le dossier de l'index, créé s'il n'existe pas
+    :param terms: Un itérable de couples (terme, liste des (docNo, fréqLocale) triée par docNo), triés par terme,
+                  la fréquence étant remplacée par la liste croissante des positions si l'index est positionnel
+    :param allTitle: La table des documents {docNo: (nom du fichier, titre, nombre de lemmes)}
+    :param fingerprints: Les empreintes des fichiers indexés {nom du fichier: empreinte}
+    :param nextDocNo: Le prochain docNo à attribuer, par défaut le plus grand docNo plus un
+    :param positional: Écriture des positions des termes dans chaque document
+    :param preprocessing: Les réglages du prétraitement des documents, enregistrés tels quels
+    :param storedEntry: La fonction docNo -> fiche du document (voir writeDocuments), None pour un magasin sans fiches
+    :return: Le numéro de la nouvelle génération
+    :rtype: int
+    '''
+    generation, dirname, genPath = newGeneration(path)
+    ranks = dict()
+    nTerms, nPostings = writeLexicon(genPath, terms, positional, ranks)
+    writeDocuments(genPath, allTitle, ranks, storedEntry)
+    with open(os.path.join(genPath, FINGERPRINTS), 'w', encoding='utf-8') as f:
+        json.dump(fingerprints or dict(), f, ensure_ascii=False)
+
+    # les docNo des documents supprimés ne sont jamais réattribués
+    lastDocNo = max(allTitle, default=0)
+    totalLength = sum(doc[2] for doc in allTitle.values())
+    meta = {
+        'format': FORMAT_VERSION,
+        'generation': generation,
+        'dossier': dirname,
+        'termes': nTerms,
+        'postings': nPostings,
+        'documents': len(allTitle),
+        'longueurMoyenne': totalLength / len(allTitle) if allTitle else 0.0,
+        'prochainDocNo': max(nextDocNo or 0, lastDocNo + 1),
+        'positions': positional,
+        'pretraitement': preprocessing or dict(),
+    }
+    publishGeneration(path, meta)
+    return generation
+
+def newGeneration(path):
+    '''
+    Création du sous-dossier d'une nouvelle génération de l'index
+    :param path: Le dossier de l'index, créé s'il n'existe pas
+    :return: Le numéro de la génération, le nom et le chemin de son sous-dossier
+    :rtype: tuple
+    '''
+    os.makedirs(path, exist_ok=True)
+    previous = readMeta(path)
+    generation = previous['generation'] + 1 if previous else 1
+    dirname = 'gen-%06d' % generation
+    genPath = os.path.join(path, dirname)
+    if os.path.exists(genPath):
+        shutil.rmtree(genPath)
+    os.makedirs(genPath)
+    return generation, dirname, genPath
+
+def publishGeneration(path, meta):
+    '''
+    Remplacement atomique de index.json par la description d'une nouvelle génération, puis suppression des anciennes
+    :param path: Le dossier de l'index
+    :param meta: La description de la génération, dont le champ 'dossier' désigne son sous-dossier
+    '''
+    tmp = os.path.join(path, META + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp, os.path.join(path, META))
+
+    # suppression des anciennes générations (elles peuvent encore être ouvertes par un lecteur sous Windows)
+    for name in os.listdir(path):
+        if name.startswith('gen-') and name != meta['dossier']:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+def partitionPostings(terms, nPartitions, partition):
+    '''
+    Restriction d'un parcours de l'index aux documents d'une partition
+    :param terms: Un itérable de couples (terme, liste des (docNo, valeur) triée par docNo), triés par terme
+    :param nPartitions: Le nombre de partitions
+    :param partition: Le numéro de la partition, les docNo qui lui reviennent valent partition modulo nPartitions
+    :return: Un générateur de couples (terme, liste des (docNo, valeur)), les termes sans posting étant omis
+    :rtype: generator
+    '''
+    for term, termPostings in terms:
+        kept = [posting for posting in termPostings if posting[0] % nPartitions == partition]
+        if kept:
+            yield term, kept
+
+def writePartitions(path, nPartitions, termsOf, allTitle, fingerprints=None, nextDocNo=None, positional=False,
+                    preprocessing=None, storedEntry=None):
+    '''
+    Écriture d'une nouvelle génération d'un index partitionné : un index complet par partition dans le sous-dossier
+    de la génération, rendue visible en une fois en remplaçant index.json
+    :param path: Le dossier de l'index, créé s'il n'existe pas
+    :param nPartitions: Le nombre de partitions
+    :param termsOf: La fonction qui renvoie, pour un numéro de partition, le parcours de l'index (voir writeIndex)
+                    restreint à ses documents
+    :param allTitle: La table des documents {docNo: (nom du fichier, titre, nombre de lemmes)}
+    :param fingerprints: Les empreintes des fichiers indexés {nom du fichier: empreinte}
+    :param nextDocNo: Le prochain docNo à attribuer, par défaut le plus grand docNo plus un
+    :param positional: Écriture des positions des termes dans chaque document
+    :param preprocessing: Les réglages du prétraitement des documents, enregistrés tels quels
+    :param storedEntry: La fonction docNo -> fiche du document (voir writeDocuments), None pour un magasin sans fiches
+    :return: Le numéro de la nouvelle génération
+    :rtype: int
+    '''
+    generation, dirname, genPath = newGeneration(path)
+    fingerprints = fingerprints or dict()
+    nPostings = 0
+    lexicons = list()
+    for partition in range(nPartitions):
+        partitionPath = os.path.join(genPath, PARTITION % partition)
+        writeIndex(partitionPath,
+                   termsOf(partition),
+                   {docNo: doc for docNo, doc in allTitle.items() if docNo % nPartitions == partition},
+                   {name: value for name, value in fingerprints.items() if value['docNo'] % nPartitions == partition},
+                   nextDocNo, positional, preprocessing, storedEntry)
+        partitionIndex = DiskIndex(partitionPath)
+        nPostings += partitionIndex.meta['postings']
+        lexicons.append(partitionIndex)
+    # nombre de termes distincts de toute la collection, par fusion des lexiques des partitions
+    nTerms = sum(1 for _ in itertools.groupby(heapq.merge(*[index.terms() for index in lexicons])))
+    for index in lexicons:
+        index.close()
+
+    lastDocNo = max(allTitle, default=0)
+    totalLength = sum(doc[2] for doc in allTitle.values())
+    publishGeneration(path, {
+        'format': FORMAT_VERSION,
+        'generation': generation,
+        'dossier': dirname,
+        'partitions': nPartitions,
+        'termes': nTerms,
+        'postings': nPostings,
+        'documents': len(allTitle),
+        'longueurMoyenne': totalLength / len(allTitle) if allTitle else 0.0,
+        'prochainDocNo': max(nextDocNo or 0, lastDocNo + 1),
+        'positions': positional,
+        'pretraitement': preprocessing or dict(),
+    })
+    return generation
+
+def writeLexicon(genPath, terms, positional=False, ranks=None):
+    '''
+    Écriture du lexique, des postings compressés et, pour un index positionnel, des positions
+    :param genPath: Le dossier de la génération
+    :param terms: Un itérable de couples (terme, liste des (docNo, fréqLocale ou positions) triée par docNo), triés par terme
+    :param positional: Les postings contiennent les positions à la place des fréquences
+    :param ranks: Le dictionnaire {terme: rang dans le lexique} complété au fil de l'écriture, None pour l'ignorer
+    :return: Le nombre de termes et le nombre total de postings écrits
+    :rtype: tuple
+    '''
+    nTerms = 0
+    nPostings = 0
+    blob = bytearray()
+    encodedTerms = list()
+    positionsFile = open(os.path.join(genPath, POSITIONS), 'wb') if positional else None
+    with open(os.path.join(genPath, LEXICON), 'wb') as lexicon, \
+            open(os.path.join(genPath, POSTINGS), 'wb') as postings:
+        # l'en-tête est réécrit à la fin, une fois le nombre de termes connu
+        lexicon.write(HEADER.pack(LEXICON_MAGIC, FORMAT_VERSION, 0))
+        postingsOffset = 0
+        positionsOffset = 0
+        for term, termPostings in terms:
+            encoded = term.encode('utf-8')
+            data, positionsData = encodePostings(termPostings, positional)
+            postings.write(data)
+            if positional:
+                positionsFile.write(positionsData)
+            lexicon.write(LEXICON_RECORD.pack(len(blob), len(encoded), postingsOffset, len(termPostings),
+                                              positionsOffset))
+            blob += encoded
+            encodedTerms.append(encoded)
+            if ranks is not None:
+                ranks[term] = nTerms
+            postingsOffset += len(data)
+            positionsOffset += len(positionsData)
+            nTerms += 1
+            nPostings += len(termPostings)
+        lexicon.write(blob)
+        lexicon.seek(0)
+        lexicon.write(HEADER.pack(LEXICON_MAGIC, FORMAT_VERSION, nTerms))
+    if positionsFile is not None:
+        positionsFile.close()
+    writePermuterm(genPath, encodedTerms)
+    writeKgrams(genPath, encodedTerms)
+    return nTerms, nPostings
+
+def rotate(term, shift):
+    '''
+    Rotation d'un terme pour l'index permuterm : la fin du terme à partir du décalage, le séparateur, puis le début
+    :param term: Le terme encodé en UTF-8
+    :param shift: Le décalage en octets, sur une frontière de caractère
+    :rtype: bytes
+    '''
+    return term[shift:] + ROTATION_MARK + term[:shift]
+
+def writePermuterm(genPath, encodedTerms):
+    '''
+    Écriture de l'index permuterm : toutes les rotations de chaque terme, triées
+    Un motif début*fin correspond aux rotations qui commencent par "fin \\0 début"
+    :param genPath: Le dossier de la génération
+    :param encodedTerms: La liste des termes encodés en UTF-8, dans l'ordre du lexique
+    '''
+    rotations = list()
+    for rank, encoded in enumerate(encodedTerms):
+        # un décalage par frontière de caractère, fin du terme comprise
+        for shift in range(len(encoded) + 1):
+            if shift == len(encoded) or encoded[shift] & 0xC0 != 0x80:
+                rotations.append((rotate(encoded, shift), rank, shift))
+    rotations.sort()
+    with open(os.path.join(genPath, PERMUTERM), 'wb') as f:
+        f.write(HEADER.pack(PERMUTERM_MAGIC, FORMAT_VERSION, len(rotations)))
+        for _, rank, shift in rotations:
+            f.write(ROTATION.pack(rank, shift))
+
+def kgrams(term):
+    '''
+    K-grammes distincts d'un terme bordé de KGRAM_MARK
+    :param term: Le terme
+    :rtype: set
+    '''
+    padded = KGRAM_MARK + term + KGRAM_MARK
+    return {padded[i:i + KGRAM_SIZE] for i in range(max(1, len(padded) - KGRAM_SIZE + 1))}
+
+def writeKgrams(genPath, encodedTerms):
+    '''
+    Écriture de l'index des k-grammes : pour chaque k-gramme, la liste des rangs des termes qui le contiennent
+    :param genPath: Le dossier de la génération
+    :param encodedTerms: La liste des termes encodés en UTF-8, dans l'ordre du lexique
+    '''
+    lists = dict()
+    for rank, encoded in enumerate(encodedTerms):
+        for gram in kgrams(encoded.decode('utf-8')):
+            lists.setdefault(gram.encode('utf-8'), list()).append(rank)
+    grams = sorted(lists)
+    blob = b''.join(grams)
+    # les listes suivent les enregistrements et les k-grammes
+    listOffset = HEADER.size + len(grams) * KGRAM_RECORD.size + len(blob)
+    records = bytearray()
+    data = bytearray()
+    gramOffset = 0
+    for gram in grams:
+        ranks = lists[gram]
+        records += KGRAM_RECORD.pack(gramOffset, len(gram), listOffset + len(data), len(ranks))
+        gramOffset += len(gram)
+        previous = 0
+        for rank in ranks:
+            encodeVarint(rank - previous, data)
+            previous = rank
+    with open(os.path.join(genPath, KGRAMS), 'wb') as f:
+        f.write(HEADER.pack(KGRAMS_MAGIC, FORMAT_VERSION, len(grams)))
+        f.write(records)
+        f.write(blob)
+        f.write(data)
+
+def editDistance(first, second, bound):
+    '''
+    Distance d'édition (Levenshtein) entre deux chaînes, abandonnée dès qu'elle dépasse une borne
+    Seule la bande des cases à au plus bound de la diagonale est calculée
+    :param first: La première chaîne
+    :param second: La seconde chaîne
+    :param bound: La distance maximale recherchée
+    :return: La distance, ou bound + 1 si elle dépasse la borne
+    :rtype: int
+    '''
+    if abs(len(first) - len(second)) > bound:
+        return bound + 1
+    outside = bound + 1
+    previous = [j if j <= bound else outside for j in range(len(second) + 1)]
+    for i in range(1, len(first) + 1):
+        current = [outside] * (len(second) + 1)
+        if i <= bound:
+            current[0] = i
+        low, high = max(1, i - bound), min(len(second), i + bound)
+        for j in range(low, high + 1):
+            cost = 0 if first[i - 1] == second[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost, outside)
+        if min(current) > bound:
+            return outside
+        previous = current
+    return previous[-1]
+
+def encodePostings(termPostings, positional=False):
+    '''
+    Compression de la liste des postings d'un terme
+    :param termPostings: La liste des (docNo, fréqLocale ou positions) triée par docNo
+    :param positional: Les postings contiennent les positions à la place des fréquences
+    :return: Les données pour postings.bin (pointeurs de saut puis postings) et pour positions.bin
+    :rtype: tuple
+    '''
+    step = skipStep(len(termPostings))
+    skips = bytearray()
+    stream = bytearray()
+    positionsData = bytearray()
+    previous = 0
+    for i, (docNo, value) in enumerate(termPostings):
+        if i and i % step == 0:
+            skips += SKIP.pack(docNo, len(stream), len(positionsData))
+        encodeVarint(docNo - previous, stream)
+        previous = docNo
+        if positional:
+            deltas = encodeDeltas(value)
+            encodeVarint(len(value), stream)
+            encodeVarint(len(deltas), stream)
+            positionsData += deltas
+        else:
+            encodeVarint(value, stream)
+    return bytes(skips + stream), bytes(positionsData)
+
+def encodeDeltas(positions):
+    '''
+    Codage d'une liste croissante de positions par différence avec la position précédente
+    :param positions: La liste croissante des positions
+    :return: Les différences, en varint
+    :rtype: bytes
+    '''
+    out = bytearray()
+    previous = 0
+    for position in positions:
+        encodeVarint(position - previous, out)
+        previous = position
+    return bytes(out)
+
+def decodeDeltas(data, offset, count):
+    '''
+    Décodage d'une liste de positions codée par encodeDeltas
+    :param data: Les données
+    :param offset: La position du début de la liste
+    :param count: Le nombre de positions
+    :return: La liste croissante des positions
+    :rtype: List
+    '''
+    positions = list()
+    position = 0
+    for _ in range(count):
+        delta, offset = decodeVarint(data, offset)
+        position += delta
+        positions.append(position)
+    return positions
+
+def writeRun(filename, terms, positional=False):
+    '''
+    Écriture d'un bloc temporaire de l'indexation à mémoire bornée
+    :param filename: Le chemin du fichier
+    :param terms: Un itérable de couples (terme, liste des (docNo, fréqLocale ou positions) triée par docNo), triés par terme
+    :param positional: Les postings contiennent les positions à la place des fréquences
+    :return: Le nombre de termes écrits
+    :rtype: int
+    '''
+    nTerms = 0
+    out = bytearray()
+    with open(filename, 'wb') as f:
+        # l'en-tête est réécrit à la fin, une fois le nombre de termes connu
+        f.write(HEADER.pack(RUN_MAGIC, FORMAT_VERSION, 0))
+        for term, termPostings in terms:
+            encoded = term.encode('utf-8')
+            encodeVarint(len(encoded), out)
+            out += encoded
+            encodeVarint(len(termPostings), out)
+            previous = 0
+            for docNo, value in termPostings:
+                encodeVarint(docNo - previous, out)
+                previous = docNo
+                if positional:
+                    encodeVarint(len(value), out)
+                    out += encodeDeltas(value)
+                else:
+                    encodeVarint(value, out)
+            nTerms += 1
+            if len(out) >= RUN_BUFFER:
+                f.write(out)
+                out = bytearray()
+        f.write(out)
+        f.seek(0)
+        f.write(HEADER.pack(RUN_MAGIC, FORMAT_VERSION, nTerms))
+    return nTerms
+
+def readRun(filename, positional=False):
+    '''
+    Lecture séquentielle d'un bloc temporaire écrit avec writeRun, sans le charger en mémoire
+    :param filename: Le chemin du fichier
+    :param positional: Les postings contiennent les positions à la place des fréquences
+    :return: Un générateur de couples (terme, liste des (docNo, fréqLocale ou positions) triée par docNo), triés par terme
+    :rtype: generator
+    '''
+    data = openMap(filename)
+    try:
+        magic, version, nTerms = HEADER.unpack_from(data, 0)
+        if magic != RUN_MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Bloc temporaire invalide : " + filename)
+        pos = HEADER.size
+        for _ in range(nTerms):
+            length, pos = decodeVarint(data, pos)
+            term = data[pos:pos + length].decode('utf-8')
+            pos += length
+            count, pos = decodeVarint(data, pos)
+            termPostings = list()
+            docNo = 0
+            for _ in range(count):
+                delta, pos = decodeVarint(data, pos)
+                docNo += delta
+                value, pos = decodeVarint(data, pos)
+                if positional:
+                    positions = list()
+                    position = 0
+                    for _ in range(value):
+                        delta, pos = decodeVarint(data, pos)
+                        position += delta
+                        positions.append(position)
+                    value = positions
+                termPostings.append((docNo, value))
+            yield term, termPostings
+    finally:
+        data.close()
+
+def mergeTerms(sources):
+    '''
+    Fusion en un seul parcours de plusieurs parcours triés par terme (blocs temporaires, index précédent),
+    dont les docNo sont disjoints ; seuls les postings du terme courant de chaque parcours sont en mémoire
+    :param sources: Les itérables de couples (terme, liste des (docNo, valeur) triée par docNo), triés par terme
+    :return: Un générateur de couples (terme, liste des (docNo, valeur) triée par docNo), triés par terme
+    :rtype: generator
+    '''
+    # l'ordre des chaînes Python est celui de leur encodage UTF-8, utilisé par le lexique
+    merged = heapq.merge(*sources, key=lambda item: item[0])
+    for term, group in itertools.groupby(merged, key=lambda item: item[0]):
+        lists = [termPostings for _, termPostings in group]
+        # les docNo étant disjoints, la comparaison des postings s'arrête toujours au docNo
+        yield term, lists[0] if len(lists) == 1 else list(heapq.merge(*lists))
+
+def encodeVarints(values):
+    '''
+    Codage d'une suite d'entiers positifs comme par encodeVarint, en une seule opération s'ils tiennent tous sur un octet
+    :param values: La liste des entiers
+    :rtype: bytes
+    '''
+    if not values or max(values) < 0x80:
+        return bytes(values)
+    out = bytearray()
+    for value in values:
+        if value < 0x80:
+            out.append(value)
+        else:
+            encodeVarint(value, out)
+    return bytes(out)
+
+def decodeVarints(data, count):
+    '''
+    Décodage d'une suite d'entiers codée par encodeVarints
+    :param data: Les données, qui ne contiennent que la suite
+    :param count: Le nombre d'entiers
+    :rtype: List
+    '''
+    if len(data) == count:
+        return list(data)
+    values = list()
+    pos = 0
+    for _ in range(count):
+        value, pos = decodeVarint(data, pos)
+        values.append(value)
+    return values
+
+def encodeStoredDocument(source, bodyOffset, size, mtime, spans, lemmas, text=None):
+    '''
+    Codage de la fiche d'un document (voir le format de magasin.bin)
+    Pendant l'indexation, la fiche désigne ses lemmes par leur texte (JSON) : elle ne dépend pas du lexique
+    et passe telle quelle d'un processus ou d'une génération à l'autre ; writeDocuments n'en réécrit que la fin,
+    avec les rangs des lemmes dans le lexique de la génération, bien plus compacts (voir rankStoredDocument)
+    :param source: Le chemin du fichier source
+    :param bodyOffset: La position en octets du corps du document dans le fichier source
+    :param size: La taille du fichier source en octets
+    :param mtime: La date de modification du fichier source, en nanosecondes
+    :param spans: Les positions (début, fin) en caractères de chaque token indexé dans le corps normalisé,
+                  None si elles sont inconnues
+    :param lemmas: Le lemme de chaque token indexé, dans l'ordre
+    :param text: Le corps normalisé du document, conservé compressé, None pour le relire dans le fichier source
+    :return: La fiche
+    :rtype: bytes
+    '''
+    out = bytearray()
+    encoded = source.encode('utf-8')
+    encodeVarint(len(encoded), out)
+    out += encoded
+    for value in (bodyOffset, size, mtime):
+        encodeVarint(value, out)
+    compressed = zlib.compress(text.encode('utf-8')) if text is not None else b''
+    encodeVarint(len(compressed), out)
+    out += compressed
+    if spans is None:
+        spans, lemmas = (), ()
+    # écart avec la fin du token précédent et longueur de chaque token, à la suite
+    gaps = list()
+    previous = 0
+    for start, end in spans:
+        gaps.append(start - previous)
+        gaps.append(end - start)
+        previous = end
+    # numéro de chaque lemme dans l'ordre de première apparition
+    numbers = dict()
+    for lemma in lemmas:
+        numbers.setdefault(lemma, len(numbers))
+    encodeVarint(len(spans), out)
+    for section in (encodeVarints(gaps), encodeVarints([numbers[lemma] for lemma in lemmas])):
+        encodeVarint(len(section), out)
+        out += section
+    # la table des lemmes, en dernier, est la seule partie réécrite par rankStoredDocument
+    out += json.dumps(list(numbers), ensure_ascii=False).encode('utf-8')
+    return bytes(out)
+
+def storedTable(data):
+    '''
+    Position de la table des lemmes d'une fiche, sa dernière partie
+    :param data: La fiche codée par encodeStoredDocument
+    :return: Les champs de la fiche qui précèdent la table {'source', 'debut', 'taille', 'mtime', 'texte' (compressé),
+             'nTokens', 'ecarts', 'numeros'} et la position de la table
+    :rtype: tuple
+    '''
+    fields = dict()
+    length, pos = decodeVarint(data, 0)
+    fields['source'] = bytes(data[pos:pos + length]).decode('utf-8')
+    pos += length
+    for name in ('debut', 'taille', 'mtime'):
+        fields[name], pos = decodeVarint(data, pos)
+    for name in ('texte', 'nTokens', 'ecarts', 'numeros'):
+        length, pos = decodeVarint(data, pos)
+        if name == 'nTokens':
+            fields[name] = length
+            continue
+        fields[name] = data[pos:pos + length]
+        pos += length
+    return fields, pos
+
+def rankStoredDocument(data, ranks):
+    '''
+    Réécriture de la table des lemmes d'une fiche avec leurs rangs dans le lexique, le reste étant recopié tel quel
+    :param data: La fiche codée par encodeStoredDocument
+    :param ranks: Les rangs des termes dans le lexique {terme: rang}
+    :rtype: bytes
+    '''
+    _, pos = storedTable(data)
+    lemmas = json.loads(bytes(data[pos:]).decode('utf-8'))
+    out = bytearray(data[:pos])
+    encodeVarint(len(lemmas), out)
+    out += encodeVarints([ranks[lemma] for lemma in lemmas])
+    return bytes(out)
+
+def decodeStoredDocument(data, termAt=None):
+    '''
+    Décodage d'une fiche codée par encodeStoredDocument
+    :param data: La fiche
+    :param termAt: La fonction rang -> terme du lexique pour une fiche réécrite par rankStoredDocument, None pour
+                   une fiche qui désigne ses lemmes par leur texte
+    :return: La fiche {'source', 'debut', 'taille', 'mtime', 'texte' (None s'il n'est pas conservé),
+             'lemmes': [lemmes distincts], 'tokens': [(début, fin, numéro du lemme)]}
+    :rtype: dict
+    '''
+    fields, pos = storedTable(data)
+    if termAt is None:
+        lemmas = json.loads(bytes(data[pos:]).decode('utf-8'))
+    else:
+        nLemmas, pos = decodeVarint(data, pos)
+        lemmas = [termAt(rank) for rank in decodeVarints(data[pos:], nLemmas)]
+    nTokens = fields['nTokens']
+    gaps = decodeVarints(fields['ecarts'], 2 * nTokens)
+    numbers = decodeVarints(fields['numeros'], nTokens)
+    tokens = list()
+    end = 0
+    for i in range(nTokens):
+        start = end + gaps[2 * i]
+        end = start + gaps[2 * i + 1]
+        tokens.append((start, end, numbers[i]))
+    text = zlib.decompress(fields['texte']).decode('utf-8') if fields['texte'] else None
+    return {'source': fields['source'], 'debut': fields['debut'], 'taille': fields['taille'], 'mtime': fields['mtime'],
+            'texte': text, 'lemmes': lemmas, 'tokens': tokens}
+
+def unrankStoredDocument(data, termAt):
+    '''
+    Réécriture inverse de rankStoredDocument : la table des lemmes reprend leur texte, le reste étant recopié tel quel
+    :param data: La fiche réécrite par rankStoredDocument
+    :param termAt: La fonction rang -> terme du lexique de la génération de la fiche
+    :rtype: bytes
+    '''
+    _, pos = storedTable(data)
+    nLemmas, tablePos = decodeVarint(data, pos)
+    lemmas = [termAt(rank) for rank in decodeVarints(data[tablePos:], nLemmas)]
+    return bytes(data[:pos]) + json.dumps(lemmas, ensure_ascii=False).encode('utf-8')
+
+def writeDocuments(genPath, allTitle, ranks, storedEntry=None):
+    '''
+    Écriture de la table des documents et du magasin des documents
+    Les fiches sont lues une à une et réécrites avec les rangs des lemmes (voir rankStoredDocument) :
+    le magasin n'est jamais entièrement en mémoire
+    :param genPath: Le dossier de la génération
+    :param allTitle: La table des documents {docNo: (nom du fichier, titre, nombre de lemmes)}
+    :param ranks: Les rangs des termes dans le lexique de la génération {terme: rang}
+    :param storedEntry: La fonction docNo -> fiche codée par encodeStoredDocument avec le texte des lemmes,
+                        vide si le document n'en a pas ; None pour un magasin sans fiches
+    '''
+    blob = bytearray()
+    with open(os.path.join(genPath, DOCUMENTS), 'wb') as documents, \
+            open(os.path.join(genPath, STORE), 'wb') as store:
+        documents.write(HEADER.pack(DOCUMENTS_MAGIC, FORMAT_VERSION, len(allTitle)))
+        store.write(HEADER.pack(STORE_MAGIC, FORMAT_VERSION, len(allTitle)))
+        storeOffset = HEADER.size
+        for docNo in sorted(allTitle):
+            dictname, title, length = allTitle[docNo]
+            stored = storedEntry(docNo) if storedEntry is not None else b''
+            if stored:
+                stored = rankStoredDocument(stored, ranks)
+            encoded = json.dumps([dictname, title], ensure_ascii=False).encode('utf-8')
+            documents.write(DOCUMENT_RECORD.pack(docNo, len(blob), len(encoded), length, storeOffset, len(stored)))
+            blob += encoded
+            store.write(stored)
+            storeOffset += len(stored)
+        documents.write(blob)
+
+def readMeta(path):
+    '''
+    Lecture de la description de la génération courante d'un index
+    :param path: Le dossier de l'index
+    :return: La description de l'index, None si le dossier ne contient pas d'index
+    :rtype: dict
+    '''
+    try:
+        with open(os.path.join(path, META), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def openMap(filename):
+    '''
+    Projection en mémoire d'un fichier en lecture seule
+    :param filename: Le chemin du fichier
+    :return: La projection du fichier, ou une chaîne d'octets vide si le fichier est vide
+    :rtype: mmap.mmap
+    '''
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def lowerBound(count, keyAt, target):
+    '''
+    Recherche dichotomique du premier rang dont la clé n'est pas inférieure à target
+    :param count: Le nombre de rangs
+    :param keyAt: La fonction rang -> clé, croissante
+    :param target: La clé recherchée
+    :rtype: int
+    '''
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if keyAt(middle) < target:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+class PostingCursor:
+    '''
+    Curseur sur la liste compressée des postings d'un terme, décodée au fur et à mesure dans la projection en mémoire
+    Les pointeurs de saut placés tous les √n postings permettent de sauter des blocs entiers sans les décoder
+    '''
+
+    def __init__(self, data, offset, count, positionsData=None, positionsOffset=0):
+        '''
+        :param data: La projection en mémoire de postings.bin
+        :param offset: La position des données du terme
+        :param count: Le nombre de postings du terme
+        :param positionsData: La projection en mémoire de positions.bin pour un index positionnel
+        :param positionsOffset: La position des positions du terme dans positions.bin
+        '''
+        self.data = data
+        self.offset = offset
+        self.count = count
+        self.positionsData = positionsData
+        self.positionsBase = positionsOffset
+        self.step = skipStep(count)
+        self.nSkips = skipCount(count)
+        self.nextSkip = 0
+        # début des postings compressés, après la table des pointeurs de saut
+        self.start = offset + self.nSkips * SKIP.size
+        self.pos = self.start
+        self.positionsRelative = 0
+        self.position = -1
+        self.docNo = 0
+        self.next()
+
+    def next(self, knownDocNo=None):
+        '''
+        Décodage du posting suivant, docNo et freq valent None une fois la liste épuisée
+        :param knownDocNo: Le docNo du posting s'il est déjà connu (après un saut)
+        '''
+        self.position += 1
+        if self.position >= self.count:
+            self.docNo = self.freq = None
+            return
+        gap, self.pos = decodeVarint(self.data, self.pos)
+        self.docNo = knownDocNo if knownDocNo is not None else self.docNo + gap
+        self.freq, self.pos = decodeVarint(self.data, self.pos)
+        if self.positionsData is not None:
+            length, self.pos = decodeVarint(self.data, self.pos)
+            self.positionsOffset = self.positionsBase + self.positionsRelative
+            self.positionsRelative += length
+
+    def skipTo(self, target):
+        '''
+        Avancée jusqu'au premier posting dont le docNo est supérieur ou égal à target
+        :param target: Le docNo recherché
+        '''
+        if self.docNo is None or self.docNo >= target:
+            return
+        # dernier bloc dont le premier docNo ne dépasse pas target
+        jump = None
+        while self.nextSkip < self.nSkips:
+            entry = SKIP.unpack_from(self.data, self.offset + self.nextSkip * SKIP.size)
+            if entry[0] > target:
+                break
+            jump = (self.nextSkip, entry)
+            self.nextSkip += 1
+        if jump is not None:
+            block, (docNo, streamOffset, positionsRelative) = jump
+            first = (block + 1) * self.step
+            if first > self.position:
+                self.position = first - 1
+                self.pos = self.start + streamOffset
+                self.positionsRelative = positionsRelative
+                self.next(docNo)
+        while self.docNo is not None and self.docNo < target:
+            self.next()
+
+    def positions(self):
+        '''
+        Lecture des positions du terme dans le document courant
+        :return: La liste croissante des positions
+        :rtype: List
+        '''
+        if self.positionsData is None:
+            raise ValueError("L'index ne contient pas les positions des termes")
+        return decodeDeltas(self.positionsData, self.positionsOffset, self.freq)
+
+class DiskIndex:
+    '''
+    Index inversé lu sur disque : l'ouverture ne lit que les en-têtes, et une recherche
+    ne touche que les pages du lexique et des postings nécessaires à ses termes
+    '''
+
+    def __init__(self, path):
+        '''
+        :param path: Le dossier de l'index
+        '''
+        self.path = path
+        self.meta = readMeta(path)
+        if self.meta is None:
+            raise FileNotFoundError("Index introuvable : " + path)
+        if self.meta['format'] != FORMAT_VERSION:
+            raise ValueError("Version du format d'index non prise en charge : " + str(self.meta['format']))
+        genPath = os.path.join(path, self.meta['dossier'])
+
+        self.lexicon = openMap(os.path.join(genPath, LEXICON))
+        magic, _, self.nTerms = HEADER.unpack_from(self.lexicon, 0)
+        if magic != LEXICON_MAGIC:
+            raise ValueError("Lexique invalide : " + genPath)
+        self.blobOffset = HEADER.size + self.nTerms * LEXICON_RECORD.size
+
+        self.postingsFile = openMap(os.path.join(genPath, POSTINGS))
+        self.positional = self.meta['positions']
+        self.positionsFile = openMap(os.path.join(genPath, POSITIONS)) if self.positional else None
+
+        self.documents = openMap(os.path.join(genPath, DOCUMENTS))
+        magic, _, self.nDocs = HEADER.unpack_from(self.documents, 0)
+        if magic != DOCUMENTS_MAGIC:
+            raise ValueError("Table des documents invalide : " + genPath)
+        self.docBlobOffset = HEADER.size + self.nDocs * DOCUMENT_RECORD.size
+        self.store = openMap(os.path.join(genPath, STORE))
+        magic, _, _ = HEADER.unpack_from(self.store, 0)
+        if magic != STORE_MAGIC:
+            raise ValueError("Magasin des documents invalide : " + genPath)
+
+        self.permuterm = openMap(os.path.join(genPath, PERMUTERM))
+        magic, _, self.nRotations = HEADER.unpack_from(self.permuterm, 0)
+        if magic != PERMUTERM_MAGIC:
+            raise ValueError("Index permuterm invalide : " + genPath)
+
+        self.kgrams = openMap(os.path.join(genPath, KGRAMS))
+        magic, _, self.nGrams = HEADER.unpack_from(self.kgrams, 0)
+        if magic != KGRAMS_MAGIC:
+            raise ValueError("Index des k-grammes invalide : " + genPath)
+        self.gramBlobOffset = HEADER.size + self.nGrams * KGRAM_RECORD.size
+
+    @property
+    def generation(self):
+        '''
+        Le numéro de la génération ouverte
+        '''
+        return self.meta['generation']
+
+    def __len__(self):
+        return self.nTerms
+
+    @property
+    def avgLength(self):
+        '''
+        Le nombre moyen de lemmes par document
+        '''
+        return self.meta['longueurMoyenne']
+
+    def termAt(self, rank):
+        '''
+        Lecture du terme de rang donné dans le lexique trié
+        :param rank: Le rang du terme, entre 0 et len(self) - 1
+        :return: Le terme encodé en UTF-8
+        :rtype: bytes
+        '''
+        termOffset, termLength, _, _, _ = LEXICON_RECORD.unpack_from(self.lexicon, HEADER.size + rank * LEXICON_RECORD.size)
+        start = self.blobOffset + termOffset
+        return self.lexicon[start:start + termLength]
+
+    def find(self, term):
+        '''
+        Recherche dichotomique d'un terme dans le lexique
+        :param term: Le terme
+        :return: Le rang du terme, -1 s'il n'est pas dans le lexique
+        :rtype: int
+        '''
+        encoded = term.encode('utf-8')
+        low, high = 0, self.nTerms
+        while low < high:
+            middle = (low + high) // 2
+            if self.termAt(middle) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.nTerms and self.termAt(low) == encoded:
+            return low
+        return -1
+
+    def rotationAt(self, rank):
+        '''
+        Lecture d'une rotation de l'index permuterm
+        :param rank: Le rang de la rotation, entre 0 et self.nRotations - 1
+        :return: La rotation et le rang de son terme dans le lexique
+        :rtype: tuple
+        '''
+        termRank, shift = ROTATION.unpack_from(self.permuterm, HEADER.size + rank * ROTATION.size)
+        return rotate(self.termAt(termRank), shift), termRank
+
+    def expand(self, pattern, limit):
+        '''
+        Termes du lexique correspondant à un motif avec joker '*' (n'importe quelle suite de caractères)
+        Un motif sans joker en tête est une plage du lexique trié, les autres une plage de l'index permuterm ;
+        avec plus d'un joker, la plage est celle de la partie fixe la plus longue (début et fin ensemble, ou une
+        partie du milieu : les rotations qui commencent par elle), et ses termes sont vérifiés sur tout le motif
+        :param pattern: Le motif, contenant au moins un '*'
+        :param limit: Le nombre de termes au-delà duquel le parcours s'arrête
+        :return: Les termes triés, au plus limit + 1 pour signaler un dépassement, None si le motif est trop peu
+                 sélectif (plus de limit * EXPANSION_SCAN termes candidats à vérifier)
+        :rtype: List
+        '''
+        parts = pattern.split('*')
+        first, last = parts[0].encode('utf-8'), parts[-1].encode('utf-8')
+        middle = None
+        prefix = last + ROTATION_MARK + first if last else None
+        if len(parts) > 2:
+            middle = re.compile('.*'.join(re.escape(part) for part in parts) + r'\Z', re.DOTALL)
+            longest = max(parts[1:-1], key=len).encode('utf-8')
+            if len(longest) > len(first) + len(last):
+                prefix = longest
+        # sans vérification, les limit + 1 premiers candidats suffisent ; sinon, parcours borné
+        scan = limit + 1 if middle is None else limit * EXPANSION_SCAN
+        ranks = list()
+        if prefix is None:
+            # préfixe : plage du lexique trié
+            rank = lowerBound(self.nTerms, self.termAt, first)
+            while rank < self.nTerms and self.termAt(rank).startswith(first):
+                if len(ranks) == scan:
+                    if middle is None:
+                        break
+                    return None
+                ranks.append(rank)
+                rank += 1
+        else:
+            rank = lowerBound(self.nRotations, lambda r: self.rotationAt(r)[0], prefix)
+            while rank < self.nRotations:
+                rotation, termRank = self.rotationAt(rank)
+                if not rotation.startswith(prefix):
+                    break
+                if len(ranks) == scan:
+                    if middle is None:
+                        break
+                    return None
+                ranks.append(termRank)
+                rank += 1
+            # une partie du milieu peut apparaître plusieurs fois dans un terme
+            ranks = sorted(set(ranks))
+        terms = list()
+        for rank in ranks:
+            term = self.termAt(rank).decode('utf-8')
+            if middle is None or middle.match(term):
+                terms.append(term)
+                if len(terms) > limit:
+                    break
+        return terms
+
+    def gramAt(self, rank):
+        '''
+        Lecture d'un k-gramme de l'index des k-grammes
+        :param rank: Le rang du k-gramme, entre 0 et self.nGrams - 1
+        :return: Le k-gramme encodé en UTF-8
+        :rtype: bytes
+        '''
+        gramOffset, gramLength, _, _ = KGRAM_RECORD.unpack_from(self.kgrams, HEADER.size + rank * KGRAM_RECORD.size)
+        start = self.gramBlobOffset + gramOffset
+        return self.kgrams[start:start + gramLength]
+
+    def gramTerms(self, gram):
+        '''
+        Rangs des termes contenant un k-gramme
+        :param gram: Le k-gramme
+        :return: La liste croissante des rangs, vide si aucun terme ne le contient
+        :rtype: List
+        '''
+        encoded = gram.encode('utf-8')
+        rank = lowerBound(self.nGrams, self.gramAt, encoded)
+        if rank >= self.nGrams or self.gramAt(rank) != encoded:
+            return []
+        _, _, offset, count = KGRAM_RECORD.unpack_from(self.kgrams, HEADER.size + rank * KGRAM_RECORD.size)
+        return decodeDeltas(self.kgrams, offset, count)
+
+    def fuzzy(self, term, maxDistance, limit):
+        '''
+        Termes du lexique proches d'un terme, à une distance d'édition d'au plus maxDistance
+        Les candidats sont d'abord retenus par l'index des k-grammes : une modification détruit au plus KGRAM_SIZE
+        k-grammes, un terme à distance d doit donc partager au moins (nombre de k-grammes - KGRAM_SIZE * d)
+        k-grammes avec le terme cherché ; la distance n'est calculée que pour ces candidats
+        :param term: Le terme
+        :param maxDistance: La distance d'édition maximale
+        :param limit: Le nombre maximal de termes renvoyés
+        :return: Les termes les plus proches, par distance croissante puis par ordre alphabétique
+        :rtype: List
+        '''
+        grams = kgrams(term)
+        # pour un terme trop court, le filtre ne garantit rien : on exige au moins un k-gramme commun
+        threshold = max(1, len(grams) - KGRAM_SIZE * maxDistance)
+        shared = dict()
+        for gram in grams:
+            for rank in self.gramTerms(gram):
+                shared[rank] = shared.get(rank, 0) + 1
+        matches = list()
+        for rank, count in shared.items():
+            if count < threshold:
+                continue
+            candidate = self.termAt(rank).decode('utf-8')
+            distance = editDistance(term, candidate, maxDistance)
+            if distance <= maxDistance:
+                matches.append((distance, candidate))
+        matches.sort()
+        return [candidate for _, candidate in matches[:limit]]
+
+    def docFreq(self, term):
+        '''
+        Nombre de documents contenant un terme
+        :param term: Le terme
+        :return: La longueur de la liste des postings du terme
+        :rtype: int
+        '''
+        rank = self.find(term)
+        if rank < 0:
+            return 0
+        return LEXICON_RECORD.unpack_from(self.lexicon, HEADER.size + rank * LEXICON_RECORD.size)[3]
+
+    def postings(self, term):
+        '''
+        Lecture de la liste des postings d'un terme
+        :param term: Le terme
+        :return: La liste des (docNo, fréqLocale) triée par docNo, vide si le terme n'est pas dans le lexique
+        :rtype: List
+        '''
+        cursor = self.cursor(term)
+        result = list()
+        while cursor.docNo is not None:
+            result.append((cursor.docNo, cursor.freq))
+            cursor.next()
+        return result
+
+    def items(self):
+        '''
+        Parcours de tout l'index dans l'ordre du lexique
+        :return: Un générateur de couples (terme, liste des (docNo, fréqLocale) triée par docNo),
+                 la fréquence étant remplacée par la liste des positions si l'index est positionnel
+        :rtype: generator
+        '''
+        for rank in range(self.nTerms):
+            cursor = self.cursorAt(rank)
+            termPostings = list()
+            while cursor.docNo is not None:
+                termPostings.append((cursor.docNo, cursor.positions() if self.positional else cursor.freq))
+                cursor.next()
+            yield self.termAt(rank).decode('utf-8'), termPostings
+
+    def cursorAt(self, rank):
+        '''
+        Curseur à sauts sur la liste des postings du terme de rang donné
+        :param rank: Le rang du terme, entre 0 et len(self) - 1
+        :rtype: PostingCursor
+        '''
+        _, _, postingsOffset, count, positionsOffset = LEXICON_RECORD.unpack_from(
+            self.lexicon, HEADER.size + rank * LEXICON_RECORD.size)
+        return PostingCursor(self.postingsFile, postingsOffset, count, self.positionsFile, positionsOffset)
+
+    def cursor(self, term):
+        '''
+        Curseur à sauts sur la liste des postings d'un terme
+        :param term: Le terme
+        :return: Le curseur, vide si le terme n'est pas dans le lexique
+        :rtype: PostingCursor
+        '''
+        rank = self.find(term)
+        if rank < 0:
+            return PostingCursor(self.postingsFile, 0, 0, self.positionsFile)
+        return self.cursorAt(rank)
+
+    def positions(self, term, docNos):
+        '''
+        Lecture des positions d'un terme dans certains documents uniquement
+        :param term: Le terme
+        :param docNos: La liste triée des docNo
+        :return: Les positions {docNo: [positions]} pour les documents de la liste contenant le terme
+        :rtype: dict
+        '''
+        if not self.positional:
+            raise ValueError("L'index ne contient pas les positions des termes")
+        result = dict()
+        cursor = self.cursor(term)
+        for docNo in docNos:
+            cursor.skipTo(docNo)
+            if cursor.docNo is None:
+                break
+            if cursor.docNo == docNo:
+                result[docNo] = cursor.positions()
+        return result
+
+    def stats(self):
+        '''
+        Statistiques de taille de l'index, comparées à des postings non compressés (entiers de 32 bits)
+        :return: Les statistiques {nom: valeur}
+        :rtype: dict
+        '''
+        nPostings = 0
+        nPositions = 0
+        for rank in range(self.nTerms):
+            cursor = self.cursorAt(rank)
+            nPostings += cursor.count
+            if self.positional:
+                while cursor.docNo is not None:
+                    nPositions += cursor.freq
+                    cursor.next()
+        compressed = len(self.postingsFile) + (len(self.positionsFile) if self.positional else 0)
+        # format non compressé : (docNo, fréqLocale), plus la position des positions et les positions elles-mêmes
+        fixed = nPostings * FIXED_POSTING_SIZE
+        if self.positional:
+            fixed += nPostings * 4 + nPositions * FIXED_POSITION_SIZE
+        return {
+            'termes': self.nTerms,
+            'documents': self.nDocs,
+            'postings': nPostings,
+            'positions': nPositions,
+            'lexique': len(self.lexicon),
+            'permuterm': len(self.permuterm),
+            'kgrammes': len(self.kgrams),
+            'documentsOctets': len(self.documents),
+            'magasin': len(self.store),
+            'postingsNonCompresses': fixed,
+            'postingsCompresses': compressed,
+            'octetsParPostingAvant': fixed / nPostings if nPostings else 0.0,
+            'octetsParPostingApres': compressed / nPostings if nPostings else 0.0,
+        }
+
+    def terms(self):
+        '''
+        Parcours du lexique dans l'ordre
+        :return: Un générateur des termes
+        :rtype: generator
+        '''
+        for rank in range(self.nTerms):
+            yield self.termAt(rank).decode('utf-8')
+
+    def findDocument(self, docNo):
+        '''
+        Recherche dichotomique d'un document dans la table des documents
+        :param docNo: L'identifiant du document
+        :return: L'enregistrement (docNo, position, longueur, nombre de lemmes, position et longueur de la fiche)
+                 du document
+        :rtype: tuple
+        '''
+        low, high = 0, self.nDocs
+        while low < high:
+            middle = (low + high) // 2
+            if DOCUMENT_RECORD.unpack_from(self.documents, HEADER.size + middle * DOCUMENT_RECORD.size)[0] < docNo:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.nDocs:
+            record = DOCUMENT_RECORD.unpack_from(self.documents, HEADER.size + low * DOCUMENT_RECORD.size)
+            if record[0] == docNo:
+                return record
+        raise KeyError(docNo)
+
+    def document(self, docNo):
+        '''
+        Lecture de la description d'un document
+        :param docNo: L'identifiant du document
+        :return: Le couple (nom du fichier, titre)
+        :rtype: tuple
+        '''
+        _, offset, length, _, _, _ = self.findDocument(docNo)
+        start = self.docBlobOffset + offset
+        return tuple(json.loads(self.documents[start:start + length].decode('utf-8')))
+
+    def storedEntry(self, docNo):
+        '''
+        Lecture de la fiche d'un document dans le magasin, pour la recopier dans une nouvelle génération
+        :param docNo: L'identifiant du document
+        :return: La fiche codée par encodeStoredDocument avec le texte des lemmes, vide si le document n'en a pas
+        :rtype: bytes
+        '''
+        _, _, _, _, offset, length = self.findDocument(docNo)
+        if not length:
+            return b''
+        return unrankStoredDocument(self.store[offset:offset + length], self.termText)
+
+    def storedDocument(self, docNo):
+        '''
+        Lecture et décodage de la fiche d'un document, sans toucher aux autres fiches du magasin
+        :param docNo: L'identifiant du document
+        :return: La fiche décodée (voir decodeStoredDocument), None si le document n'en a pas
+        :rtype: dict
+        '''
+        _, _, _, _, offset, length = self.findDocument(docNo)
+        if not length:
+            return None
+        return decodeStoredDocument(self.store[offset:offset + length], self.termText)
+
+    def termText(self, rank):
+        '''
+        Terme de rang donné dans le lexique
+        :param rank: Le rang du terme
+        :rtype: String
+        '''
+        return self.termAt(rank).decode('utf-8')
+
+    def docLength(self, docNo):
+        '''
+        Nombre de lemmes indexés d'un document
+        :param docNo: L'identifiant du document
+        :rtype: int
+        '''
+        return self.findDocument(docNo)[3]
+
+    def docNos(self):
+        '''
+        Liste de tous les documents de l'index
+        :return: La liste triée des docNo
+        :rtype: List
+        '''
+        return [DOCUMENT_RECORD.unpack_from(self.documents, HEADER.size + rank * DOCUMENT_RECORD.size)[0]
+                for rank in range(self.nDocs)]
+
+    def allDocuments(self):
+        '''
+        Lecture de toute la table des documents
+        :return: La table des documents {docNo: (nom du fichier, titre, nombre de lemmes)}
+        :rtype: dict
+        '''
+        allTitle = dict()
+        for rank in range(self.nDocs):
+            docNo, offset, length, docLength, _, _ = DOCUMENT_RECORD.unpack_from(
+                self.documents, HEADER.size + rank * DOCUMENT_RECORD.size)
+            start = self.docBlobOffset + offset
+            allTitle[docNo] = tuple(json.loads(self.documents[start:start + length].decode('utf-8'))) + (docLength,)
+        return allTitle
+
+    def fingerprints(self):
+        '''
+        Lecture des empreintes des fichiers indexés
+        :return: Les empreintes {nom du fichier: empreinte}
+        :rtype: dict
+        '''
+        with open(os.path.join(self.path, self.meta['dossier'], FINGERPRINTS), encoding='utf-8') as f:
+            return json.load(f)
+
+    def close(self):
+        '''
+        Fermeture des projections en mémoire
+        '''
+        for mapped in (self.lexicon, self.postingsFile, self.positionsFile, self.documents, self.store,
+                       self.permuterm, self.kgrams):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
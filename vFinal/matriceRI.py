@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+###############################
+###########SYNOPSIS############
+###############################
+#
+# Auteurs : Sotiria BAMPATZANI
+#           Morgane DEHARENG
+#
+# But : classement d'un lot de requêtes en une seule fois sur une matrice creuse termes-documents
+#       (NumPy et SciPy, dépendances facultatives), pour les évaluations hors ligne de milliers de requêtes
+#
+# Usage : module importé par moteurRI.py (commande batch --matrice)
+#
+# Principe : les fréquences locales forment une matrice CSR (une ligne par terme, une colonne par document,
+#            dans l'ordre des docNo), dont on déduit une fois pour toutes les poids BM25 ou TF-IDF de chaque posting ;
+#            les requêtes du lot deviennent des matrices creuses (termes positifs, clauses obligatoires, facultatives
+#            et exclues) et quelques produits matriciels donnent les documents retenus et leurs scores ;
+#            les k meilleurs sont choisis avec argpartition, à score égal par docNo croissant comme requeteRI.topK
+#            Seules les requêtes booléennes à un niveau (termes, OR de termes, clauses +, - , AND, NOT) sont
+#            vectorisées, les expressions exactes et NEAR/k restent évaluées par requeteRI
+###############################
+
+import math
+import numpy
+import scipy.sparse
+import requeteRI
+
+def rowOf(matrix, row):
+    '''
+    Coefficients non nuls d'une ligne d'une matrice CSR, sans créer de matrice intermédiaire
+    :param matrix: La matrice
+    :param row: Le numéro de la ligne
+    :return: Les colonnes et les valeurs des coefficients
+    :rtype: tuple
+    '''
+    start, end = matrix.indptr[row], matrix.indptr[row + 1]
+    return matrix.indices[start:end], matrix.data[start:end]
+
+class MatrixIndex:
+    '''
+    Index en mémoire sous forme de matrice creuse termes-documents, construit à partir d'un index sur disque
+    '''
+
+    def __init__(self, index):
+        '''
+        :param index: L'index ouvert avec moteurRI.loadIndex (indexRI.DiskIndex ou partitionRI.PartitionedIndex)
+        '''
+        allTitle = index.allDocuments()
+        # colonne de chaque document : son rang dans l'ordre des docNo
+        self.docNos = numpy.array(sorted(allTitle), dtype=numpy.int64)
+        self.docLengths = numpy.array([allTitle[docNo][2] for docNo in self.docNos.tolist()], dtype=numpy.float64)
+        # statistiques de toute la collection, lues dans l'index comme pour requeteRI.rank
+        self.nDocs = index.nDocs
+        self.avgLength = index.avgLength
+
+        self.rows = dict()
+        indptr = [0]
+        indices = list()
+        data = list()
+        for term, termPostings in index.items():
+            self.rows[term] = len(self.rows)
+            docNos = numpy.fromiter((posting[0] for posting in termPostings), numpy.int64, len(termPostings))
+            if index.positional:
+                freqs = [len(positions) for _, positions in termPostings]
+            else:
+                freqs = [freq for _, freq in termPostings]
+            indices.append(numpy.searchsorted(self.docNos, docNos).astype(numpy.int32))
+            data.append(numpy.array(freqs, dtype=numpy.int32))
+            indptr.append(indptr[-1] + len(termPostings))
+        shape = (len(self.rows), len(self.docNos))
+        self.tf = scipy.sparse.csr_matrix((numpy.concatenate(data) if data else numpy.zeros(0, numpy.int32),
+                                           numpy.concatenate(indices) if indices else numpy.zeros(0, numpy.int32),
+                                           numpy.array(indptr, dtype=numpy.int64)), shape=shape)
+        self.docFreqs = numpy.diff(self.tf.indptr)
+        # présence des termes (0/1) pour évaluer les clauses, fréquences par document pour relever les fréqLocales
+        self.present = scipy.sparse.csr_matrix((numpy.ones(self.tf.nnz, dtype=numpy.int32), self.tf.indices,
+                                                self.tf.indptr), shape=shape)
+        self.byDoc = self.tf.tocsc()
+        self.byDoc.sort_indices()
+        # poids de chaque posting, calculés au premier lot classé avec chaque modèle
+        self.weights = dict()
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def nPostings(self):
+        '''
+        Le nombre de postings (coefficients non nuls) de la matrice
+        '''
+        return self.tf.nnz
+
+    def weightMatrix(self, ranking):
+        '''
+        Matrice des contributions de chaque posting au score, selon les formules de requeteRI.score
+        Les idf et les logarithmes sont calculés avec math.log et les opérations dans le même ordre,
+        pour obtenir exactement les mêmes scores que requeteRI.rank
+        :param ranking: Le modèle, 'bm25' ou 'tfidf'
+        :rtype: scipy.sparse.csr_matrix
+        '''
+        weights = self.weights.get(ranking)
+        if weights is not None:
+            return weights
+        tf = self.tf.data.astype(numpy.float64)
+        rows = numpy.repeat(numpy.arange(len(self.rows)), self.docFreqs)
+        nDocs = self.nDocs
+        if ranking == 'bm25':
+            idf = numpy.array([math.log(1 + (nDocs - df + 0.5) / (df + 0.5)) for df in self.docFreqs.tolist()])
+            if self.avgLength:
+                norm = requeteRI.BM25_K1 * (1 - requeteRI.BM25_B + requeteRI.BM25_B * self.docLengths / self.avgLength)
+            else:
+                norm = numpy.full(len(self.docNos), requeteRI.BM25_K1)
+            values = idf[rows] * tf * (requeteRI.BM25_K1 + 1) / (tf + norm[self.tf.indices])
+        else:
+            idf = numpy.array([math.log(nDocs / df) for df in self.docFreqs.tolist()])
+            # peu de fréquences distinctes : un logarithme par valeur
+            distinct, inverse = numpy.unique(self.tf.data, return_inverse=True)
+            logTf = numpy.array([1 + math.log(freq) for freq in distinct.tolist()])
+            values = logTf[inverse.ravel()] * idf[rows]
+        weights = self.weights[ranking] = scipy.sparse.csr_matrix((values, self.tf.indices, self.tf.indptr),
+                                                                  shape=self.tf.shape)
+        return weights
+
+    def clauses(self, plan):
+        '''
+        Décomposition d'un plan développé en clauses, chacune étant une disjonction de termes
+        :param plan: Le plan, sans motif (requeteRI.Node.expand)
+        :return: Les clauses obligatoires, facultatives et exclues (listes de listes de termes),
+                 None si le plan ne se ramène pas à des clauses (expression, NEAR/k, sous-requête imbriquée)
+        :rtype: tuple
+        '''
+        if isinstance(plan, requeteRI.Bool):
+            must, should, mustNot = plan.must, plan.should, plan.mustNot
+        else:
+            must, should, mustNot = [plan], [], []
+        clauses = list()
+        for children in (must, should, mustNot):
+            terms = list()
+            for child in children:
+                if isinstance(child, requeteRI.Term):
+                    terms.append([child.term])
+                elif isinstance(child, requeteRI.Or) and all(isinstance(term, requeteRI.Term)
+                                                            for term in child.children):
+                    terms.append([term.term for term in child.children])
+                else:
+                    return None
+            clauses.append(terms)
+        return tuple(clauses)
+
+    def queryMatrix(self, rowsOfQueries, nColumns, dtype=numpy.int32):
+        '''
+        Matrice creuse à une ligne par requête, dont les coefficients valent 1
+        :param rowsOfQueries: Pour chaque requête, la liste des colonnes non nulles, dans l'ordre de sommation voulu
+        :param nColumns: Le nombre de colonnes
+        :rtype: scipy.sparse.csr_matrix
+        '''
+        indptr = numpy.cumsum([0] + [len(columns) for columns in rowsOfQueries], dtype=numpy.int64)
+        indices = numpy.array([column for columns in rowsOfQueries for column in columns], dtype=numpy.int32)
+        # les colonnes ne sont pas triées : le produit matriciel additionne les termes dans l'ordre de la requête,
+        # comme requeteRI.score, et les scores sont identiques au bit près
+        return scipy.sparse.csr_matrix((numpy.ones(len(indices), dtype=dtype), indices, indptr),
+                                       shape=(len(rowsOfQueries), nColumns))
+
+    def rankBatch(self, plans, k=10, ranking='bm25'):
+        '''
+        Classement d'un lot de requêtes, avec les mêmes résultats que requeteRI.rank pour chacune
+        :param plans: Les plans développés (requeteRI.Node.expand), None pour une requête à ignorer
+        :param k: Le nombre de résultats de chaque requête
+        :param ranking: Le modèle, 'bm25' ou 'tfidf'
+        :return: Pour chaque plan, la liste des k meilleurs résultats (score, docNo, {terme: fréqLocale}),
+                 ou None si le plan n'est pas vectorisable et doit être évalué par requeteRI
+        :rtype: List
+        '''
+        results = [None] * len(plans)
+        if ranking not in ('bm25', 'tfidf'):
+            return results
+        selected = list()
+        positives = list()
+        clauseTerms = list()
+        kinds = ([], [], [])
+        for i, plan in enumerate(plans):
+            clauses = self.clauses(plan) if plan is not None else None
+            if clauses is None:
+                continue
+            selected.append(i)
+            # termes positifs dans l'ordre de la requête, comme requeteRI.rank
+            positives.append([term for term in dict.fromkeys(plan.positiveTerms()) if term in self.rows])
+            for kind, kindClauses in zip(kinds, clauses):
+                kind.append(list(range(len(clauseTerms), len(clauseTerms) + len(kindClauses))))
+                # un terme absent du lexique ne satisfait aucune clause
+                clauseTerms.extend(sorted({self.rows[term] for term in terms if term in self.rows})
+                                   for terms in kindClauses)
+        if not selected or k <= 0:
+            for i in selected:
+                results[i] = list()
+            return results
+
+        # clauses satisfaites par chaque document (0/1), puis nombre de clauses de chaque sorte par requête
+        satisfied = self.queryMatrix(clauseTerms, len(self.rows)) @ self.present
+        satisfied.data[:] = 1
+        mustCounts, shouldCounts, mustNotCounts = [(self.queryMatrix(kind, len(clauseTerms)) @ satisfied).tocsr()
+                                                   for kind in kinds]
+        nMust = [len(clauses) for clauses in kinds[0]]
+        nShould = [len(clauses) for clauses in kinds[1]]
+        queryTerms = [[self.rows[term] for term in terms] for terms in positives]
+        scores = self.queryMatrix(queryTerms, len(self.rows), numpy.float64) @ self.weightMatrix(ranking)
+        scores = scores.tocsr()
+        scores.sort_indices()
+
+        allColumns = numpy.arange(len(self.docNos))
+        for row, i in enumerate(selected):
+            if nMust[row]:
+                indices, counts = rowOf(mustCounts, row)
+                columns = numpy.sort(indices[counts == nMust[row]])
+            elif nShould[row]:
+                indices, counts = rowOf(shouldCounts, row)
+                columns = numpy.sort(indices[counts > 0])
+            else:
+                # requête uniquement négative : on part de tous les documents
+                columns = allColumns
+            excluded, _ = rowOf(mustNotCounts, row)
+            if len(excluded) and len(columns):
+                columns = columns[numpy.isin(columns, excluded, invert=True)]
+            results[i] = self.topK(columns, rowOf(scores, row), k, queryTerms[row], positives[row])
+        return results
+
+    def topK(self, columns, scores, k, queryTerms, terms):
+        '''
+        Sélection des k meilleurs documents retenus par une requête
+        :param columns: Les colonnes des documents retenus, triées
+        :param scores: Les colonnes non nulles, triées, de la ligne des scores de la requête et leurs scores
+        :param k: Le nombre de résultats à conserver
+        :param queryTerms: Les lignes des termes positifs de la requête
+        :param terms: Les termes positifs correspondants
+        :return: Les k meilleurs triplets (score, docNo, {terme: fréqLocale}), par score décroissant puis docNo croissant
+        :rtype: List
+        '''
+        if not len(columns) or k <= 0:
+            return list()
+        scored, scoreValues = scores
+        values = numpy.zeros(len(columns))
+        # les documents retenus sans terme positif ont un score nul
+        where = numpy.searchsorted(columns, scored)
+        inside = where < len(columns)
+        inside[inside] = columns[where[inside]] == scored[inside]
+        values[where[inside]] = scoreValues[inside]
+        if len(columns) > k:
+            best = numpy.argpartition(values, len(values) - k)[len(values) - k:]
+            # les ex aequo du k-ième score sont tous gardés pour être départagés par docNo
+            keep = numpy.flatnonzero(values >= values[best].min())
+            columns, values = columns[keep], values[keep]
+        order = numpy.lexsort((columns, -values))[:k]
+        results = list()
+        for column, value in zip(columns[order].tolist(), values[order].tolist()):
+            start, end = self.byDoc.indptr[column], self.byDoc.indptr[column + 1]
+            docRows = self.byDoc.indices[start:end]
+            freqs = dict()
+            for row, term in zip(queryTerms, terms):
+                position = numpy.searchsorted(docRows, row)
+                if position < len(docRows) and docRows[position] == row:
+                    freqs[term] = int(self.byDoc.data[start + position])
+            results.append((value, int(self.docNos[column]), freqs))
+        return results
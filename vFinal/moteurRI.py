@@ -1,285 +1,1677 @@
-
-#!/usr/bin/env python3
-# -*- coding: utf-8 -*-
-###############################
-###########SYNOPSIS############
-###############################
-#
-# Auteurs : Sotiria BAMPATZANI
-#           Morgane DEHARENG
-#
-# Date : 18/04/18
-#
-# But : réalisation d'un petit moteur de recherche pour effectuer des requêtes booléennes sur un corpus donné
-#
-# Usage : python3 moteurRI.py
-#
-# Documentation : générée à l'aide de la commande 'pydoc -w .\moteurRI.py'
-###############################
-
-import os
-import re
-import sys
-import glob
-import spacy
-import fr_core_news_sm
-import nltk
-
-def openFile(f):
-    '''
-    Lecture d'un fichier
-    :param f: Le nom du fichier
-    :return: Un identifiant vers le fichier ouvert, que l'on peut ensuite utiliser pour lire et écrire dans le fichier
-    :rtype: TextIOWrapper
-    '''
-    fi = open(f, encoding='utf8')
-    return fi
-
-def extractTitle(f):
-    '''
-    Lecture de la première ligne d'un fichier
-    :param f: Le nom d'un fichier déjà ouvert avec la fonction openFile
-    :return: Le titre du document se trouvant dans la première ligne
-    :rtype: String
-    '''
-    firstLine = f.readline().replace('\n', '').rstrip()
-    title = firstLine.split(None, 1)[1]
-    return title
-
-def normalizeFile(f):
-    '''
-    Normalisation de base d'un fichier
-    :param f: Le nom du fichier
-    :return: Une variable conteant le contenu du fichier en une string
-    :rtype: String
-    '''
-    fnorm = f.read().replace('\n', ' ')
-    fnorm = fnorm.rstrip()
-    return fnorm
-
-def tokenizeText(text, encoding='utf8'):
-    '''
-    Normalisation et tokenisation du texte
-    :param text: Le contenu du fichier en une variable String
-    :return: Une liste des tokens du fichier
-    :rtype: List
-    '''
-    text = text.replace("’", "'")
-    text = text.replace('«', '"')
-    text = text.replace('»', '"')
-    tokens = nltk.word_tokenize(text)
-    return tokens
-
-def normalizeFile73(f):
-    '''
-    Normalisation d'un fichier illisible
-    :param f: Le chemin du fichier à traiter
-    :return: Le contenu normalisé du fichier en une variable String
-    :rtype: String
-    '''
-    file = openFile(f)
-    title = extractTitle(file)
-    text = normalizeFile(file)
-    listTokens = tokenizeText(text)
-
-    newTokens = list()
-    for token in listTokens:
-        if len(token) > 1:
-            newToken = token[:-1]
-            if len(newToken) == 1:
-                newToken = newToken.replace('i', 'il')
-            newToken = newToken.replace('queu', 'que')
-            newToken = newToken.replace('celuio-ci', 'celui-ci')
-            newToken = newToken.replace('quh', 'qu')
-            newToken = newToken.replace('Sainteu-Lazare', 'Saint-Lazare')
-            newToken = newToken.replace('pardessusssssssssssssssssssss', 'pardessus')
-            newTokens.append(newToken)
-        else:
-            newTokens.append(token)
-    return '73. ' + title + '\n' + ' '.join(newTokens)
-
-def removeStopwords(text, encoding='utf8'):
-    '''
-    Suppression des mots vides (stopwords)
-    :param text: Le contenu du fichier en une variable String
-    :return: Une liste des tokens du fichier sans les mots vides
-    :rtype: List
-    '''
-    stopWords = set(nltk.corpus.stopwords.words('french'))
-    tokens = tokenizeText(text)
-    tokens = [w.lower() for w in tokens if w.isalpha()]
-    filteredTokens = [word for word in tokens if not word in stopWords]
-    filteredTokens = []
-    for word in tokens:
-        if word not in stopWords:
-            filteredTokens.append(word)
-    return filteredTokens
-
-def LemmatizeWords(listWords):
-    '''Lemmatisation
-    :param listWords: Une liste des tokens
-    :return: Une liste des tokens lemmatisés
-    :rtype: List
-    '''
-    listLemmas = list()
-    strWords = " ".join(str(word) for word in listWords)
-    nlp = fr_core_news_sm.load()
-    strLemmas = nlp(strWords)
-    for frLemma in strLemmas:
-        listLemmas.append(frLemma.lemma_)
-    return listLemmas
-
-def freqInDoc(term, listWords):
-    '''
-    Calcul de la fréquence locale dans le texte tokenisé et lemmatisé
-    :param term: Le terme, une string
-    :param listWords: Une liste de termes
-    :return: La fréquence d'un terme dans une liste
-    :rtype: int
-    '''
-    return listWords.count(term)
-
-def word2index():
-    '''
-    Récupération de la requête entrée par l'utilisateur sur la ligne de commande
-    :return: Une liste contenant les mots de la requête à traiter
-    :rtype: list
-    '''
-    query = str(input())
-    words = list()
-
-    # s'il y a des espaces
-    if ' ' in query:
-        # création d'une liste contenant les mots recherchés
-        words = query.split(" ")
-
-        # pour chaque mot de la liste
-        for i, word in enumerate(words):
-            # si le mot commence avec '-' on le supprime de la liste finale
-            if word.startswith('-'):
-                words.remove(word)
-            # si le mot commence avec '+' on supprime le caractère '+' du début et on garde le mot
-            elif word.startswith('+'):
-                words[i] = word[1:]
-
-    # sinon, il n'y a qu'un seul mot dans la requête
-    else:
-        words.append(query)
-    
-    return words
-
-# main
-if __name__ == "__main__":
-
-    # traitement d'un fichier illisible
-    file73 = normalizeFile73('.\ExercicesDeStyle\_txt\exercice73!.txt')
-    with open('.\ExercicesDeStyle\_txt\exercice73.txt', 'w', encoding='utf-8') as file:
-        file.write(file73)
-
-    # chemin vers le dossier contenant les fichiers à indexer
-    pathdir = ".\ExercicesDeStyle"
-
-    try:
-        os.path.exists(pathdir)
-    except EnvironmentError:
-        print("Problème avec le chemin vers le dossier contenant les fichiers")
-    else:
-        # déclaration et initialisation des variables
-        docNo = 0
-        freqGlobale = 0
-        allFreqLoc = list()
-        allTitleLoc = list()
-        indexInverse = dict()
-        indexTitle = dict()
-
-        print("Traitement du dossier :", pathdir)
-        print("Votre recherche :")
-
-        # on sauvegarde la requête de l'utilisateur dans une liste search
-        search = word2index()
-        
-        # pour chaque document
-        # on ne prend en compte que les documents à indexer, autrement dit, ceux qui n'ont pas un '!' avant l'extension
-        for filename in glob.glob(os.path.join(pathdir, '_txt\*[0-9].txt')):
-            docNo += 1
-
-            # ouverture du fichier
-            f = openFile(filename)
-
-            # association d'un identifiant avec le nom du doc
-            idDoc = dict()
-            dictname = os.path.basename(filename)
-            idDoc[dictname] = docNo
-            print("Traitement du fichier :", dictname)
-
-            # extraction du titre
-            docTitle = extractTitle(f)
-
-            # création d'une table de correspondance entre le titre, l'url et l'identifiant
-            allTitle = dict()
-            if docNo not in allTitle.keys():
-                allTitle.setdefault(docNo, (dictname, docTitle))
-
-            # prétraitement du texte extrait à l'aide des fonctions normalizeFile, removeStopwords et LemmatizeWords
-            content = normalizeFile(f)
-            contentTokenized = removeStopwords(content)
-            contentLemmatized = LemmatizeWords(contentTokenized)
-
-            # pour chaque mot de la requête
-            for word in search:
-
-                # si le(s) mot(s) recherché(s) par l'utilisateur existe(nt) dans le fichier
-                if word in contentLemmatized:
-
-                    # calcul de la fréquence locale
-                    freqLocale = freqInDoc(word, contentLemmatized)
-
-                    # association de cette fréquence avec l'id du doc
-                    wordFreqLoc = dict()
-                    wordFreqTitle = dict()
-                    # pour l'index inversé
-                    wordFreqLoc[word] = {docNo: freqLocale}
-                    # pour l'affichage des documents trouvés
-                    wordFreqTitle[word] = {allTitle[docNo] : freqLocale}
-
-                    # création d'une liste contenant tous les docs ayant le mot recherché avec sa fréquence
-                    allFreqLoc.append(wordFreqLoc)
-                    allTitleLoc.append(wordFreqTitle)
-
-                    # calcul de la fréquence globale
-                    freqGlobale = freqGlobale + freqLocale
-                
-                    # création de l'index inversé
-                    indexInverse = {freqGlobale : allFreqLoc}
-                    indexTitle = {freqGlobale : allTitleLoc}
-
-        # si l'index inversé a été créé, autrement dit, si le(s) mot(s) recherché(s) existe(nt) dans le corpus
-        if len(indexInverse) > 0:
-            print("\nSauvegarde de l'index inversé")
-            with open("indexInverse.txt", 'w') as index:
-                index.write(str(indexInverse))
-            # pour la requête "chapeau +pardessus -cou" :
-            # {7: [{'chapeau': {1: 1}}, {'pardessus': {1: 1}}, {'chapeau': {2: 1}}, {'chapeau': {3: 1}}, {'pardessus': {3: 1}}, {'chapeau': {4: 1}}, {'pardessus': {4: 1}}]}
-            # où :
-            # {fréquence de tous les termes dans tous les documents : {mot: [{docNo: fréqLocale}}, {mot: [{docNo: fréqLocale}} ...]}
-
-        # sinon
-        else:
-            print("Le mot(s) recherché(s) n'existe(nt) pas dans le corpus")
-        print("\nNombre total de fichiers traités :", docNo)
-        print("Nombre total d'occurrences trouvées :", freqGlobale)
-
-        # affichage des documents trouvés
-        print("\nDocuments trouvés : ")
-        for items in allTitleLoc:
-            for value in items:
-                query = str(value)
-                for val in items.values():
-                    for doc in val.keys():
-                        url = str(doc[0])
-                        title = str(doc[1])
-                    for freq in val.values():
-                        frequency = str(freq)
-            print(title + " - " + url + " : " + frequency + " occurrence(s) de " + query )
-
-    print("\nDone")
\ No newline at end of file
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+###############################
+###########SYNOPSIS############
+###############################
+#
+# Auteurs : Sotiria BAMPATZANI
+#           Morgane DEHARENG
+#
+# Date : 18/04/18
+#
+# But : réalisation d'un petit moteur de recherche pour effectuer des requêtes booléennes sur un corpus donné
+#
+# Usage : python3 moteurRI.py index [--corpus DOSSIER] [--index DOSSIER] [--reparations FICHIER.json]
+#                                   [--tokenizer nltk|regex] [--lemmatizer spacy|snowball|lefff|none]
+#                                   [--partitions N] [--memoire MO] [--textes]
+#                                   [--profile] [--profile-dump FICHIER.prof]
+#         python3 moteurRI.py search [--index DOSSIER] [--extraits] [--] [requête]
+#         python3 moteurRI.py repl [--index DOSSIER] [--ranking bm25]
+#         python3 moteurRI.py batch [--index DOSSIER] [--requetes FICHIER] [--sortie FICHIER] [--matrice]
+#         python3 moteurRI.py stats [--index DOSSIER]
+#         (le séparateur '--' est nécessaire si la requête commence par un '-')
+#
+# Documentation : générée à l'aide de la commande 'pydoc -w .\moteurRI.py'
+###############################
+
+import os
+import re
+import sys
+import glob
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+import cProfile
+import itertools
+import time
+from collections import Counter
+from collections import OrderedDict
+# nltk, fr_core_news_sm (spaCy) et multiprocessing sont importés au premier usage, pendant l'indexation
+# ou pour un terme de requête absent du cache des lemmes : la recherche et l'aide démarrent sans eux
+import indexRI
+import requeteRI
+import profilRI
+import partitionRI
+import reparationRI
+import extraitRI
+
+# règles de réparation des documents illisibles utilisées par défaut
+REPAIRS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reparations.json')
+
+def openFile(f):
+    '''
+    Lecture d'un fichier
+    :param f: Le nom du fichier
+    :return: Un identifiant vers le fichier ouvert, que l'on peut ensuite utiliser pour lire et écrire dans le fichier
+    :rtype: TextIOWrapper
+    '''
+    fi = open(f, encoding='utf8')
+    return fi
+
+def extractTitle(f):
+    '''
+    Lecture de la première ligne d'un fichier
+    :param f: Le nom d'un fichier déjà ouvert avec la fonction openFile
+    :return: Le titre du document se trouvant dans la première ligne
+    :rtype: String
+    '''
+    firstLine = f.readline().replace('\n', '').rstrip()
+    title = firstLine.split(None, 1)[1]
+    return title
+
+def normalizeFile(f):
+    '''
+    Normalisation de base d'un fichier
+    :param f: Le nom du fichier
+    :return: Une variable conteant le contenu du fichier en une string
+    :rtype: String
+    '''
+    fnorm = f.read().replace('\n', ' ')
+    fnorm = fnorm.rstrip()
+    return fnorm
+
+# découpages disponibles : nltk.word_tokenize, ou une seule expression régulière (voir regexTokens)
+TOKENIZERS = ('nltk', 'regex')
+
+# élisions du français, détachées du mot qui suit par le découpage 'regex' : l'homme, qu'il, jusqu'au
+ELISION = r"(?:jusqu|lorsqu|puisqu|quoiqu|presqu|quelqu|qu|[cdjlmnst])['’]"
+# séparateurs de mots : les espaces et la ponctuation que nltk.word_tokenize détache des mots
+SEPARATORS = r"\s.,;:!?()\[\]{}<>\"«»“”@#$%&"
+# un mot alphabétique, éventuellement précédé d'une élision, entre deux séparateurs ou entre apostrophes :
+# comme avec nltk, un mot collé à un autre caractère (trait d'union, chiffre, apostrophe hors élision) n'est pas retenu
+WORD = re.compile(r"(?<![^%s])['’]?(?:%s)?([^\W\d_]+)(?=['’]?(?![^%s]))" % (SEPARATORS, ELISION, SEPARATORS),
+                  re.IGNORECASE)
+ELIDED = re.compile(ELISION, re.IGNORECASE)
+
+# mots vides du français, chargés une seule fois
+frenchStopwords = None
+
+def stopWords():
+    '''
+    Mots vides (stopwords) du français fournis par NLTK, chargés au premier appel
+    :rtype: frozenset
+    '''
+    global frenchStopwords
+    if frenchStopwords is None:
+        import nltk
+        frenchStopwords = frozenset(nltk.corpus.stopwords.words('french'))
+    return frenchStopwords
+
+def tokenizeText(text, encoding='utf8'):
+    '''
+    Normalisation et tokenisation du texte
+    :param text: Le contenu du fichier en une variable String
+    :return: Une liste des tokens du fichier
+    :rtype: List
+    '''
+    text = text.replace("’", "'")
+    text = text.replace('«', '"')
+    text = text.replace('»', '"')
+    import nltk
+    tokens = nltk.word_tokenize(text)
+    return tokens
+
+def regexTokens(text):
+    '''
+    Tokenisation rapide en une passe, sans NLTK : mots alphabétiques en minuscules, élisions détachées,
+    apostrophes typographiques et guillemets reconnus sans remplacement préalable, mots vides écartés
+    :param text: Le contenu du fichier en une variable String
+    :return: Un générateur des tokens du fichier sans les mots vides
+    :rtype: generator
+    '''
+    stopWordsSet = stopWords()
+    for match in WORD.finditer(text):
+        word = match.group(1).lower()
+        if word not in stopWordsSet:
+            yield word
+
+def removeStopwords(text, encoding='utf8', tokenizer='nltk'):
+    '''
+    Suppression des mots vides (stopwords)
+    :param text: Le contenu du fichier en une variable String
+    :param tokenizer: Le découpage en tokens, 'nltk' (tokenizeText) ou 'regex' (regexTokens)
+    :return: Une liste des tokens du fichier sans les mots vides
+    :rtype: List
+    '''
+    if tokenizer == 'regex':
+        return list(regexTokens(text))
+    stopWordsSet = stopWords()
+    return [word for word in (token.lower() for token in tokenizeText(text) if token.isalpha())
+            if word not in stopWordsSet]
+
+class LemmaCache:
+    '''
+    Cache des lemmes indexé par la forme de surface des tokens, borné avec éviction LRU
+    et sauvegardé d'une exécution à l'autre
+    '''
+
+    def __init__(self, capacity=100000, entries=()):
+        '''
+        :param capacity: Le nombre maximal de tokens conservés
+        :param entries: Les couples (token, lemme) initiaux, du moins récemment utilisé au plus récent
+        '''
+        self.capacity = capacity
+        self.entries = OrderedDict(entries)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        self.hits = 0
+        self.misses = 0
+        # tokens appris depuis le dernier appel à takeDelta, renvoyés par les processus de travail
+        self.learned = dict()
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, token, occurrences=1):
+        '''
+        Lecture du lemme d'un token
+        :param token: Le token
+        :param occurrences: Le nombre d'occurrences du token servies par cette lecture, pour le taux de succès
+        :return: Le lemme, None si le token n'est pas dans le cache
+        :rtype: String
+        '''
+        lemma = self.entries.get(token)
+        if lemma is None:
+            self.misses += occurrences
+        else:
+            self.entries.move_to_end(token)
+            self.hits += occurrences
+        return lemma
+
+    def put(self, token, lemma):
+        '''
+        Ajout du lemme d'un token, le token le moins récemment utilisé est évincé si le cache est plein
+        :param token: Le token
+        :param lemma: Son lemme
+        '''
+        self.entries[token] = lemma
+        self.entries.move_to_end(token)
+        self.learned[token] = lemma
+        self.dirty = True
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def hitRate(self):
+        '''
+        Proportion des occurrences de tokens servies par le cache, sans passer par spaCy
+        :rtype: float
+        '''
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def takeDelta(self):
+        '''
+        Récupération des tokens appris et des compteurs depuis le dernier appel, qui sont remis à zéro
+        :return: Le triplet ({token: lemme}, succès, échecs)
+        :rtype: tuple
+        '''
+        delta = (self.learned, self.hits, self.misses)
+        self.learned = dict()
+        self.hits = 0
+        self.misses = 0
+        return delta
+
+    def absorb(self, delta):
+        '''
+        Ajout des tokens appris et des compteurs d'un autre cache, renvoyés par takeDelta
+        :param delta: Le triplet ({token: lemme}, succès, échecs)
+        '''
+        learned, hits, misses = delta
+        for token, lemma in learned.items():
+            self.put(token, lemma)
+        self.hits += hits
+        self.misses += misses
+
+    def save(self, path):
+        '''
+        Sauvegarde du cache au format JSON, dans l'ordre LRU
+        :param path: Le chemin du fichier
+        '''
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(list(self.entries.items()), f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path, capacity=100000):
+        '''
+        Chargement d'un cache sauvegardé avec save
+        :param path: Le chemin du fichier
+        :param capacity: Le nombre maximal de tokens conservés
+        :return: Le cache, vide si le fichier n'existe pas
+        :rtype: LemmaCache
+        '''
+        try:
+            with open(path, encoding='utf-8') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            entries = ()
+        return cls(capacity, entries)
+
+# normalisations disponibles : lemmes spaCy, racines Snowball (NLTK), lemmes du dictionnaire Lefff, ou aucune
+LEMMATIZERS = ('spacy', 'snowball', 'lefff', 'none')
+
+class Lemmatizer:
+    '''
+    Lemmatiseur partagé : le modèle spaCy n'est chargé qu'au premier token absent du cache des lemmes,
+    sans les composants inutiles à la lemmatisation, et les tokens inconnus sont traités par lots à l'aide de nlp.pipe
+    Les normalisations plus rapides (racinisation Snowball, dictionnaire Lefff) passent par le même cache,
+    la normalisation 'none' garde les tokens tels quels
+    '''
+
+    # composants du pipeline dont on n'utilise pas le résultat
+    disabledPipes = ('parser', 'ner')
+
+    def __init__(self, batchSize=50, cache=None, backend='spacy'):
+        '''
+        :param batchSize: Le nombre de documents traités par lot
+        :param cache: Le cache des lemmes, un cache vide par défaut
+        :param backend: La normalisation des tokens, parmi LEMMATIZERS
+        '''
+        self.batchSize = batchSize
+        self.cache = cache if cache is not None else LemmaCache()
+        self.backend = backend
+        self._nlp = None
+        self._normalizer = None
+
+    @property
+    def nlp(self):
+        '''
+        Le modèle spaCy, chargé au premier usage
+        '''
+        if self._nlp is None:
+            import fr_core_news_sm
+            self._nlp = fr_core_news_sm.load(disable=list(self.disabledPipes))
+        return self._nlp
+
+    @property
+    def normalizer(self):
+        '''
+        La fonction token -> forme normalisée des normalisations sans spaCy, chargée au premier usage
+        '''
+        if self._normalizer is None:
+            if self.backend == 'snowball':
+                from nltk.stem.snowball import FrenchStemmer
+                self._normalizer = FrenchStemmer().stem
+            elif self.backend == 'lefff':
+                from FrenchLefffLemmatizer.FrenchLefffLemmatizer import FrenchLefffLemmatizer
+                lefff = FrenchLefffLemmatizer()
+
+                def lookup(token):
+                    lemma = lefff.lemmatize(token)
+                    # un token absent du dictionnaire est conservé tel quel
+                    return lemma if isinstance(lemma, str) and lemma else token
+
+                self._normalizer = lookup
+            else:
+                raise ValueError("Lemmatiseur inconnu : " + self.backend)
+        return self._normalizer
+
+    def lemmatizeMissing(self, tokens):
+        '''
+        Lemmatisation de tokens absents du cache, qui y sont ajoutés
+        Chaque token est lemmatisé hors contexte, pour que son lemme ne dépende que de sa forme de surface
+        :param tokens: La liste des tokens, sans doublons
+        :return: Les lemmes {token: lemme}
+        :rtype: dict
+        '''
+        lemmas = dict()
+        if self.backend != 'spacy':
+            normalize = self.normalizer
+            for token in tokens:
+                lemmas[token] = normalize(token)
+                self.cache.put(token, lemmas[token])
+            return lemmas
+        for token, doc in zip(tokens, self.nlp.pipe(tokens, batch_size=1000)):
+            # un token découpé en plusieurs par spaCy est conservé tel quel
+            lemmas[token] = doc[0].lemma_ if len(doc) == 1 else token
+            self.cache.put(token, lemmas[token])
+        return lemmas
+
+    def lemmatize(self, listWords):
+        '''
+        Lemmatisation d'une liste de tokens
+        :param listWords: Une liste des tokens
+        :return: Une liste des tokens lemmatisés, un lemme par token
+        :rtype: List
+        '''
+        return next(self.lemmatizeStream([(listWords, None)]))[0]
+
+    def lemmatizeWord(self, word):
+        '''
+        Lemmatisation d'un terme de requête, normalisé comme les tokens indexés
+        :param word: Le terme
+        :return: Le lemme du terme
+        :rtype: String
+        '''
+        return self.lemmatize([word.lower()])[0]
+
+    def lemmatizeStream(self, documents):
+        '''
+        Lemmatisation d'un flux de documents par lots
+        Seuls les tokens distincts absents du cache de chaque lot sont envoyés à spaCy
+        :param documents: Un itérable de couples (liste des tokens, contexte), le contexte est renvoyé tel quel
+        :return: Un générateur de couples (liste des tokens lemmatisés, contexte), dans l'ordre d'entrée
+        :rtype: generator
+        '''
+        if self.backend == 'none':
+            # ni modèle ni cache : les tokens sont indexés tels quels
+            for listWords, context in documents:
+                yield [str(word) for word in listWords], context
+            return
+        documents = iter(documents)
+        while True:
+            batch = list(itertools.islice(documents, self.batchSize))
+            if not batch:
+                return
+            occurrences = Counter(str(word) for listWords, _ in batch for word in listWords)
+            lemmas = dict()
+            missing = list()
+            for word, count in occurrences.items():
+                lemma = self.cache.get(word, count)
+                if lemma is None:
+                    missing.append(word)
+                else:
+                    lemmas[word] = lemma
+            if missing:
+                lemmas.update(self.lemmatizeMissing(missing))
+            for listWords, context in batch:
+                yield [lemmas[str(word)] for word in listWords], context
+
+# lemmatiseur partagé par tout le module
+sharedLemmatizer = Lemmatizer()
+
+def LemmatizeWords(listWords):
+    '''Lemmatisation
+    :param listWords: Une liste des tokens
+    :return: Une liste des tokens lemmatisés
+    :rtype: List
+    '''
+    return sharedLemmatizer.lemmatize(listWords)
+
+def freqInDoc(term, listWords):
+    '''
+    Calcul de la fréquence locale dans le texte tokenisé et lemmatisé
+    :param term: Le terme, une string
+    :param listWords: Une liste de termes
+    :return: La fréquence d'un terme dans une liste
+    :rtype: int
+    '''
+    return listWords.count(term)
+
+def word2index(query=None, lemmatizer=sharedLemmatizer, fuzzy=0, tokenizer='nltk'):
+    '''
+    Récupération de la requête entrée par l'utilisateur et analyse en un plan d'exécution
+    Les mots préfixés par '+' sont obligatoires, ceux préfixés par '-' excluent les documents qui les contiennent,
+    les opérateurs AND, OR, NOT, NEAR/k, les parenthèses et les expressions entre guillemets sont aussi acceptés (voir requeteRI)
+    :param query: La requête sous forme de String, lue sur l'entrée standard si elle n'est pas fournie
+    :param lemmatizer: Le lemmatiseur appliqué aux termes de la requête, comme à l'indexation
+    :param fuzzy: La distance d'édition maximale des termes absents du lexique (mode approché), 0 pour le désactiver
+    :param tokenizer: Le découpage en tokens utilisé pour construire l'index (voir queryTokenizer)
+    :return: Le plan d'exécution de la requête
+    :rtype: requeteRI.Node
+    '''
+    if query is None:
+        query = str(input())
+    # une expression entre guillemets subit le même prétraitement qu'un document, pour que les positions correspondent
+    analyze = lambda text: lemmatizer.lemmatize(removeStopwords(text, tokenizer=tokenizer))
+    normalize = lemmatizer.lemmatizeWord
+    if tokenizer == 'regex':
+        # l'élision d'un terme est détachée comme dans les documents : l'homme -> homme
+        normalize = lambda word: lemmatizer.lemmatizeWord(ELIDED.sub('', word, 1) if ELIDED.match(word) else word)
+    return requeteRI.parseQuery(query, normalize, analyze, fuzzy=fuzzy)
+
+def queryTokenizer(index):
+    '''
+    Découpage en tokens avec lequel un index a été construit, à appliquer aux requêtes
+    :param index: L'index ouvert avec loadIndex
+    :return: 'nltk' ou 'regex', 'nltk' pour un index construit avant le choix du découpage
+    :rtype: String
+    '''
+    return (index.meta.get('pretraitement') or dict()).get('tokenisation', 'nltk')
+
+def locateTokens(text, tokens):
+    '''
+    Positions des tokens retenus dans le texte, pour les extraits des résultats (voir extraitRI)
+    Chaque token est cherché après le précédent comme un mot entier : un token découpé à l'intérieur d'un mot
+    (nltk sépare parfois des mots composés) est retrouvé à défaut comme une partie de mot
+    :param text: Le texte dont les tokens ont été extraits par removeStopwords
+    :param tokens: La liste des tokens, en minuscules, dans l'ordre du texte
+    :return: La liste des positions (début, fin) en caractères de chaque token, None si un token est introuvable
+    :rtype: List
+    '''
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # mise en minuscules qui change la longueur du texte (İ) : positions inutilisables
+        return None
+    spans = list()
+    cursor = 0
+    for token in tokens:
+        start = lowered.find(token, cursor)
+        first = start
+        while start >= 0 and ((start > 0 and lowered[start - 1].isalpha())
+                              or lowered[start + len(token):start + len(token) + 1].isalpha()):
+            start = lowered.find(token, start + 1)
+        if start < 0:
+            start = first
+        if start < 0:
+            return None
+        cursor = start + len(token)
+        spans.append((start, cursor))
+    return spans
+
+def documentName(filename):
+    '''
+    Nom d'un document dans l'index : le nom du fichier sans le '!' qui marque un fichier illisible
+    :param filename: Le chemin du fichier
+    :rtype: String
+    '''
+    name, extension = os.path.splitext(os.path.basename(filename))
+    return name.rstrip('!') + extension
+
+def listDocuments(pathdir, repairs=None):
+    '''
+    Liste des fichiers à indexer
+    On ne prend en compte que les documents à indexer, autrement dit, ceux qui n'ont pas un '!' avant l'extension,
+    sauf si une règle de réparation s'applique au fichier illisible : il remplace alors la copie éventuelle
+    laissée dans le corpus par les versions précédentes
+    :param pathdir: Le chemin vers le dossier contenant le sous-dossier _txt
+    :param repairs: Les règles de réparation (reparationRI.RepairRules), None pour aucune
+    :return: La liste des chemins des fichiers triée par nom de document, l'ordre détermine le numéro (docNo) de chaque document
+    :rtype: List
+    '''
+    files = glob.glob(os.path.join(pathdir, '_txt', '*[0-9].txt'))
+    if repairs:
+        repaired = [filename for filename in glob.glob(os.path.join(pathdir, '_txt', '*[0-9]!.txt'))
+                    if repairs.covers(os.path.basename(filename))]
+        names = set(documentName(filename) for filename in repaired)
+        files = [filename for filename in files if os.path.basename(filename) not in names] + repaired
+    return sorted(files, key=documentName)
+
+def indexDocument(docNo, listLemmas, indexInverse, positional=False):
+    '''
+    Ajout des lemmes d'un document à l'index inversé
+    :param docNo: L'identifiant du document
+    :param listLemmas: La liste des lemmes du document
+    :param indexInverse: L'index inversé {terme: {docNo: fréqLocale}}, modifié sur place
+    :param positional: Conservation des positions des lemmes, l'index est alors de la forme {terme: {docNo: [positions]}}
+    '''
+    if positional:
+        for position, lemma in enumerate(listLemmas):
+            indexInverse.setdefault(lemma, dict()).setdefault(docNo, list()).append(position)
+        return
+    for lemma in listLemmas:
+        postings = indexInverse.setdefault(lemma, dict())
+        postings[docNo] = postings.get(docNo, 0) + 1
+
+def readDocuments(documents, allTitle, repairs=None, tokenizer='nltk', keepText=False):
+    '''
+    Lecture et prétraitement des documents à l'aide des fonctions normalizeFile et removeStopwords
+    :param documents: La liste des couples (docNo, chemin du fichier)
+    :param allTitle: La table des documents {docNo: (nom du fichier, titre)}, complétée au fur et à mesure
+    :param repairs: Les règles de réparation appliquées au contenu des fichiers qu'elles désignent, None pour aucune
+    :param tokenizer: Le découpage en tokens, 'nltk' ou 'regex' (voir removeStopwords)
+    :param keepText: Conservation du texte de chaque document dans le magasin, sinon seulement des documents réparés
+    :return: Un générateur de couples (liste des tokens, (docNo, description du texte pour le magasin))
+    :rtype: generator
+    '''
+    for docNo, filename in documents:
+        print("Traitement du fichier :", os.path.basename(filename))
+
+        with openFile(filename) as f:
+            # création d'une table de correspondance entre le titre, l'url et l'identifiant
+            allTitle[docNo] = (documentName(filename), extractTitle(f))
+            # avec un décodeur UTF-8, tell() renvoie la position en octets du corps du document
+            bodyOffset = f.tell()
+            stat = os.fstat(f.fileno())
+            content = normalizeFile(f)
+        repairer = repairs.repairer(os.path.basename(filename)) if repairs else None
+        if repairer is not None:
+            content = repairer.repair(content)
+        tokens = removeStopwords(content, tokenizer=tokenizer)
+        # le texte d'un document réparé ne correspond plus au fichier : il est toujours conservé
+        text = content if keepText or repairer is not None else None
+        located = (os.path.abspath(filename), bodyOffset, stat.st_size, stat.st_mtime_ns, locateTokens(content, tokens),
+                   text)
+        yield tokens, (docNo, located)
+
+def indexDocuments(documents, lemmatizer, positional=False, repairs=None, blocks=None, tokenizer='nltk',
+                   keepText=False, store=None):
+    '''
+    Construction de l'index inversé d'une partie du corpus
+    :param documents: La liste des couples (docNo, chemin du fichier)
+    :param lemmatizer: Le lemmatiseur à utiliser
+    :param positional: Conservation des positions des lemmes
+    :param repairs: Les règles de réparation des documents illisibles
+    :param blocks: L'index par blocs à mémoire bornée qui reçoit les lemmes, None pour un index en mémoire
+    :param tokenizer: Le découpage en tokens, 'nltk' ou 'regex' (voir removeStopwords)
+    :param keepText: Conservation du texte de chaque document dans le magasin
+    :param store: Le magasin temporaire qui reçoit la fiche de chaque document, None pour ne pas en écrire
+    :return: L'index inversé partiel {terme: {docNo: fréqLocale}} (ou blocks) et la table des documents
+             {docNo: (nom du fichier, titre, nombre de lemmes)}
+    :rtype: tuple
+    '''
+    indexInverse = dict() if blocks is None else blocks
+    allTitle = dict()
+
+    # les documents sont lemmatisés en flux, par lots
+    stream = readDocuments(documents, allTitle, repairs, tokenizer, keepText)
+    for contentLemmatized, (docNo, located) in lemmatizer.lemmatizeStream(stream):
+        if blocks is None:
+            indexDocument(docNo, contentLemmatized, indexInverse, positional)
+        else:
+            blocks.add(docNo, contentLemmatized)
+        # la longueur du document sert à la normalisation du score BM25
+        allTitle[docNo] += (len(contentLemmatized),)
+        # sa fiche, pour les extraits des résultats, part aussitôt sur disque
+        if store is not None:
+            source, bodyOffset, size, mtime, spans, text = located
+            store.add(docNo, indexRI.encodeStoredDocument(source, bodyOffset, size, mtime, spans, contentLemmatized,
+                                                          text))
+
+    return indexInverse, allTitle
+
+# lemmatiseur propre à chaque processus de travail, chargé une seule fois à son démarrage
+workerLemmatizer = None
+workerPositional = False
+workerRepairs = None
+workerTokenizer = 'nltk'
+workerKeepText = False
+workerStore = None
+
+def initWorker(batchSize, cacheCapacity, cacheEntries, positional, profile=False, repairs=None, tokenizer='nltk',
+               backend='spacy', keepText=False, storePath=None):
+    '''
+    Initialisation d'un processus de travail
+    :param batchSize: Le nombre de documents traités par lot
+    :param cacheCapacity: La taille maximale du cache des lemmes
+    :param cacheEntries: Le contenu du cache des lemmes du processus principal
+    :param positional: Conservation des positions des lemmes
+    :param profile: Mesure du temps passé dans chaque étape
+    :param repairs: Les règles de réparation des documents illisibles
+    :param tokenizer: Le découpage en tokens, 'nltk' ou 'regex' (voir removeStopwords)
+    :param backend: La normalisation des tokens du lemmatiseur du processus principal
+    :param keepText: Conservation du texte de chaque document dans le magasin
+    :param storePath: Le dossier du magasin temporaire, où le processus écrit son propre fichier, None sans magasin
+    '''
+    global workerLemmatizer, workerPositional, workerRepairs, workerTokenizer, workerKeepText, workerStore
+    workerPositional = positional
+    workerRepairs = repairs
+    workerTokenizer = tokenizer
+    workerKeepText = keepText
+    workerStore = DocumentStore(storePath) if storePath is not None else None
+    if profile:
+        enableProfiling()
+        # mesures du processus principal héritées par fork
+        profilRI.reset()
+    # le modèle n'est chargé qu'au premier token absent du cache
+    workerLemmatizer = Lemmatizer(batchSize, LemmaCache(cacheCapacity, cacheEntries), backend)
+
+def indexChunk(documents):
+    '''
+    Indexation d'un lot de documents dans un processus de travail
+    :param documents: La liste des couples (docNo, chemin du fichier)
+    :return: L'index inversé partiel, la table des documents du lot, la position de leurs fiches dans le magasin
+             temporaire du processus, les nouveautés du cache des lemmes et les mesures des étapes (None sans --profile)
+    :rtype: tuple
+    '''
+    partialIndex, partialTitle = indexDocuments(documents, workerLemmatizer, workerPositional, workerRepairs,
+                                                tokenizer=workerTokenizer, keepText=workerKeepText, store=workerStore)
+    locations = workerStore.takeLocations() if workerStore is not None else dict()
+    return partialIndex, partialTitle, locations, workerLemmatizer.cache.takeDelta(), profilRI.takeSnapshot()
+
+def mergeIndex(indexInverse, partialIndex):
+    '''
+    Fusion d'un index partiel dans l'index inversé, les docNo des deux index étant disjoints
+    :param indexInverse: L'index inversé {terme: {docNo: fréqLocale}}, modifié sur place
+    :param partialIndex: L'index partiel à ajouter
+    '''
+    for term, postings in partialIndex.items():
+        if term in indexInverse:
+            indexInverse[term].update(postings)
+        else:
+            indexInverse[term] = postings
+
+# estimation de la mémoire occupée par un index inversé en mémoire, en octets : par terme (dictionnaire
+# de ses postings et chaîne du terme), par posting et par position d'un index positionnel
+TERM_COST = 300
+POSTING_COST = 40
+POSITION_COST = 40
+
+class IndexBlocks:
+    '''
+    Index inversé construit par blocs à mémoire bornée (SPIMI) : les postings sont accumulés dans un bloc en mémoire,
+    écrit sur disque sous forme de bloc trié dès que sa taille estimée atteint le budget ; les blocs, le dernier bloc
+    en mémoire et les parcours ajoutés (postings conservés de l'index précédent) sont fusionnés à l'écriture de l'index
+    '''
+
+    def __init__(self, path, budget, positional=False):
+        '''
+        :param path: Le dossier des blocs temporaires, créé au premier bloc écrit et supprimé par close
+        :param budget: La taille estimée maximale du bloc en mémoire, en octets
+        :param positional: Conservation des positions des lemmes
+        '''
+        self.path = path
+        self.budget = budget
+        self.positional = positional
+        self.block = dict()
+        self.size = 0
+        self.runs = list()
+        self.sources = list()
+
+    def add(self, docNo, listLemmas):
+        '''
+        Ajout des lemmes d'un document, le bloc est écrit sur disque si le budget est atteint
+        :param docNo: L'identifiant du document
+        :param listLemmas: La liste des lemmes du document
+        '''
+        nTerms = len(self.block)
+        indexDocument(docNo, listLemmas, self.block, self.positional)
+        self.size += (len(self.block) - nTerms) * TERM_COST + len(set(listLemmas)) * POSTING_COST
+        if self.positional:
+            self.size += len(listLemmas) * POSITION_COST
+        if self.size >= self.budget:
+            self.spill()
+
+    def absorb(self, partialIndex):
+        '''
+        Ajout d'un index partiel renvoyé par un processus de travail, le bloc est écrit sur disque si le budget est atteint
+        :param partialIndex: L'index partiel, dont les docNo sont absents du bloc
+        '''
+        for term, postings in partialIndex.items():
+            if term not in self.block:
+                self.size += TERM_COST
+            self.size += len(postings) * POSTING_COST
+            if self.positional:
+                self.size += sum(len(positions) for positions in postings.values()) * POSITION_COST
+        mergeIndex(self.block, partialIndex)
+        if self.size >= self.budget:
+            self.spill()
+
+    def spill(self):
+        '''
+        Écriture du bloc en mémoire sous forme de bloc trié, puis remise à zéro du bloc
+        '''
+        if not self.block:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        filename = os.path.join(self.path, 'bloc-%d.bin' % (len(self.runs) + 1))
+        nTerms = indexRI.writeRun(filename, indexRI.sortedPostings(self.block), self.positional)
+        print("Écriture du bloc %d : %d terme(s), environ %d Mo" % (len(self.runs) + 1, nTerms, self.size >> 20))
+        self.runs.append(filename)
+        self.block = dict()
+        self.size = 0
+
+    def addSource(self, source):
+        '''
+        Ajout d'un parcours déjà trié à fusionner avec les blocs
+        :param source: La fonction sans argument qui renvoie un nouveau parcours, itérable de couples
+                       (terme, liste des (docNo, valeur) triée par docNo) triés par terme
+        '''
+        self.sources.append(source)
+
+    def terms(self):
+        '''
+        Parcours fusionné des blocs écrits, du bloc en mémoire et des parcours ajoutés, dans l'ordre attendu par writeIndex ;
+        chaque appel relit les blocs depuis le début
+        :return: Un générateur de couples (terme, liste des (docNo, valeur) triée par docNo), triés par terme
+        :rtype: generator
+        '''
+        sources = [indexRI.readRun(filename, self.positional) for filename in self.runs]
+        sources.append(indexRI.sortedPostings(self.block))
+        return indexRI.mergeTerms(sources + [source() for source in self.sources])
+
+    def close(self):
+        '''
+        Suppression des blocs temporaires
+        '''
+        if self.runs:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.runs = list()
+
+class DocumentStore:
+    '''
+    Magasin temporaire des fiches des documents (voir indexRI.encodeStoredDocument) : comme les blocs de l'index
+    à mémoire bornée, les fiches sont écrites sur disque au fil de l'indexation et seule leur position reste
+    en mémoire ; chaque processus de travail écrit son propre fichier. Les fiches des documents inchangés
+    restent dans le magasin de l'index précédent. L'écriture de l'index relit les fiches une à une (voir entry)
+    '''
+
+    def __init__(self, path, previous=None):
+        '''
+        :param path: Le dossier des fichiers temporaires, créé à la première fiche écrite et supprimé par close
+        :param previous: L'index précédent, dont les fiches conservées sont relues : il doit rester ouvert
+                         jusqu'à l'écriture de l'index
+        '''
+        self.path = path
+        self.previous = previous
+        self.kept = set()
+        # position de chaque fiche écrite : {docNo: (fichier, position, longueur)}
+        self.locations = dict()
+        self.file = None
+        self.filename = None
+        self.offset = 0
+        self.readers = dict()
+
+    def add(self, docNo, entry):
+        '''
+        Écriture de la fiche d'un document dans le fichier du processus courant
+        :param docNo: L'identifiant du document
+        :param entry: La fiche codée par indexRI.encodeStoredDocument
+        '''
+        if self.file is None:
+            os.makedirs(self.path, exist_ok=True)
+            descriptor, self.filename = tempfile.mkstemp(prefix='magasin-', suffix='.bin', dir=self.path)
+            self.file = os.fdopen(descriptor, 'wb')
+        self.file.write(entry)
+        self.locations[docNo] = (self.filename, self.offset, len(entry))
+        self.offset += len(entry)
+
+    def takeLocations(self):
+        '''
+        Positions des fiches écrites depuis le dernier appel, transmises par un processus de travail au processus
+        principal ; les fiches sont alors lisibles par celui-ci
+        :return: Les positions {docNo: (fichier, position, longueur)}
+        :rtype: dict
+        '''
+        if self.file is not None:
+            self.file.flush()
+        locations, self.locations = self.locations, dict()
+        return locations
+
+    def absorb(self, locations):
+        '''
+        Ajout des positions des fiches écrites par un processus de travail
+        :param locations: Les positions renvoyées par takeLocations
+        '''
+        self.locations.update(locations)
+
+    def keep(self, docNos):
+        '''
+        Conservation des fiches de documents inchangés, relues dans le magasin de l'index précédent
+        :param docNos: Les docNo des documents
+        '''
+        self.kept.update(docNos)
+
+    def entry(self, docNo):
+        '''
+        Lecture de la fiche d'un document, pour l'écriture de l'index
+        :param docNo: L'identifiant du document
+        :return: La fiche codée par indexRI.encodeStoredDocument, vide si le document n'en a pas
+        :rtype: bytes
+        '''
+        location = self.locations.get(docNo)
+        if location is None:
+            return self.previous.storedEntry(docNo) if docNo in self.kept else b''
+        filename, offset, length = location
+        if filename == self.filename:
+            self.file.flush()
+        reader = self.readers.get(filename)
+        if reader is None:
+            reader = self.readers[filename] = open(filename, 'rb')
+        reader.seek(offset)
+        return reader.read(length)
+
+    def close(self):
+        '''
+        Fermeture et suppression des fichiers temporaires
+        '''
+        for f in list(self.readers.values()) + ([self.file] if self.file is not None else []):
+            f.close()
+        self.readers = dict()
+        self.file = None
+        shutil.rmtree(self.path, ignore_errors=True)
+
+def indexFiles(documents, lemmatizer, workers=1, positional=False, repairs=None, blocks=None, tokenizer='nltk',
+               keepText=False, store=None):
+    '''
+    Indexation d'une liste de documents, éventuellement répartie entre plusieurs processus
+    :param documents: La liste des couples (docNo, chemin du fichier)
+    :param lemmatizer: Le lemmatiseur à utiliser
+    :param workers: Le nombre de processus d'indexation, 1 pour tout traiter dans le processus courant
+    :param positional: Conservation des positions des lemmes
+    :param repairs: Les règles de réparation des documents illisibles
+    :param blocks: L'index par blocs à mémoire bornée qui reçoit les lemmes, None pour un index en mémoire
+    :param tokenizer: Le découpage en tokens, 'nltk' ou 'regex' (voir removeStopwords)
+    :param keepText: Conservation du texte de chaque document dans le magasin
+    :param store: Le magasin temporaire qui reçoit la fiche de chaque document, None pour ne pas en écrire
+    :return: L'index inversé {terme: {docNo: fréqLocale}} (ou blocks) et la table des documents
+             {docNo: (nom du fichier, titre, nombre de lemmes)}
+    :rtype: tuple
+    '''
+    if workers <= 1 or len(documents) <= 1:
+        return indexDocuments(documents, lemmatizer, positional, repairs, blocks, tokenizer, keepText, store)
+
+    # découpage en lots d'au plus batchSize documents, répartis entre les processus
+    size = max(1, min(lemmatizer.batchSize, len(documents) // workers))
+    chunks = [documents[i:i + size] for i in range(0, len(documents), size)]
+
+    indexInverse = dict() if blocks is None else blocks
+    allTitle = dict()
+    cache = lemmatizer.cache
+    initargs = (lemmatizer.batchSize, cache.capacity, list(cache.entries.items()), positional, profilRI.active,
+                repairs, tokenizer, lemmatizer.backend, keepText, store.path if store is not None else None)
+    import multiprocessing
+    with multiprocessing.Pool(workers, initializer=initWorker, initargs=initargs) as pool:
+        # imap renvoie les lots dans l'ordre : la fusion est la même d'une exécution à l'autre
+        for partialIndex, partialTitle, locations, cacheDelta, stages in pool.imap(indexChunk, chunks):
+            if blocks is None:
+                mergeIndex(indexInverse, partialIndex)
+            else:
+                blocks.absorb(partialIndex)
+            allTitle.update(partialTitle)
+            if store is not None:
+                store.absorb(locations)
+            cache.absorb(cacheDelta)
+            profilRI.absorb(stages)
+    return indexInverse, allTitle
+
+def enableProfiling():
+    '''
+    Activation de la mesure des étapes de l'indexation dans le processus courant
+    '''
+    module = sys.modules[__name__]
+    profilRI.instrument([
+        (module, 'openFile', 'ouverture', {'opens': True}),
+        (module, 'extractTitle', 'titre', {}),
+        (module, 'normalizeFile', 'lecture', {'nBytes': profilRI.countBytes}),
+        (reparationRI.Repairer, 'repair', 'réparation', {'nBytes': profilRI.countBytes}),
+        (module, 'tokenizeText', 'tokenisation', {'tokens': profilRI.countTokens}),
+        (module, 'removeStopwords', 'motsVides', {'tokens': profilRI.countTokens}),
+        # spaCy traite des lots de tokens de plusieurs documents
+        (Lemmatizer, 'lemmatizeMissing', 'lemmatisation', {'tokens': profilRI.countInputTokens, 'perDocument': False}),
+        (module, 'indexDocument', 'indexation', {'tokens': profilRI.countInputTokens, 'perDocument': False}),
+        (module, 'saveIndex', 'écriture', {'perDocument': False}),
+    ])
+
+def fingerprint(filename, previous=None):
+    '''
+    Empreinte d'un fichier : date de modification, taille et condensat SHA-1 du contenu
+    Le contenu n'est relu que si la date ou la taille ont changé depuis l'empreinte précédente
+    :param filename: Le chemin du fichier
+    :param previous: L'empreinte précédente du fichier, None s'il n'a jamais été indexé
+    :return: L'empreinte {'mtime': ..., 'taille': ..., 'sha1': ...}
+    :rtype: dict
+    '''
+    stat = os.stat(filename)
+    if previous is not None and previous['mtime'] == stat.st_mtime_ns and previous['taille'] == stat.st_size:
+        return {'mtime': previous['mtime'], 'taille': previous['taille'], 'sha1': previous['sha1']}
+    with open(filename, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    return {'mtime': stat.st_mtime_ns, 'taille': stat.st_size, 'sha1': digest}
+
+def keptPostings(index, keep):
+    '''
+    Parcours des postings d'un index sur disque, restreints à certains documents
+    :param index: L'index ouvert avec loadIndex
+    :param keep: L'ensemble des docNo à conserver
+    :return: Un générateur de couples (terme, liste des (docNo, fréqLocale ou positions) triée par docNo), triés par terme,
+             les termes sans posting conservé étant omis
+    :rtype: generator
+    '''
+    for term, postings in index.items():
+        kept = [(docNo, freq) for docNo, freq in postings if docNo in keep]
+        if kept:
+            yield term, kept
+
+def loadPostings(index, keep):
+    '''
+    Chargement en mémoire des postings d'un index sur disque, restreints à certains documents
+    :param index: L'index ouvert avec loadIndex
+    :param keep: L'ensemble des docNo à conserver
+    :return: L'index inversé {terme: {docNo: fréqLocale}}, ou {terme: {docNo: [positions]}} pour un index positionnel
+    :rtype: dict
+    '''
+    return {term: dict(kept) for term, kept in keptPostings(index, keep)}
+
+def buildIndex(pathdir, lemmatizer=sharedLemmatizer, workers=1, previous=None, positional=False, repairs=None,
+               blocks=None, tokenizer='nltk', keepText=False, store=None):
+    '''
+    Construction de l'index inversé de tout le vocabulaire du corpus
+    Si un index précédent est fourni, seuls les fichiers ajoutés ou modifiés depuis sont lemmatisés,
+    les postings des fichiers supprimés sont retirés et les docNo existants sont conservés
+    :param pathdir: Le chemin vers le dossier contenant les fichiers à indexer
+    :param lemmatizer: Le lemmatiseur à utiliser
+    :param workers: Le nombre de processus d'indexation, 1 pour tout traiter dans le processus courant
+    :param previous: L'index précédent ouvert avec loadIndex, None pour une construction complète
+    :param positional: Conservation des positions des lemmes, l'index précédent doit avoir été construit de la même façon
+    :param repairs: Les règles de réparation des documents illisibles, les mêmes que pour l'index précédent
+    :param blocks: L'index par blocs à mémoire bornée à remplir, None pour construire l'index en mémoire ; l'index
+                   précédent doit alors rester ouvert jusqu'à l'écriture, qui relit ses postings conservés
+    :param tokenizer: Le découpage en tokens, 'nltk' ou 'regex', le même que pour l'index précédent
+    :param keepText: Conservation du texte de chaque document dans le magasin, comme pour l'index précédent
+    :param store: Le magasin temporaire des fiches des documents, créé avec l'index précédent ; None pour
+                  ne pas écrire de fiches
+    :return: L'index inversé {terme: {docNo: fréqLocale}} (ou blocks),
+             la table des documents {docNo: (nom du fichier, titre, nombre de lemmes)},
+             les empreintes des fichiers {nom du fichier: empreinte} et le prochain docNo à attribuer
+    :rtype: tuple
+    '''
+    oldFingerprints = previous.fingerprints() if previous is not None else dict()
+    nextDocNo = previous.meta['prochainDocNo'] if previous is not None else 1
+
+    # les nouveaux docNo sont attribués selon l'ordre trié des fichiers, avant la répartition :
+    # ils sont donc identiques d'une exécution à l'autre, quel que soit le nombre de processus
+    fingerprints = dict()
+    documents = list()
+    unchanged = set()
+    for filename in listDocuments(pathdir, repairs):
+        dictname = documentName(filename)
+        old = oldFingerprints.get(dictname)
+        fingerprints[dictname] = fingerprint(filename, old)
+        if old is None:
+            docNo = nextDocNo
+            nextDocNo += 1
+            documents.append((docNo, filename))
+        else:
+            docNo = old['docNo']
+            if fingerprints[dictname]['sha1'] == old['sha1']:
+                unchanged.add(docNo)
+            else:
+                documents.append((docNo, filename))
+        fingerprints[dictname]['docNo'] = docNo
+
+    if previous is not None:
+        print("Fichiers inchangés :", len(unchanged), "- à (ré)indexer :", len(documents),
+              "- supprimés :", len(set(oldFingerprints) - set(fingerprints)))
+        allTitle = {docNo: doc for docNo, doc in previous.allDocuments().items() if docNo in unchanged}
+        # les fiches des documents inchangés ne seront relues dans le magasin précédent qu'à l'écriture
+        if store is not None:
+            store.keep(unchanged)
+    else:
+        allTitle = dict()
+
+    if blocks is not None:
+        if previous is not None:
+            blocks.addSource(lambda: keptPostings(previous, unchanged))
+        indexInverse, partialTitle = indexFiles(documents, lemmatizer, workers, positional, repairs, blocks, tokenizer,
+                                                keepText, store)
+    else:
+        indexInverse = loadPostings(previous, unchanged) if previous is not None else dict()
+        partialIndex, partialTitle = indexFiles(documents, lemmatizer, workers, positional, repairs,
+                                                tokenizer=tokenizer, keepText=keepText, store=store)
+        mergeIndex(indexInverse, partialIndex)
+    allTitle.update(partialTitle)
+    return indexInverse, allTitle, fingerprints, nextDocNo
+
+def saveIndex(indexInverse, allTitle, path, fingerprints=None, nextDocNo=None, positional=False, preprocessing=None,
+              partitions=1, store=None):
+    '''
+    Sauvegarde de l'index inversé et de la table des documents au format binaire (voir indexRI)
+    :param indexInverse: L'index inversé {terme: {docNo: fréqLocale}}, ou l'index par blocs IndexBlocks à fusionner
+    :param allTitle: La table des documents {docNo: (nom du fichier, titre, nombre de lemmes)}
+    :param path: Le dossier de l'index
+    :param fingerprints: Les empreintes des fichiers indexés {nom du fichier: empreinte}
+    :param nextDocNo: Le prochain docNo à attribuer
+    :param positional: L'index contient les positions des lemmes {terme: {docNo: [positions]}}
+    :param preprocessing: Les réglages du prétraitement des documents, renvoyés par preprocessingSettings
+    :param partitions: Le nombre de partitions entre lesquelles les documents sont répartis selon leur docNo
+    :param store: Le magasin temporaire des fiches des documents, None pour un magasin sans fiches
+    :return: Le numéro de la génération écrite
+    :rtype: int
+    '''
+    storedEntry = store.entry if store is not None else None
+    if isinstance(indexInverse, IndexBlocks):
+        terms = indexInverse.terms
+    else:
+        terms = lambda: indexRI.sortedPostings(indexInverse)
+    if partitions > 1:
+        # un parcours complet de l'index par partition
+        termsOf = lambda partition: indexRI.partitionPostings(terms(), partitions, partition)
+        return indexRI.writePartitions(path, partitions, termsOf, allTitle, fingerprints, nextDocNo, positional,
+                                       preprocessing, storedEntry)
+    return indexRI.writeIndex(path, terms(), allTitle, fingerprints, nextDocNo, positional, preprocessing, storedEntry)
+
+def loadIndex(path, workers=0):
+    '''
+    Ouverture d'un index sauvegardé avec saveIndex
+    :param path: Le dossier de l'index
+    :param workers: Le nombre de processus d'évaluation d'un index partitionné (voir partitionRI.PartitionedIndex)
+    :return: L'index sur disque, dont seuls les en-têtes sont lus à l'ouverture
+    :rtype: indexRI.DiskIndex ou partitionRI.PartitionedIndex
+    '''
+    meta = indexRI.readMeta(path)
+    if meta is not None and meta.get('partitions'):
+        return partitionRI.PartitionedIndex(path, workers)
+    return indexRI.DiskIndex(path)
+
+def search(plan, index):
+    '''
+    Évaluation de la requête sur l'index inversé
+    :param plan: Le plan d'exécution renvoyé par word2index
+    :param index: L'index ouvert avec loadIndex
+    :return: La liste des résultats (docNo, {mot: fréqLocale}) triée par docNo
+    :rtype: List
+    '''
+    if isinstance(index, partitionRI.PartitionedIndex):
+        return index.execute(plan)
+    return requeteRI.execute(plan, index)
+
+def lemmaCachePath(path, backend='spacy'):
+    '''
+    Chemin par défaut du cache des lemmes d'une normalisation, dans le dossier de l'index, hors des générations
+    :param path: Le dossier de l'index
+    :param backend: La normalisation des tokens, parmi LEMMATIZERS
+    :rtype: String
+    '''
+    # un cache par normalisation : les lemmes spaCy ne doivent pas servir de racines Snowball
+    return os.path.join(path, 'lemmes.json' if backend == 'spacy' else 'lemmes-%s.json' % backend)
+
+def queryBackend(index):
+    '''
+    Normalisation des tokens avec laquelle un index a été construit, à appliquer aux termes des requêtes
+    :param index: L'index ouvert avec loadIndex
+    :return: La normalisation, parmi LEMMATIZERS, 'spacy' pour un index construit avant le choix de la normalisation
+    :rtype: String
+    '''
+    return (index.meta.get('pretraitement') or dict()).get('lemmatisation', 'spacy')
+
+def openLemmatizer(args, backend='spacy'):
+    '''
+    Création du lemmatiseur et chargement du cache des lemmes désignés sur la ligne de commande
+    :param args: Les arguments de la ligne de commande
+    :param backend: La normalisation des tokens, celle de l'index pour répondre à des requêtes (voir queryBackend)
+    :return: Le lemmatiseur et le chemin de son cache
+    :rtype: tuple
+    '''
+    path = args.lemma_cache or lemmaCachePath(args.index, backend)
+    cache = LemmaCache.load(path, args.lemma_cache_size)
+    return Lemmatizer(getattr(args, 'batch_size', 50), cache, backend), path
+
+def rankedSearch(plan, index, k=10, ranking='bm25'):
+    '''
+    Évaluation de la requête et classement des documents retenus
+    :param plan: Le plan d'exécution renvoyé par word2index
+    :param index: L'index ouvert avec loadIndex
+    :param k: Le nombre de documents à renvoyer
+    :param ranking: Le modèle de classement, 'bm25' ou 'tfidf'
+    :return: La liste des k meilleurs résultats (score, docNo, {mot: fréqLocale})
+    :rtype: List
+    '''
+    if isinstance(index, partitionRI.PartitionedIndex):
+        return index.rank(plan, k, ranking)
+    return requeteRI.rank(plan, index, k, ranking)
+
+def preprocessingSettings(repairs, tokenizer='nltk', backend='spacy', keepText=False):
+    '''
+    Réglages du prétraitement des documents enregistrés avec l'index : un index construit avec d'autres réglages
+    ne peut pas être complété, il est reconstruit entièrement ; les requêtes suivent le même découpage en tokens
+    et la même normalisation
+    :param repairs: Les règles de réparation des documents illisibles
+    :param tokenizer: Le découpage en tokens, 'nltk' ou 'regex'
+    :param backend: La normalisation des tokens, parmi LEMMATIZERS
+    :param keepText: Conservation du texte de chaque document dans le magasin
+    :rtype: dict
+    '''
+    return {'reparations': repairs.digest(), 'tokenisation': tokenizer, 'lemmatisation': backend, 'textes': keepText}
+
+def commandIndex(args):
+    '''
+    Commande "index" : construction et sauvegarde de l'index
+    :param args: Les arguments de la ligne de commande
+    '''
+    # chemin vers le dossier contenant les fichiers à indexer
+    pathdir = args.corpus
+    if not os.path.isdir(pathdir):
+        print("Problème avec le chemin vers le dossier contenant les fichiers")
+        return 1
+
+    try:
+        repairs = reparationRI.RepairRules.load(args.reparations or None)
+    except (ValueError, re.error) as error:
+        print(error, "-", args.reparations)
+        return 1
+    preprocessing = preprocessingSettings(repairs, args.tokenizer, args.lemmatizer, args.textes)
+
+    print("Traitement du dossier :", pathdir)
+    # réindexation incrémentale à partir de l'index existant, sauf si --full est demandé
+    # ou si l'index existant a été écrit dans une autre version du format ou avec d'autres options
+    previous = None
+    meta = indexRI.readMeta(args.index)
+    if not args.full and meta is not None and meta['format'] == indexRI.FORMAT_VERSION \
+            and meta['positions'] == args.positions and meta.get('pretraitement') == preprocessing:
+        # l'ancien index n'est que lu : aucun processus d'évaluation
+        previous = loadIndex(args.index, 1)
+    lemmatizer, cachePath = openLemmatizer(args, args.lemmatizer)
+    if args.lemmatizer in ('snowball', 'lefff'):
+        # chargement immédiat : une normalisation indisponible est signalée avant la lecture du corpus
+        try:
+            lemmatizer.normalizer
+        except ImportError as error:
+            print("Normalisation %s indisponible :" % args.lemmatizer, error)
+            if previous is not None:
+                previous.close()
+            return 1
+    # indexation à mémoire bornée : blocs temporaires dans le dossier de l'index, hors des générations
+    blocks = IndexBlocks(os.path.join(args.index, 'blocs'), args.memoire << 20, args.positions) if args.memoire else None
+    # fiches des documents écrites au fil de l'indexation, elles aussi hors des générations
+    store = DocumentStore(os.path.join(args.index, 'magasin'), previous)
+    if args.profile or args.profile_json:
+        enableProfiling()
+    profiler = cProfile.Profile() if args.profile_dump else None
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        indexInverse, allTitle, fingerprints, nextDocNo = buildIndex(pathdir, lemmatizer, args.workers, previous,
+                                                                     args.positions, repairs, blocks, args.tokenizer,
+                                                                     args.textes, store)
+        print("\nSauvegarde de l'index inversé :", args.index)
+        saveIndex(indexInverse, allTitle, args.index, fingerprints, nextDocNo, args.positions, preprocessing,
+                  args.partitions, store)
+    finally:
+        store.close()
+        if previous is not None:
+            previous.close()
+        if blocks is not None:
+            blocks.close()
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile_dump)
+        print("Profil cProfile :", args.profile_dump)
+    wallTime = time.perf_counter() - start
+    if lemmatizer.backend != 'none':
+        lemmatizer.cache.save(cachePath)
+    print("Nombre total de fichiers traités :", len(allTitle))
+    print("Nombre total de termes indexés :", indexRI.readMeta(args.index)['termes'])
+    cache = lemmatizer.cache
+    print("Cache des lemmes : %d token(s), taux de succès %.1f %% sur %d occurrence(s)"
+          % (len(cache), 100 * cache.hitRate(), cache.hits + cache.misses))
+    if args.profile:
+        profilRI.printSummary(wallTime)
+    if args.profile_json:
+        with open(args.profile_json, 'w', encoding='utf-8') as f:
+            json.dump(dict(profilRI.report(), secondes=wallTime), f, ensure_ascii=False, indent=1)
+        print("Mesures par étape et par document :", args.profile_json)
+    return 0
+
+def openIndex(args):
+    '''
+    Ouverture de l'index désigné sur la ligne de commande, avec un message si elle est impossible
+    :param args: Les arguments de la ligne de commande
+    :return: L'index ouvert avec loadIndex, None s'il est absent ou d'un format dépassé
+    :rtype: indexRI.DiskIndex
+    '''
+    if indexRI.readMeta(args.index) is None:
+        print("Index introuvable, lancez d'abord la commande index :", args.index)
+        return None
+    try:
+        # les commandes sans requête (stats) ne lancent pas de processus d'évaluation
+        return loadIndex(args.index, getattr(args, 'processus', 1))
+    except ValueError as error:
+        print(error, "- reconstruisez l'index avec la commande index --full")
+        return None
+
+def answerQuery(query, index, lemmatizer, ranking='none', k=10, cache=None, fuzzy=0):
+    '''
+    Analyse et évaluation d'une requête, éventuellement classée
+    :param query: La requête
+    :param index: L'index ouvert avec loadIndex
+    :param lemmatizer: Le lemmatiseur des termes de la requête
+    :param ranking: Le modèle de classement, 'none' pour l'ordre des docNo sans score
+    :param k: Le nombre de documents à renvoyer avec un classement
+    :param cache: Le cache des résultats (requeteRI.ResultCache), None pour toujours évaluer la requête
+    :param fuzzy: La distance d'édition maximale des termes absents du lexique (mode approché), 0 pour le désactiver
+    :return: La liste des résultats (score, docNo, {mot: fréqLocale}), le score valant None sans classement
+    :rtype: List
+    '''
+    return evaluatePlan(word2index(query, lemmatizer, fuzzy, queryTokenizer(index)), index, ranking, k, cache)
+
+def resultKey(plan, ranking='none', k=10):
+    '''
+    Clé des résultats d'un plan dans le cache des résultats
+    :param plan: Le plan d'exécution
+    :param ranking: Le modèle de classement
+    :param k: Le nombre de documents renvoyés avec un classement
+    :rtype: tuple
+    '''
+    # deux requêtes ne différant que par l'ordre des clauses ont la même clé
+    return (plan.key(), ranking, k if ranking != 'none' else None)
+
+def evaluatePlan(plan, index, ranking='none', k=10, cache=None):
+    '''
+    Évaluation d'un plan renvoyé par word2index, à l'aide du cache des résultats s'il est fourni
+    :param plan: Le plan d'exécution
+    :param index: L'index ouvert avec loadIndex
+    :param ranking: Le modèle de classement, 'none' pour l'ordre des docNo sans score
+    :param k: Le nombre de documents à renvoyer avec un classement
+    :param cache: Le cache des résultats, None pour toujours évaluer le plan
+    :return: La liste des résultats (score, docNo, {mot: fréqLocale}), partagée avec le cache
+    :rtype: List
+    '''
+    if cache is not None:
+        key = resultKey(plan, ranking, k)
+        results = cache.get(key, index.generation)
+        if results is not None:
+            return results
+    if ranking != 'none':
+        results = rankedSearch(plan, index, k, ranking)
+    else:
+        results = [(None, docNo, freqs) for docNo, freqs in search(plan, index)]
+    if cache is not None:
+        cache.put(key, results)
+    return results
+
+def openResultCache(args):
+    '''
+    Création du cache des résultats désigné sur la ligne de commande
+    :param args: Les arguments de la ligne de commande
+    :return: Le cache, None s'il est désactivé
+    :rtype: requeteRI.ResultCache
+    '''
+    if args.cache_requetes <= 0:
+        return None
+    return requeteRI.ResultCache(args.cache_requetes, args.cache_octets)
+
+def printCacheStats(cache, file=sys.stdout):
+    '''
+    Affichage des statistiques du cache des résultats
+    :param cache: Le cache, éventuellement None
+    :param file: Le fichier de sortie
+    '''
+    if cache is None:
+        return
+    stats = cache.stats()
+    print("Cache des résultats : %d requête(s), %d octets, %d succès, %d échec(s) (%.1f %%), %d éviction(s), "
+          "%d invalidation(s)" % (stats['entrees'], stats['octets'], stats['succes'], stats['echecs'],
+                                  100 * stats['tauxSucces'], stats['evictions'], stats['invalidations']), file=file)
+
+def commandSearch(args):
+    '''
+    Commande "search" : chargement de l'index et réponse à la requête
+    :param args: Les arguments de la ligne de commande
+    '''
+    index = openIndex(args)
+    if index is None:
+        return 1
+    try:
+        lemmatizer, cachePath = openLemmatizer(args, queryBackend(index))
+
+        # argparse conserve le séparateur '--' en tête de la requête
+        words = args.requete[1:] if args.requete[:1] == ['--'] else args.requete
+        if words:
+            query = ' '.join(words)
+        else:
+            print("Votre recherche :")
+            query = input()
+        try:
+            results = answerQuery(query, index, lemmatizer, args.ranking, args.top, fuzzy=args.fuzzy)
+        except requeteRI.QueryError as error:
+            print(error)
+            return 1
+        finally:
+            # les termes de la requête lemmatisés par spaCy servent aux recherches suivantes
+            if lemmatizer.cache.dirty:
+                lemmatizer.cache.save(cachePath)
+        printResults(results, index, args.ranking != 'none', args.extraits)
+    finally:
+        index.close()
+    return 0
+
+def printResults(results, index, ranked=False, snippets=False):
+    '''
+    Affichage des documents trouvés
+    :param results: La liste des résultats (score, docNo, {mot: fréqLocale}) renvoyée par answerQuery
+    :param index: L'index ouvert avec loadIndex
+    :param ranked: Les résultats sont classés, avec leur score
+    :param snippets: Affichage d'un extrait de chaque document, les termes trouvés entre crochets
+    '''
+    if not results:
+        print("Aucun document ne correspond à la requête")
+    if ranked:
+        return printRanked(results, index, snippets)
+    print("\nNombre total de documents trouvés :", len(results))
+    print("Nombre total d'occurrences trouvées :", sum(sum(freqs.values()) for _, _, freqs in results))
+
+    # affichage des documents trouvés
+    print("\nDocuments trouvés : ")
+    for _, docNo, freqs in results:
+        url, title = index.document(docNo)
+        # requête uniquement négative : aucun terme recherché à compter
+        if not freqs:
+            print(title + " - " + url)
+        for word, freq in freqs.items():
+            print(title + " - " + url + " : " + str(freq) + " occurrence(s) de " + word)
+        if snippets:
+            printSnippet(index, docNo, freqs)
+
+def printRanked(results, index, snippets=False):
+    '''
+    Affichage des documents classés
+    :param results: La liste des résultats (score, docNo, {mot: fréqLocale}) renvoyée par rankedSearch
+    :param index: L'index ouvert avec loadIndex
+    :param snippets: Affichage d'un extrait de chaque document, les termes trouvés entre crochets
+    '''
+    print("\nDocuments trouvés : ")
+    for position, (docScore, docNo, freqs) in enumerate(results, start=1):
+        url, title = index.document(docNo)
+        print("%d. %s - %s (score : %.4f)" % (position, title, url, docScore))
+        for word, freq in freqs.items():
+            print("    " + str(freq) + " occurrence(s) de " + word)
+        if snippets:
+            printSnippet(index, docNo, freqs)
+
+def printSnippet(index, docNo, freqs):
+    '''
+    Affichage de l'extrait d'un document trouvé (voir extraitRI)
+    :param index: L'index ouvert avec loadIndex
+    :param docNo: L'identifiant du document
+    :param freqs: Les termes trouvés {mot: fréqLocale}
+    '''
+    text = extraitRI.documentSnippet(index, docNo, freqs)
+    print("    " + (text if text is not None else "(extrait indisponible : fichier source modifié ou supprimé)"))
+
+def commandRepl(args):
+    '''
+    Commande "repl" : chargement unique de l'index et du lemmatiseur, puis réponse aux requêtes tapées une à une
+    jusqu'à une ligne vide ou la fin de l'entrée
+    :param args: Les arguments de la ligne de commande
+    '''
+    index = openIndex(args)
+    if index is None:
+        return 1
+    lemmatizer, cachePath = openLemmatizer(args, queryBackend(index))
+    resultCache = openResultCache(args)
+    print("Tapez une requête par ligne, une ligne vide pour quitter")
+    try:
+        while True:
+            try:
+                query = input("> ").strip()
+            except EOFError:
+                break
+            if not query:
+                break
+            start = time.perf_counter()
+            try:
+                results = answerQuery(query, index, lemmatizer, args.ranking, args.top, resultCache, args.fuzzy)
+            except requeteRI.QueryError as error:
+                print(error)
+                continue
+            printResults(results, index, args.ranking != 'none', args.extraits)
+            print("(%d document(s) en %.1f ms)" % (len(results), (time.perf_counter() - start) * 1000))
+    finally:
+        if lemmatizer.cache.dirty:
+            lemmatizer.cache.save(cachePath)
+        index.close()
+    printCacheStats(resultCache)
+    return 0
+
+def resultRecord(query, results, index, elapsed, snippets=False):
+    '''
+    Mise en forme des résultats d'une requête pour une ligne JSON du mode batch
+    :param query: La requête
+    :param results: La liste des résultats (score, docNo, {mot: fréqLocale}) renvoyée par answerQuery
+    :param index: L'index ouvert avec loadIndex
+    :param elapsed: La durée de traitement de la requête, en secondes
+    :param snippets: Ajout de l'extrait de chaque document (None s'il est indisponible)
+    :rtype: dict
+    '''
+    documents = list()
+    for docScore, docNo, freqs in results:
+        url, title = index.document(docNo)
+        document = {'docNo': docNo, 'fichier': url, 'titre': title, 'occurrences': freqs}
+        if docScore is not None:
+            document['score'] = docScore
+        if snippets:
+            document['extrait'] = extraitRI.documentSnippet(index, docNo, freqs)
+        documents.append(document)
+    # avec un classement, seuls les --top meilleurs documents sont renvoyés, pas tous ceux qui correspondent
+    return {'requete': query, 'renvoyes': len(results), 'documents': documents, 'ms': round(elapsed * 1000, 3)}
+
+def batchRecords(queries, index, lemmatizer, args, resultCache):
+    '''
+    Réponses aux requêtes du mode batch, l'une après l'autre
+    :param queries: Les requêtes, non vides
+    :param index: L'index ouvert avec loadIndex
+    :param lemmatizer: Le lemmatiseur des termes des requêtes
+    :param args: Les arguments de la ligne de commande
+    :param resultCache: Le cache des résultats, None pour toujours évaluer les requêtes
+    :return: Un générateur des lignes JSON (dict) de chaque requête, dans l'ordre
+    :rtype: generator
+    '''
+    for query in queries:
+        start = time.perf_counter()
+        try:
+            results = answerQuery(query, index, lemmatizer, args.ranking, args.top, resultCache, args.fuzzy)
+        except requeteRI.QueryError as error:
+            yield {'requete': query, 'erreur': str(error)}
+        else:
+            yield resultRecord(query, results, index, time.perf_counter() - start, args.extraits)
+
+def matrixRecords(queries, index, matrix, lemmatizer, args, resultCache):
+    '''
+    Réponses aux requêtes du mode batch classées toutes ensemble sur la matrice termes-documents (option --matrice) ;
+    les requêtes que la matrice ne sait pas évaluer (expressions, NEAR/k, sous-requêtes imbriquées) le sont une à une
+    La durée indiquée pour une requête classée sur la matrice est la durée du lot divisée par le nombre de requêtes
+    :param queries: Les requêtes, non vides
+    :param matrix: La matrice construite à partir de l'index (matriceRI.MatrixIndex)
+    :return: Un générateur des lignes JSON (dict) de chaque requête, dans l'ordre
+    :rtype: generator
+    '''
+    queries = list(queries)
+    start = time.perf_counter()
+    plans = list()
+    errors = dict()
+    for i, query in enumerate(queries):
+        try:
+            plans.append(word2index(query, lemmatizer, args.fuzzy, queryTokenizer(index)).expand(index))
+        except requeteRI.QueryError as error:
+            plans.append(None)
+            errors[i] = str(error)
+    batch = matrix.rankBatch(plans, args.top, args.ranking)
+    elapsed = (time.perf_counter() - start) / len(queries) if queries else 0.0
+    for i, query in enumerate(queries):
+        if i in errors:
+            yield {'requete': query, 'erreur': errors[i]}
+        elif batch[i] is not None:
+            yield resultRecord(query, batch[i], index, elapsed, args.extraits)
+        else:
+            queryStart = time.perf_counter()
+            try:
+                results = evaluatePlan(plans[i], index, args.ranking, args.top, resultCache)
+            except requeteRI.QueryError as error:
+                yield {'requete': query, 'erreur': str(error)}
+            else:
+                yield resultRecord(query, results, index, time.perf_counter() - queryStart, args.extraits)
+
+def commandBatch(args):
+    '''
+    Commande "batch" : réponse à une requête par ligne d'un fichier (ou de l'entrée standard),
+    chaque résultat étant écrit comme une ligne JSON ; le débit en requêtes par seconde est affiché à la fin
+    :param args: Les arguments de la ligne de commande
+    '''
+    if args.matrice:
+        try:
+            import matriceRI
+        except ImportError as error:
+            print("L'option --matrice nécessite NumPy et SciPy :", error, file=sys.stderr)
+            return 1
+    index = openIndex(args)
+    if index is None:
+        return 1
+    lemmatizer, cachePath = openLemmatizer(args, queryBackend(index))
+    resultCache = openResultCache(args)
+    queries = open(args.requetes, encoding='utf-8') if args.requetes != '-' else sys.stdin
+    output = open(args.sortie, 'w', encoding='utf-8') if args.sortie != '-' else sys.stdout
+    nQueries = 0
+    nErrors = 0
+    start = time.perf_counter()
+    try:
+        lines = (query for query in (line.strip() for line in queries) if query)
+        if args.matrice:
+            matrix = matriceRI.MatrixIndex(index)
+            print("Matrice termes-documents : %d termes, %d documents, %d postings en %.3f s"
+                  % (len(matrix), len(matrix.docNos), matrix.nPostings, time.perf_counter() - start), file=sys.stderr)
+            records = matrixRecords(lines, index, matrix, lemmatizer, args, resultCache)
+        else:
+            records = batchRecords(lines, index, lemmatizer, args, resultCache)
+        for record in records:
+            nQueries += 1
+            if 'erreur' in record:
+                nErrors += 1
+            output.write(json.dumps(record, ensure_ascii=False) + '\n')
+    finally:
+        elapsed = time.perf_counter() - start
+        if queries is not sys.stdin:
+            queries.close()
+        if output is not sys.stdout:
+            output.close()
+        if lemmatizer.cache.dirty:
+            lemmatizer.cache.save(cachePath)
+        index.close()
+    # le bilan va sur la sortie d'erreur pour ne pas mélanger les lignes JSON
+    print("%d requête(s), %d erreur(s) en %.3f s : %.1f requêtes/s"
+          % (nQueries, nErrors, elapsed, nQueries / elapsed if elapsed else 0.0), file=sys.stderr)
+    printCacheStats(resultCache, sys.stderr)
+    return 0
+
+def commandStats(args):
+    '''
+    Commande "stats" : affichage de la taille de l'index et du gain de la compression des postings
+    :param args: Les arguments de la ligne de commande
+    '''
+    index = openIndex(args)
+    if index is None:
+        return 1
+    with index:
+        stats = index.stats()
+    print("Génération :", index.generation, "- index positionnel :", "oui" if index.positional else "non")
+    if isinstance(index, partitionRI.PartitionedIndex):
+        print("Partitions :", index.nPartitions)
+    print("Tokenisation :", queryTokenizer(index), "- normalisation :", queryBackend(index))
+    print("Termes :", stats['termes'], "- documents :", stats['documents'])
+    print("Postings :", stats['postings'], "- positions :", stats['positions'])
+    print("Lexique : %d octets - index permuterm : %d octets - index des %d-grammes : %d octets - table des documents : %d octets"
+          % (stats['lexique'], stats['permuterm'], indexRI.KGRAM_SIZE, stats['kgrammes'], stats['documentsOctets']))
+    print("Magasin des documents (positions des tokens%s) : %d octets"
+          % (", textes" if index.meta['pretraitement'].get('textes') else "", stats['magasin']))
+    print("Postings non compressés : %d octets (%.2f octets/posting)"
+          % (stats['postingsNonCompresses'], stats['octetsParPostingAvant']))
+    print("Postings compressés : %d octets (%.2f octets/posting)"
+          % (stats['postingsCompresses'], stats['octetsParPostingApres']))
+    if stats['postingsCompresses']:
+        print("Taux de compression : %.2f" % (stats['postingsNonCompresses'] / stats['postingsCompresses']))
+    return 0
+
+def parseArgs(argv=None):
+    '''
+    Analyse de la ligne de commande
+    :param argv: La liste des arguments, sys.argv par défaut
+    :return: Les arguments analysés
+    :rtype: argparse.Namespace
+    '''
+    parser = argparse.ArgumentParser(description="Petit moteur de recherche booléen sur un corpus donné")
+
+    # options communes à toutes les commandes
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--index', default='indexInverse', help="dossier de l'index")
+    common.add_argument('--lemma-cache', help="fichier du cache des lemmes (par défaut lemmes.json dans l'index, "
+                                              "lemmes-NORMALISATION.json pour une normalisation autre que spacy)")
+    common.add_argument('--lemma-cache-size', type=int, default=100000,
+                        help="nombre maximal de tokens dans le cache des lemmes")
+    subparsers = parser.add_subparsers(dest='commande')
+    subparsers.required = True
+
+    parserIndex = subparsers.add_parser('index', parents=[common], help="construction de l'index inversé du corpus")
+    parserIndex.add_argument('--corpus', default='ExercicesDeStyle', help="dossier contenant le sous-dossier _txt")
+    parserIndex.add_argument('--batch-size', type=int, default=50, help="nombre de documents lemmatisés par lot")
+    parserIndex.add_argument('--workers', type=int, default=1,
+                             help="nombre de processus d'indexation (os.cpu_count() : %d)" % (os.cpu_count() or 1))
+    parserIndex.add_argument('--full', action='store_true',
+                             help="reconstruction complète, sans réutiliser l'index existant")
+    parserIndex.add_argument('--positions', action='store_true',
+                             help="conservation des positions des lemmes, pour les requêtes \"phrase\" et NEAR/k")
+    parserIndex.add_argument('--partitions', type=int, default=1, metavar='N',
+                             help="répartition des documents entre N index selon leur docNo, interrogés en parallèle")
+    parserIndex.add_argument('--tokenizer', choices=TOKENIZERS, default='nltk',
+                             help="découpage en tokens : nltk.word_tokenize, ou une expression régulière plus rapide "
+                                  "qui détache aussi les élisions (l'homme -> homme) ; les requêtes suivent celui de l'index")
+    parserIndex.add_argument('--lemmatizer', choices=LEMMATIZERS, default='spacy',
+                             help="normalisation des tokens : lemmes spaCy, racines Snowball (rapide, NLTK), lemmes "
+                                  "du dictionnaire Lefff (FrenchLefffLemmatizer) ou aucune ; les requêtes suivent "
+                                  "celle de l'index")
+    parserIndex.add_argument('--textes', action='store_true',
+                             help="conservation du texte compressé de chaque document dans l'index : les extraits "
+                                  "des résultats ne relisent plus les fichiers du corpus")
+    parserIndex.add_argument('--memoire', type=int, default=0, metavar='MO',
+                             help="budget mémoire des postings en Mo : au-delà, ils sont écrits sur disque en blocs "
+                                  "triés, fusionnés à la fin (0 pour tout garder en mémoire)")
+    parserIndex.add_argument('--reparations', default=REPAIRS, metavar='FICHIER',
+                             help="règles de réparation des documents illisibles (JSON, voir reparationRI ; "
+                                  "'' pour n'en appliquer aucune)")
+    parserIndex.add_argument('--profile', action='store_true',
+                             help="tableau du temps, des tokens et des octets de chaque étape de l'indexation")
+    parserIndex.add_argument('--profile-json', metavar='FICHIER',
+                             help="sauvegarde des mesures par étape et par document au format JSON")
+    parserIndex.add_argument('--profile-dump', metavar='FICHIER',
+                             help="sauvegarde d'un profil cProfile du processus principal (pstats, "
+                                  "lisible par snakeviz ou flameprof)")
+    parserIndex.set_defaults(func=commandIndex)
+
+    # options communes aux commandes qui répondent à des requêtes
+    querying = argparse.ArgumentParser(add_help=False)
+    querying.add_argument('--ranking', choices=requeteRI.RANKINGS, default='none',
+                          help="classement des documents trouvés (par défaut, ordre des docNo sans score)")
+    querying.add_argument('--top', type=requeteRI.topArgument, default=10, help="nombre de documents renvoyés avec --ranking")
+    querying.add_argument('--processus', type=int, default=0, metavar='N',
+                          help="nombre de processus d'évaluation d'un index partitionné (0 pour un par partition "
+                               "dans la limite des processeurs, 1 pour n'en créer aucun)")
+    querying.add_argument('--fuzzy', type=int, default=0, metavar='DISTANCE',
+                          help="mode approché : un terme absent du lexique est remplacé par les termes à au plus "
+                               "DISTANCE modifications (0 pour le désactiver)")
+    querying.add_argument('--extraits', action='store_true',
+                          help="extrait de chaque document trouvé, les termes de la requête entre crochets")
+
+    parserSearch = subparsers.add_parser('search', parents=[common, querying],
+                                         help="recherche dans un index déjà construit")
+    parserSearch.add_argument('requete', nargs=argparse.REMAINDER, help="la requête, lue sur l'entrée standard si absente")
+    parserSearch.set_defaults(func=commandSearch)
+
+    # cache des résultats des commandes qui répondent à plusieurs requêtes
+    caching = argparse.ArgumentParser(add_help=False)
+    caching.add_argument('--cache-requetes', type=int, default=1000,
+                         help="nombre maximal de requêtes dont les résultats sont conservés (0 pour désactiver le cache)")
+    caching.add_argument('--cache-octets', type=int, default=64 * 1024 * 1024,
+                         help="taille estimée maximale des résultats conservés, en octets")
+
+    parserRepl = subparsers.add_parser('repl', parents=[common, querying, caching],
+                                       help="recherches successives sans recharger l'index ni le lemmatiseur")
+    parserRepl.set_defaults(func=commandRepl)
+
+    parserBatch = subparsers.add_parser('batch', parents=[common, querying, caching],
+                                        help="une requête par ligne, résultats en lignes JSON")
+    parserBatch.add_argument('--requetes', default='-', help="fichier des requêtes ('-' pour l'entrée standard)")
+    parserBatch.add_argument('--sortie', default='-', help="fichier des résultats ('-' pour la sortie standard)")
+    parserBatch.add_argument('--matrice', action='store_true',
+                             help="classement de toutes les requêtes ensemble sur une matrice creuse termes-documents "
+                                  "chargée en mémoire (NumPy et SciPy, avec --ranking bm25 ou tfidf)")
+    parserBatch.set_defaults(func=commandBatch)
+
+    parserStats = subparsers.add_parser('stats', parents=[common], help="taille de l'index et gain de la compression")
+    parserStats.set_defaults(func=commandStats)
+
+    return parser.parse_args(argv)
+
+# main
+if __name__ == "__main__":
+    args = parseArgs()
+    status = args.func(args)
+    # en mode batch, la sortie standard ne contient que les lignes JSON
+    if args.commande != 'batch':
+        print("\nDone")
+    sys.exit(status)
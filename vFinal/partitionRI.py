@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+###############################
+###########SYNOPSIS############
+###############################
+#
+# Auteurs : Sotiria BAMPATZANI
+#           Morgane DEHARENG
+#
+# But : recherche sur un index partitionné (commande index --partitions N de moteurRI.py) : la requête est
+#       développée une seule fois sur le lexique de toute la collection, envoyée à toutes les partitions en parallèle
+#       sur un groupe de processus, puis les résultats de chaque partition sont fusionnés
+#
+# Usage : module importé par moteurRI.py (ouverture d'un index partitionné avec loadIndex)
+#
+# Principe : les scores sont calculés dans chaque partition avec les statistiques de toute la collection
+#            (nombre de documents, longueur moyenne, fréquences documentaires) : les résultats sont identiques
+#            à ceux d'un index non partitionné
+###############################
+
+import os
+import heapq
+import asyncio
+import itertools
+import indexRI
+import requeteRI
+
+# partitions ouvertes une seule fois dans chaque processus de travail
+workerPartitions = None
+
+def initWorker(paths, ready):
+    '''
+    Initialisation d'un processus de travail : ouverture de toutes les partitions
+    :param paths: Les dossiers des partitions, dans l'ordre de leurs numéros
+    :param ready: La barrière franchie quand tous les processus ont ouvert les partitions (multiprocessing.Barrier)
+    '''
+    global workerPartitions
+    try:
+        workerPartitions = [indexRI.DiskIndex(path) for path in paths]
+    finally:
+        # même en cas d'échec, pour que le processus principal n'attende pas indéfiniment
+        ready.wait()
+
+def workerReady():
+    '''
+    Tâche vide envoyée au démarrage du groupe de processus pour lancer chacun d'eux
+    '''
+    return os.getpid()
+
+def evaluatePartition(partition, operation, plan, k, ranking, stats):
+    '''
+    Évaluation d'un plan sur une partition, dans un processus de travail
+    :param partition: Le numéro de la partition
+    :return: Les résultats de la partition, les autres paramètres et le résultat étant ceux de evaluate
+    :rtype: List
+    '''
+    return evaluate(workerPartitions[partition], operation, plan, k, ranking, stats)
+
+def evaluate(index, operation, plan, k, ranking, stats):
+    '''
+    Évaluation d'un plan déjà développé sur une partition
+    :param index: La partition
+    :param operation: 'rank' pour les k meilleurs résultats classés, 'execute' pour tous les résultats
+    :param plan: Le plan, développé sur le lexique de toute la collection
+    :param k: Le nombre de résultats classés
+    :param ranking: Le modèle de classement
+    :param stats: Les statistiques de toute la collection
+    :return: Les résultats (score, docNo, {terme: fréqLocale}) ou (docNo, {terme: fréqLocale}) de la partition
+    :rtype: List
+    '''
+    if operation == 'rank':
+        return requeteRI.rank(plan, index, k, ranking, stats)
+    return requeteRI.execute(plan, index)
+
+def mergeExecuted(results):
+    '''
+    Fusion des résultats non classés des partitions
+    :param results: La liste des résultats (docNo, {terme: fréqLocale}) de chaque partition, triés par docNo
+    :return: Les résultats de toute la collection triés par docNo
+    :rtype: List
+    '''
+    return list(heapq.merge(*results, key=lambda result: result[0]))
+
+class PartitionedIndex:
+    '''
+    Index partitionné : les documents sont répartis entre plusieurs index sur disque selon leur docNo modulo
+    le nombre de partitions ; cette classe offre les mêmes lectures qu'indexRI.DiskIndex sur toute la collection
+    '''
+
+    def __init__(self, path, workers=0):
+        '''
+        :param path: Le dossier de l'index
+        :param workers: Le nombre de processus d'évaluation, 0 pour un par partition dans la limite des processeurs,
+                        1 pour évaluer les partitions l'une après l'autre dans le processus courant
+        '''
+        self.path = path
+        self.meta = indexRI.readMeta(path)
+        if self.meta is None:
+            raise FileNotFoundError("Index introuvable : " + path)
+        if self.meta['format'] != indexRI.FORMAT_VERSION:
+            raise ValueError("Version du format d'index non prise en charge : " + str(self.meta['format']))
+        self.nPartitions = self.meta['partitions']
+        genPath = os.path.join(path, self.meta['dossier'])
+        self.paths = [os.path.join(genPath, indexRI.PARTITION % partition) for partition in range(self.nPartitions)]
+        self.partitions = [indexRI.DiskIndex(partitionPath) for partitionPath in self.paths]
+        self.nDocs = self.meta['documents']
+        self.positional = self.meta['positions']
+        self.workers = workers or min(self.nPartitions, os.cpu_count() or 1)
+        self.pool = None
+        if self.workers > 1:
+            try:
+                self.startPool()
+            except BaseException:
+                self.close()
+                raise
+
+    def startPool(self):
+        '''
+        Création du groupe de processus, qui ouvrent les partitions par leur chemin : ils sont tous lancés
+        tant que la génération existe, une réindexation la supprime dès la publication de la suivante
+        '''
+        import multiprocessing
+        import concurrent.futures
+        ready = multiprocessing.Barrier(self.workers + 1)
+        self.pool = concurrent.futures.ProcessPoolExecutor(self.workers, initializer=initWorker,
+                                                           initargs=(self.paths, ready))
+        # aucun processus n'est libre avant la barrière : chaque tâche en lance un nouveau
+        started = [self.pool.submit(workerReady) for _ in range(self.workers)]
+        ready.wait()
+        for future in started:
+            future.result()
+
+    @property
+    def generation(self):
+        '''
+        Le numéro de la génération ouverte
+        '''
+        return self.meta['generation']
+
+    def __len__(self):
+        return self.meta['termes']
+
+    @property
+    def avgLength(self):
+        '''
+        Le nombre moyen de lemmes par document de toute la collection
+        '''
+        return self.meta['longueurMoyenne']
+
+    def partitionOf(self, docNo):
+        '''
+        Partition contenant un document
+        :param docNo: L'identifiant du document
+        :rtype: indexRI.DiskIndex
+        '''
+        return self.partitions[docNo % self.nPartitions]
+
+    def docFreq(self, term):
+        '''
+        Nombre de documents de toute la collection contenant un terme
+        :param term: Le terme
+        :rtype: int
+        '''
+        return sum(index.docFreq(term) for index in self.partitions)
+
+    def expand(self, pattern, limit):
+        '''
+        Termes de toute la collection correspondant à un motif avec joker '*', voir indexRI.DiskIndex.expand
+        :param pattern: Le motif
+        :param limit: Le nombre de termes au-delà duquel le parcours s'arrête
+        :return: Les termes triés, au plus limit + 1 pour signaler un dépassement, None si le motif est trop peu
+                 sélectif dans une partition
+        :rtype: List
+        '''
+        # les limit + 1 premiers termes de la collection sont parmi les limit + 1 premiers de chaque partition
+        terms = set()
+        for index in self.partitions:
+            partitionTerms = index.expand(pattern, limit)
+            if partitionTerms is None:
+                return None
+            terms.update(partitionTerms)
+        return sorted(terms)[:limit + 1]
+
+    def fuzzy(self, term, maxDistance, limit):
+        '''
+        Termes de toute la collection proches d'un terme, voir indexRI.DiskIndex.fuzzy
+        :param term: Le terme
+        :param maxDistance: La distance d'édition maximale
+        :param limit: Le nombre maximal de termes renvoyés
+        :return: Les termes les plus proches, par distance croissante puis par ordre alphabétique
+        :rtype: List
+        '''
+        candidates = set()
+        for index in self.partitions:
+            candidates.update(index.fuzzy(term, maxDistance, limit))
+        matches = sorted((indexRI.editDistance(term, candidate, maxDistance), candidate) for candidate in candidates)
+        return [candidate for _, candidate in matches[:limit]]
+
+    def submit(self, operation, plan, k=10, ranking='bm25', stats=None):
+        '''
+        Envoi de l'évaluation d'un plan déjà développé à toutes les partitions, sur le groupe de processus
+        :return: Les futurs des résultats de chaque partition, dans l'ordre des partitions
+        :rtype: List
+        '''
+        return [self.pool.submit(evaluatePartition, partition, operation, plan, k, ranking, stats)
+                for partition in range(self.nPartitions)]
+
+    def scatter(self, operation, plan, k=10, ranking='bm25', stats=None):
+        '''
+        Évaluation d'un plan déjà développé sur toutes les partitions, en parallèle si plusieurs processus sont prévus
+        :return: La liste des résultats de chaque partition
+        :rtype: List
+        '''
+        if self.workers <= 1:
+            return [evaluate(index, operation, plan, k, ranking, stats) for index in self.partitions]
+        return [future.result() for future in self.submit(operation, plan, k, ranking, stats)]
+
+    async def scatterAsync(self, operation, plan, k=10, ranking='bm25', stats=None, executor=None):
+        '''
+        Évaluation attendue de scatter : la boucle d'événements reste libre pendant l'aller-retour avec les processus
+        :param executor: L'exécuteur des évaluations dans le processus courant (un seul processus prévu),
+                         celui de la boucle par défaut
+        :return: La liste des résultats de chaque partition
+        :rtype: List
+        '''
+        loop = asyncio.get_running_loop()
+        if self.workers <= 1:
+            return await loop.run_in_executor(executor, self.scatter, operation, plan, k, ranking, stats)
+        return await asyncio.gather(*[asyncio.wrap_future(future)
+                                      for future in self.submit(operation, plan, k, ranking, stats)])
+
+    def prepare(self, plan):
+        '''
+        Développement d'un plan sur le lexique de toute la collection et statistiques de ses termes pour le classement
+        :param plan: Le plan renvoyé par requeteRI.parseQuery
+        :return: Le plan développé et les statistiques de la collection
+        :rtype: tuple
+        '''
+        plan = plan.expand(self)
+        return plan, requeteRI.collectionStats(self, dict.fromkeys(plan.positiveTerms()))
+
+    def execute(self, plan):
+        '''
+        Évaluation d'un plan sur toute la collection, voir requeteRI.execute
+        :param plan: Le plan renvoyé par requeteRI.parseQuery
+        :return: La liste des résultats (docNo, {terme: fréqLocale}) triée par docNo
+        :rtype: List
+        '''
+        return mergeExecuted(self.scatter('execute', plan.expand(self)))
+
+    def rank(self, plan, k=10, ranking='bm25'):
+        '''
+        Classement des documents de toute la collection, voir requeteRI.rank
+        Chaque partition renvoie ses k meilleurs résultats, dont on garde les k meilleurs
+        :param plan: Le plan renvoyé par requeteRI.parseQuery
+        :param k: Le nombre de résultats à renvoyer
+        :param ranking: Le modèle, 'bm25' ou 'tfidf'
+        :return: La liste des k meilleurs résultats (score, docNo, {terme: fréqLocale})
+        :rtype: List
+        '''
+        plan, stats = self.prepare(plan)
+        results = self.scatter('rank', plan, k, ranking, stats)
+        return requeteRI.topK(itertools.chain.from_iterable(results), k)
+
+    async def executeAsync(self, plan, executor=None):
+        '''
+        Version attendue d'execute, pour une boucle d'événements : le développement du plan et la fusion se font
+        dans l'exécuteur, l'attente des partitions sans bloquer de fil
+        :param executor: L'exécuteur des lectures dans le processus courant, celui de la boucle par défaut
+        :rtype: List
+        '''
+        loop = asyncio.get_running_loop()
+        plan = await loop.run_in_executor(executor, plan.expand, self)
+        results = await self.scatterAsync('execute', plan, executor=executor)
+        return await loop.run_in_executor(executor, mergeExecuted, results)
+
+    async def rankAsync(self, plan, k=10, ranking='bm25', executor=None):
+        '''
+        Version attendue de rank, pour une boucle d'événements, voir executeAsync
+        :param executor: L'exécuteur des lectures dans le processus courant, celui de la boucle par défaut
+        :rtype: List
+        '''
+        loop = asyncio.get_running_loop()
+        plan, stats = await loop.run_in_executor(executor, self.prepare, plan)
+        results = await self.scatterAsync('rank', plan, k, ranking, stats, executor)
+        return requeteRI.topK(itertools.chain.from_iterable(results), k)
+
+    def stats(self):
+        '''
+        Statistiques de taille de l'index, cumulées sur les partitions, voir indexRI.DiskIndex.stats
+        :rtype: dict
+        '''
+        stats = dict()
+        for index in self.partitions:
+            for name, value in index.stats().items():
+                stats[name] = stats.get(name, 0) + value
+        stats['termes'] = len(self)
+        nPostings = stats['postings']
+        stats['octetsParPostingAvant'] = stats['postingsNonCompresses'] / nPostings if nPostings else 0.0
+        stats['octetsParPostingApres'] = stats['postingsCompresses'] / nPostings if nPostings else 0.0
+        return stats
+
+    def items(self):
+        '''
+        Parcours de tout l'index dans l'ordre du lexique, voir indexRI.DiskIndex.items
+        :rtype: generator
+        '''
+        return indexRI.mergeTerms([index.items() for index in self.partitions])
+
+    def terms(self):
+        '''
+        Parcours des termes distincts de toute la collection dans l'ordre
+        :rtype: generator
+        '''
+        for term, _ in itertools.groupby(heapq.merge(*[index.terms() for index in self.partitions])):
+            yield term
+
+    def document(self, docNo):
+        '''
+        Nom du fichier et titre d'un document
+        :param docNo: L'identifiant du document
+        :rtype: tuple
+        '''
+        return self.partitionOf(docNo).document(docNo)
+
+    def storedEntry(self, docNo):
+        '''
+        Fiche d'un document dans le magasin de sa partition, voir indexRI.DiskIndex.storedEntry
+        :param docNo: L'identifiant du document
+        :rtype: bytes
+        '''
+        return self.partitionOf(docNo).storedEntry(docNo)
+
+    def storedDocument(self, docNo):
+        '''
+        Fiche décodée d'un document, voir indexRI.DiskIndex.storedDocument
+        :param docNo: L'identifiant du document
+        :rtype: dict
+        '''
+        return self.partitionOf(docNo).storedDocument(docNo)
+
+    def docLength(self, docNo):
+        '''
+        Nombre de lemmes d'un document
+        :param docNo: L'identifiant du document
+        :rtype: int
+        '''
+        return self.partitionOf(docNo).docLength(docNo)
+
+    def docNos(self):
+        '''
+        Liste croissante des docNo de toute la collection
+        :rtype: List
+        '''
+        return list(heapq.merge(*[index.docNos() for index in self.partitions]))
+
+    def allDocuments(self):
+        '''
+        Lecture de la table des documents de toutes les partitions
+        :return: La table des documents {docNo: (nom du fichier, titre, nombre de lemmes)}
+        :rtype: dict
+        '''
+        allTitle = dict()
+        for index in self.partitions:
+            allTitle.update(index.allDocuments())
+        return allTitle
+
+    def fingerprints(self):
+        '''
+        Lecture des empreintes des fichiers indexés dans toutes les partitions
+        :return: Les empreintes {nom du fichier: empreinte}
+        :rtype: dict
+        '''
+        fingerprints = dict()
+        for index in self.partitions:
+            fingerprints.update(index.fingerprints())
+        return fingerprints
+
+    def close(self):
+        '''
+        Arrêt des processus d'évaluation et fermeture des partitions
+        '''
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        for index in self.partitions:
+            index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
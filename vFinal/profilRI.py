@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+###############################
+###########SYNOPSIS############
+###############################
+#
+# Auteurs : Sotiria BAMPATZANI
+#           Morgane DEHARENG
+#
+# But : mesure du temps passé dans chaque étape de l'indexation (appels, durée, tokens traités, octets lus),
+#       au total et par document
+#
+# Usage : module importé par moteurRI.py (option --profile de la commande index)
+#
+# Principe : les fonctions mesurées sont remplacées dans leur module par une version chronométrée
+#            uniquement quand la mesure est activée ; désactivée, elle ne coûte donc rien
+###############################
+
+import os
+import time
+import functools
+
+# mesure activée dans ce processus
+active = False
+# étapes mesurées {nom de l'étape: [appels, durée totale, durée propre, tokens, octets]}
+stages = dict()
+# mesures par document {nom du fichier: {nom de l'étape: [appels, durée propre, tokens, octets]}}
+documents = dict()
+# pile des étapes en cours : durée passée dans les étapes imbriquées, à retirer de la durée propre
+stack = list()
+# document en cours de traitement, fixé par l'étape d'ouverture des fichiers
+currentDocument = None
+
+CALLS, TOTAL, SELF, TOKENS, BYTES = range(5)
+
+def countTokens(args, result):
+    '''
+    Nombre de tokens renvoyés par une étape
+    :rtype: int
+    '''
+    return len(result)
+
+def countInputTokens(args, result):
+    '''
+    Nombre de tokens reçus par une étape, en premier argument après self
+    :rtype: int
+    '''
+    return len(args[1])
+
+def countBytes(args, result):
+    '''
+    Nombre d'octets du texte renvoyé par une étape
+    :rtype: int
+    '''
+    return len(result.encode('utf-8'))
+
+def record(stage, elapsed, children, tokens, nBytes, perDocument):
+    '''
+    Enregistrement d'un appel d'une étape
+    :param stage: Le nom de l'étape
+    :param elapsed: La durée de l'appel en secondes
+    :param children: La durée passée dans les étapes mesurées appelées par celle-ci
+    :param tokens: Le nombre de tokens traités
+    :param nBytes: Le nombre d'octets lus
+    :param perDocument: L'appel est attribué au document en cours
+    '''
+    totals = stages.get(stage)
+    if totals is None:
+        totals = stages[stage] = [0, 0.0, 0.0, 0, 0]
+    totals[CALLS] += 1
+    totals[TOTAL] += elapsed
+    totals[SELF] += elapsed - children
+    totals[TOKENS] += tokens
+    totals[BYTES] += nBytes
+    if perDocument and currentDocument is not None:
+        perStage = documents.setdefault(currentDocument, dict())
+        values = perStage.get(stage)
+        if values is None:
+            values = perStage[stage] = [0, 0.0, 0, 0]
+        values[0] += 1
+        values[1] += elapsed - children
+        values[2] += tokens
+        values[3] += nBytes
+
+def timed(function, stage, tokens=None, nBytes=None, perDocument=True, opens=False):
+    '''
+    Version chronométrée d'une fonction
+    :param function: La fonction
+    :param stage: Le nom de l'étape
+    :param tokens: La fonction (args, résultat) -> nombre de tokens traités, None si sans objet
+    :param nBytes: La fonction (args, résultat) -> nombre d'octets lus, None si sans objet
+    :param perDocument: Les appels sont attribués au document en cours
+    :param opens: Le premier argument de la fonction est le fichier du document qui devient le document en cours
+    :rtype: function
+    '''
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        global currentDocument
+        if opens:
+            currentDocument = os.path.basename(args[0])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+        record(stage, elapsed, children, tokens(args, result) if tokens else 0,
+               nBytes(args, result) if nBytes else 0, perDocument)
+        return result
+    wrapper.profiled = function
+    return wrapper
+
+def instrument(targets):
+    '''
+    Activation de la mesure : remplacement des fonctions et méthodes désignées par leur version chronométrée
+    Sans effet sur une fonction déjà remplacée (processus de travail créés par fork)
+    :param targets: La liste des (module ou classe, nom de l'attribut, nom de l'étape, options de timed)
+    '''
+    global active
+    for owner, name, stage, options in targets:
+        function = getattr(owner, name)
+        if not hasattr(function, 'profiled'):
+            setattr(owner, name, timed(function, stage, **options))
+    active = True
+
+def reset():
+    '''
+    Remise à zéro des mesures
+    '''
+    global currentDocument
+    stages.clear()
+    documents.clear()
+    currentDocument = None
+
+def takeSnapshot():
+    '''
+    Lecture et remise à zéro des mesures, pour les renvoyer au processus principal
+    :return: Les mesures (étapes, documents), None si la mesure n'est pas activée
+    :rtype: tuple
+    '''
+    if not active:
+        return None
+    snapshot = (dict(stages), dict(documents))
+    reset()
+    return snapshot
+
+def absorb(snapshot):
+    '''
+    Ajout des mesures d'un processus de travail à celles du processus courant
+    :param snapshot: Les mesures renvoyées par takeSnapshot
+    '''
+    if snapshot is None:
+        return
+    otherStages, otherDocuments = snapshot
+    for stage, values in otherStages.items():
+        totals = stages.setdefault(stage, [0, 0.0, 0.0, 0, 0])
+        for i, value in enumerate(values):
+            totals[i] += value
+    for name, perStage in otherDocuments.items():
+        documents.setdefault(name, dict()).update(perStage)
+
+def report():
+    '''
+    Mesures au format JSON
+    :return: Les mesures {'etapes': {étape: {...}}, 'documents': {fichier: {étape: {...}}}}
+    :rtype: dict
+    '''
+    return {
+        'etapes': {stage: {'appels': values[CALLS], 'secondes': values[TOTAL], 'secondesPropres': values[SELF],
+                           'tokens': values[TOKENS], 'octets': values[BYTES]}
+                   for stage, values in stages.items()},
+        'documents': {name: {stage: {'appels': calls, 'secondesPropres': seconds, 'tokens': tokens, 'octets': nBytes}
+                             for stage, (calls, seconds, tokens, nBytes) in perStage.items()}
+                      for name, perStage in documents.items()},
+    }
+
+def printSummary(wallTime, slowest=5):
+    '''
+    Affichage du tableau récapitulatif des étapes et des documents les plus lents
+    :param wallTime: La durée totale de l'indexation, pour calculer la part de chaque étape
+    :param slowest: Le nombre de documents les plus lents affichés
+    '''
+    print("\n%-22s %9s %10s %10s %7s %11s %12s %12s"
+          % ("Étape", "Appels", "Total (s)", "Propre (s)", "Part", "Tokens", "Octets", "Tokens/s"))
+    measured = 0.0
+    for stage, values in sorted(stages.items(), key=lambda item: -item[1][SELF]):
+        measured += values[SELF]
+        rate = values[TOKENS] / values[SELF] if values[TOKENS] and values[SELF] else 0
+        print("%-22s %9d %10.3f %10.3f %6.1f%% %11d %12d %12.0f"
+              % (stage, values[CALLS], values[TOTAL], values[SELF], 100 * values[SELF] / wallTime if wallTime else 0,
+                 values[TOKENS], values[BYTES], rate))
+    # processus de travail : leurs durées s'ajoutent et peuvent dépasser la durée totale
+    other = max(0.0, wallTime - measured)
+    print("%-22s %9s %10s %10.3f %6.1f%%" % ("(non mesuré)", "", "", other, 100 * other / wallTime if wallTime else 0))
+    print("%-22s %9s %10.3f" % ("Total", "", wallTime))
+
+    byDocument = sorted(documents.items(), key=lambda item: -sum(values[1] for values in item[1].values()))
+    if byDocument:
+        print("\nDocuments les plus lents :")
+        for name, perStage in byDocument[:slowest]:
+            detail = ", ".join("%s %.1f ms" % (stage, values[1] * 1000) for stage, values in perStage.items())
+            print("  %-30s %8.1f ms (%s)" % (name, sum(values[1] for values in perStage.values()) * 1000, detail))
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+###############################
+###########SYNOPSIS############
+###############################
+#
+# Auteurs : Sotiria BAMPATZANI
+#           Morgane DEHARENG
+#
+# But : réparation des documents illisibles pendant l'indexation, à l'aide de règles de remplacement
+#       décrites dans un fichier JSON (par défaut reparations.json, à côté de moteurRI.py)
+#
+# Usage : module importé par moteurRI.py (option --reparations de la commande index)
+#
+# Format : {"regles": [{"fichiers": "exercice73!.txt", "texte": "...", "remplacement": "..."},
+#                      {"fichiers": "*", "motif": "expression régulière", "remplacement": "modèle avec \\1"}]}
+#          "fichiers" est un motif de nom de fichier (fnmatch, "*" par défaut) ; une règle "texte" remplace
+#          une chaîne littérale, une règle "motif" une expression régulière ; le champ "commentaire" est ignoré
+#
+# Principe : les règles d'un fichier sont compilées en une seule expression régulière appliquée en une passe :
+#            les textes forment un arbre préfixe (trie), dont le coût par caractère ne dépend pas de leur nombre ;
+#            les motifs qui commencent par un texte fixe (\bqueu\w\b commence par queu) forment un second
+#            arbre préfixe de ces débuts, et ne sont essayés qu'aux positions où il en reconnaît un ; les autres
+#            motifs suivent dans l'ordre du fichier ; à une même position, un texte passe avant les motifs,
+#            le plus long texte l'emporte et les motifs sont essayés dans l'ordre du fichier
+#
+# Limite : un motif sans début fixe (alternative |, classe, drapeaux globaux...) est essayé à chaque position
+#          du texte : le coût de la réparation croît avec le nombre de ces motifs, pas avec celui des autres règles
+###############################
+
+import re
+import json
+import fnmatch
+import hashlib
+
+def trieRegex(words):
+    '''
+    Expression régulière reconnaissant un ensemble de chaînes littérales, factorisée selon leurs préfixes
+    :param words: Les chaînes, non vides
+    :return: L'expression, sans groupe capturant, qui reconnaît la plus longue chaîne possible
+    :rtype: String
+    '''
+    trie = dict()
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, dict())
+        # la clé vide marque la fin d'une chaîne
+        node[''] = None
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            # suite facultative et gloutonne : la chaîne la plus longue est préférée
+            pattern = '(?:' + pattern + ')?' if len(branches) == 1 and len(pattern) > 1 else pattern + '?'
+        return pattern
+
+    return build(trie)
+
+# drapeaux globaux en tête d'un motif, par exemple (?i)
+GLOBAL_FLAGS = re.compile(r'\(\?([aiLmsux]+)\)')
+# test d'existence d'un groupe numéroté : (?(1)oui|non)
+GROUP_CONDITION = re.compile(r'\(\?\((\d+)\)')
+# groupe numéroté dans un modèle de remplacement : \g<1>
+TEMPLATE_GROUP = re.compile(r'\\g<(\d+)>')
+OCTDIGITS = '01234567'
+# expression vide, dont la substitution dans une chaîne vide interprète les échappements d'un texte de remplacement
+EMPTY = re.compile('')
+# caractères spéciaux des expressions régulières, qui terminent le début fixe d'un motif
+SPECIAL = set('.^$*+?{}[]()|\\')
+
+def literalPrefix(pattern):
+    '''
+    Début fixe d'un motif : le texte par lequel commence toute chaîne qu'il reconnaît
+    :param pattern: Le motif
+    :return: Le début fixe, précédé ou non d'une limite de mot \\b, None si le motif n'en a pas
+    :rtype: tuple
+    '''
+    # une alternative peut porter sur le début du motif, des drapeaux globaux en changer le sens
+    if '|' in pattern or GLOBAL_FLAGS.match(pattern):
+        return None
+    boundary = pattern.startswith('\\b')
+    i = 2 if boundary else 0
+    prefix = list()
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\' and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            # caractère spécial échappé
+            prefix.append(pattern[i + 1])
+            i += 2
+        elif char not in SPECIAL:
+            prefix.append(char)
+            i += 1
+        else:
+            break
+    # le dernier caractère est facultatif s'il est suivi de *, ? ou {0,...}
+    if prefix and pattern[i:i + 1] in ('*', '?', '{'):
+        prefix.pop()
+    if not prefix:
+        return None
+    return boundary, ''.join(prefix)
+
+def shiftGroups(pattern, offset, verbose=False):
+    '''
+    Renumérotation des références aux groupes d'un motif (\\1, (?(1)...)) décalé dans une expression plus large
+    :param pattern: Le motif, sans drapeaux globaux
+    :param offset: Le nombre de groupes capturants qui précèdent le motif
+    :param verbose: Le motif est écrit en mode verbeux (re.VERBOSE), les commentaires sont alors recopiés tels quels
+    :return: Le motif réécrit
+    :rtype: String
+    :raise re.error: Si une référence renumérotée dépasse le groupe 99
+    '''
+    result = list()
+    inClass = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            digits = pattern[i + 1:i + 4]
+            # dans une classe, \\1 est un caractère octal ; \\0 et trois chiffres octaux aussi
+            if inClass or not digits[:1].isdigit() or digits[0] == '0' or \
+                    (len(digits) == 3 and all(digit in OCTDIGITS for digit in digits)):
+                end = i + 2
+            else:
+                end = i + 3 if digits[1:2].isdigit() else i + 2
+                number = int(pattern[i + 1:end]) + offset
+                if number > 99:
+                    raise re.error("référence au groupe %d impossible dans l'expression combinée" % number)
+                # le groupe non capturant empêche un chiffre qui suit d'être lu avec la référence
+                result.append('(?:\\%d)' % number)
+                i = end
+                continue
+            result.append(pattern[i:end])
+            i = end
+        elif inClass:
+            inClass = char != ']'
+            result.append(char)
+            i += 1
+        elif char == '[':
+            # un ] placé en tête de la classe est un caractère ordinaire
+            end = i + 1
+            if pattern[end:end + 1] == '^':
+                end += 1
+            if pattern[end:end + 1] == ']':
+                end += 1
+            inClass = True
+            result.append(pattern[i:end])
+            i = end
+        elif char == '#' and verbose:
+            end = pattern.find('\n', i)
+            end = len(pattern) if end < 0 else end
+            result.append(pattern[i:end])
+            i = end
+        else:
+            condition = GROUP_CONDITION.match(pattern, i)
+            if condition:
+                result.append('(?(%d)' % (int(condition.group(1)) + offset))
+                i = condition.end()
+            else:
+                result.append(char)
+                i += 1
+    return ''.join(result)
+
+def compileTemplate(template, offset, nGroups):
+    '''
+    Analyse d'un modèle de remplacement (\\1, \\g<1>), faite une seule fois : Match.expand l'analyse à chaque appel
+    :param template: Le modèle, tel qu'il est écrit dans la règle
+    :param offset: Le numéro du groupe englobant le motif dans l'expression où il est appliqué, 0 pour le motif seul
+    :param nGroups: Le nombre de groupes du motif
+    :return: Les morceaux du remplacement : textes, échappements interprétés, et numéros de groupes, \\g<0>
+             désignant le groupe englobant
+    :rtype: List
+    :raise re.error: Si le modèle désigne un groupe absent du motif ou contient un échappement invalide
+    '''
+    pieces = list()
+    literal = list()
+    i = 0
+    while i < len(template):
+        char = template[i]
+        if char != '\\':
+            literal.append(char)
+            i += 1
+            continue
+        digits = template[i + 1:i + 4]
+        named = TEMPLATE_GROUP.match(template, i)
+        if named:
+            number, end = int(named.group(1)), named.end()
+        elif digits[:1].isdigit() and digits[0] != '0' and \
+                not (len(digits) == 3 and all(digit in OCTDIGITS for digit in digits)):
+            end = i + 3 if digits[1:2].isdigit() else i + 2
+            number = int(template[i + 1:end])
+        else:
+            # autre échappement (\\n, \\0 octal...), interprété avec le texte qui l'entoure
+            literal.append(template[i:i + 2])
+            i += 2
+            continue
+        if number > nGroups:
+            raise re.error("groupe %d absent du motif dans le modèle %s" % (number, template))
+        if literal:
+            pieces.append(EMPTY.sub(''.join(literal), ''))
+            literal = list()
+        pieces.append(number + offset if number else offset)
+        i = end
+    if literal:
+        pieces.append(EMPTY.sub(''.join(literal), ''))
+    return pieces
+
+def expandTemplate(pieces, match):
+    '''
+    Texte de remplacement d'une correspondance, voir compileTemplate
+    :param pieces: Les morceaux du modèle
+    :param match: La correspondance
+    :rtype: String
+    '''
+    return ''.join(piece if isinstance(piece, str) else match.group(piece) or '' for piece in pieces)
+
+def embedPattern(pattern, offset):
+    '''
+    Réécriture d'un motif pour l'insérer dans une alternative de l'expression combinée
+    :param pattern: Le motif, tel qu'il est écrit dans la règle
+    :param offset: Le nombre de groupes capturants qui précèdent le motif
+    :return: Le motif réécrit, dont les drapeaux ne s'appliquent qu'à lui
+    :rtype: String
+    '''
+    flags = ''
+    start = 0
+    match = GLOBAL_FLAGS.match(pattern)
+    while match:
+        flags += match.group(1)
+        start = match.end()
+        match = GLOBAL_FLAGS.match(pattern, start)
+    body = shiftGroups(pattern[start:], offset, verbose='x' in flags)
+    # u est déjà le mode par défaut d'un motif texte
+    flags = ''.join(sorted(set(flags) - {'u'}))
+    if not flags:
+        return body
+    # en mode verbeux, le saut de ligne évite qu'un commentaire final n'absorbe la parenthèse fermante
+    return '(?' + flags + ':' + body + ('\n)' if 'x' in flags else ')')
+
+class Repairer:
+    '''
+    Réparation d'un texte par un ensemble de règles compilées en une seule expression régulière
+    '''
+
+    def __init__(self, rules):
+        '''
+        :param rules: La liste des règles {'texte' ou 'motif': ..., 'remplacement': ...}
+        '''
+        self.literals = {rule['texte']: rule['remplacement'] for rule in rules if 'texte' in rule}
+        # début fixe -> motifs qui commencent par lui (rang de la règle, motif compilé seul, modèle)
+        self.keyed = dict()
+        # motifs sans début fixe, dans l'ordre du fichier
+        self.unkeyed = list()
+        prefixes = {True: set(), False: set()}
+        for number, rule in enumerate(rules):
+            if 'motif' in rule:
+                pattern = re.compile(rule['motif'])
+                entry = (number, pattern, compileTemplate(rule['remplacement'], 0, pattern.groups))
+                prefix = literalPrefix(rule['motif'])
+                if prefix is None:
+                    self.unkeyed.append(entry)
+                else:
+                    prefixes[prefix[0]].add(prefix[1])
+                    self.keyed.setdefault(prefix[1], list()).append(entry)
+        self.prefixLengths = sorted(set(len(prefix) for prefix in self.keyed))
+
+        alternatives = list()
+        # numéro du groupe englobant chaque motif sans début fixe -> modèle renuméroté pour l'expression combinée
+        self.templates = dict()
+        self.literalGroup = self.keyedGroup = None
+        group = 1
+        if self.literals:
+            alternatives.append('(' + trieRegex(self.literals) + ')')
+            self.literalGroup = group
+            group += 1
+        if self.keyed:
+            starts = ['\\b' + trieRegex(prefixes[True])] if prefixes[True] else []
+            starts += [trieRegex(prefixes[False])] if prefixes[False] else []
+            alternatives.append('(' + '|'.join(starts) + ')')
+            self.keyedGroup = group
+            group += 1
+        for number, pattern, _ in self.unkeyed:
+            alternatives.append('(' + embedPattern(pattern.pattern, group) + ')')
+            self.templates[group] = compileTemplate(rules[number]['remplacement'], group, pattern.groups)
+            group += 1 + pattern.groups
+        self.regex = re.compile('|'.join(alternatives))
+
+    def matchAt(self, text, start):
+        '''
+        Application du premier motif, dans l'ordre du fichier, qui reconnaît le texte à une position où commence
+        le début fixe d'un motif
+        :param text: Le texte
+        :param start: La position
+        :return: La fin de la correspondance et le texte de remplacement, None si aucun motif ne s'applique
+        :rtype: tuple
+        '''
+        candidates = [entry for length in self.prefixLengths
+                      for entry in self.keyed.get(text[start:start + length], ())]
+        for _, pattern, template in sorted(candidates + self.unkeyed, key=lambda entry: entry[0]):
+            match = pattern.match(text, start)
+            if match:
+                return match.end(), expandTemplate(template, match)
+        return None
+
+    def repair(self, text):
+        '''
+        Réparation d'un texte en une seule passe
+        :param text: Le texte
+        :return: Le texte réparé
+        :rtype: String
+        '''
+        pieces = list()
+        position = 0
+        match = self.regex.search(text)
+        while match:
+            start = match.start()
+            # le groupe englobant d'une alternative se ferme en dernier : c'est lastindex
+            if match.lastindex == self.literalGroup:
+                end, replacement = match.end(), self.literals[match.group()]
+            elif match.lastindex == self.keyedGroup:
+                found = self.matchAt(text, start)
+                if found is None:
+                    match = self.regex.search(text, start + 1)
+                    continue
+                end, replacement = found
+            else:
+                # motif sans début fixe : ses groupes sont lus directement dans l'expression combinée
+                end, replacement = match.end(), expandTemplate(self.templates[match.lastindex], match)
+            pieces.append(text[position:start])
+            pieces.append(replacement)
+            position = end
+            if end == start:
+                # après une correspondance vide, la recherche reprend au caractère suivant
+                if end == len(text):
+                    break
+                end += 1
+            match = self.regex.search(text, end)
+        pieces.append(text[position:])
+        return ''.join(pieces)
+
+class RepairRules:
+    '''
+    Ensemble des règles de réparation, compilées pour chaque combinaison de motifs de fichiers rencontrée
+    '''
+
+    def __init__(self, rules=()):
+        '''
+        :param rules: La liste des règles, dans l'ordre du fichier
+        :raise ValueError: Si une règle est mal formée, si son expression régulière est invalide
+                           ou si les règles ne peuvent pas être réunies en une seule expression
+        '''
+        self.rules = list()
+        for number, rule in enumerate(rules, start=1):
+            kinds = [kind for kind in ('texte', 'motif') if kind in rule]
+            if len(kinds) != 1 or 'remplacement' not in rule:
+                raise ValueError("Règle de réparation n°%d : un champ texte ou motif et un champ remplacement "
+                                 "sont attendus" % number)
+            if kinds == ['texte'] and not rule['texte']:
+                raise ValueError("Règle de réparation n°%d : texte vide" % number)
+            if kinds == ['motif']:
+                try:
+                    pattern = re.compile(rule['motif'])
+                except re.error as error:
+                    raise ValueError("Règle de réparation n°%d : motif invalide (%s)" % (number, error))
+                if pattern.groupindex:
+                    raise ValueError("Règle de réparation n°%d : groupes nommés non pris en charge" % number)
+            self.rules.append({'fichiers': rule.get('fichiers', '*'), kinds[0]: rule[kinds[0]],
+                               'remplacement': rule['remplacement']})
+        # l'expression combinée de toutes les règles compte le plus de groupes : si elle se compile,
+        # celle de chaque sous-ensemble aussi
+        try:
+            Repairer(self.rules)
+        except (re.error, IndexError) as error:
+            # IndexError : nom de groupe inconnu dans un modèle de remplacement
+            raise ValueError("Règles de réparation incompatibles (%s)" % error)
+        self.compiled = dict()
+
+    def __len__(self):
+        return len(self.rules)
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Chargement des règles d'un fichier JSON
+        :param path: Le chemin du fichier, None pour aucune règle
+        :return: Les règles, vides si le fichier n'existe pas
+        :rtype: RepairRules
+        '''
+        if path is None:
+            return cls()
+        try:
+            with open(path, encoding='utf-8') as f:
+                content = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        return cls(content.get('regles', ()))
+
+    def digest(self):
+        '''
+        Condensat des règles, enregistré avec l'index pour détecter leur modification
+        :return: Le condensat SHA-1, None sans règle
+        :rtype: String
+        '''
+        if not self.rules:
+            return None
+        return hashlib.sha1(json.dumps(self.rules, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def covers(self, filename):
+        '''
+        Au moins une règle s'applique au fichier
+        :param filename: Le nom du fichier, sans le dossier
+        :rtype: bool
+        '''
+        return any(fnmatch.fnmatchcase(filename, rule['fichiers']) for rule in self.rules)
+
+    def repairer(self, filename):
+        '''
+        Réparateur d'un fichier, compilé une seule fois par combinaison de règles
+        :param filename: Le nom du fichier, sans le dossier
+        :return: Le réparateur, None si aucune règle ne s'applique au fichier
+        :rtype: Repairer
+        '''
+        selected = tuple(i for i, rule in enumerate(self.rules) if fnmatch.fnmatchcase(filename, rule['fichiers']))
+        if not selected:
+            return None
+        repairer = self.compiled.get(selected)
+        if repairer is None:
+            repairer = self.compiled[selected] = Repairer([self.rules[i] for i in selected])
+        return repairer
@@ -0,0 +1,830 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+###############################
+###########SYNOPSIS############
+###############################
+#
+# Auteurs : Sotiria BAMPATZANI
+#           Morgane DEHARENG
+#
+# But : analyse des requêtes booléennes et évaluation sur les listes de postings triées par docNo
+#
+# Usage : module importé par moteurRI.py
+#
+# Syntaxe : chapeau +pardessus -cou   les termes préfixés par '+' sont obligatoires, ceux préfixés par '-' exclus,
+#                                     les autres facultatifs (au moins un est requis s'il n'y a aucun terme obligatoire)
+#           chapeau AND (cou OR autobus) NOT pardessus
+#                                     opérateurs en majuscules (ou ET, OU, SAUF) et parenthèses
+#           "chapeau mou"             expression exacte (index construit avec --positions)
+#           chapeau NEAR/3 cou        deux termes séparés d'au plus 3 positions, dans n'importe quel ordre
+#           chap* *dessus p*s         termes du lexique (lemmes) correspondant au motif, '*' pour n'importe quelle suite
+#           (mode approché)           un terme absent du lexique est remplacé par les termes les plus proches
+###############################
+
+import re
+import math
+import argparse
+import heapq
+import collections
+
+# découpage de la requête : expressions entre guillemets, opérateurs NEAR/k, parenthèses, préfixes '+' et '-', mots
+TOKEN = re.compile(r'"[^"]*"?|NEAR/\d+|[()]|[+-]|[^\s()+\-"][^\s()"]*')
+NEAR = re.compile(r'NEAR/(\d+)$')
+
+OPERATORS = {
+    'AND': 'AND', 'ET': 'AND',
+    'OR': 'OR', 'OU': 'OR',
+    'NOT': 'NOT', 'SAUF': 'NOT',
+}
+
+# nombre maximal de termes du lexique qu'un motif avec joker peut désigner
+MAX_EXPANSIONS = 100
+
+class QueryError(ValueError):
+    '''
+    Requête mal formée
+    '''
+
+class ListCursor:
+    '''
+    Curseur sur une liste de docNo triée déjà calculée, avec la même interface que indexRI.PostingCursor
+    '''
+
+    def __init__(self, docNos):
+        '''
+        :param docNos: La liste des docNo triée
+        '''
+        self.docNos = docNos
+        self.count = len(docNos)
+        # pointeurs de saut implicites tous les √n éléments
+        self.step = max(1, math.isqrt(self.count))
+        self.position = 0
+        self.docNo = docNos[0] if docNos else None
+
+    def next(self):
+        '''
+        Passage à l'élément suivant
+        '''
+        self.position += 1
+        self.docNo = self.docNos[self.position] if self.position < self.count else None
+
+    def skipTo(self, target):
+        '''
+        Avancée jusqu'au premier docNo supérieur ou égal à target
+        :param target: Le docNo recherché
+        '''
+        while self.docNo is not None and self.docNo < target:
+            ahead = self.position + self.step
+            if ahead < self.count and self.docNos[ahead] <= target:
+                self.position = ahead
+                self.docNo = self.docNos[ahead]
+            else:
+                self.next()
+
+def intersect(docNos, cursor):
+    '''
+    Intersection d'une liste de docNo avec une liste de postings parcourue par un curseur à sauts
+    Le coût est proportionnel à la liste la plus courte, qui doit être passée en premier
+    :param docNos: La liste des docNo triée
+    :param cursor: Le curseur sur l'autre liste
+    :return: La liste triée des docNo présents dans les deux listes
+    :rtype: List
+    '''
+    result = list()
+    for docNo in docNos:
+        cursor.skipTo(docNo)
+        if cursor.docNo is None:
+            break
+        if cursor.docNo == docNo:
+            result.append(docNo)
+    return result
+
+def difference(docNos, cursor):
+    '''
+    Différence entre une liste de docNo et une liste de postings parcourue par un curseur à sauts
+    :param docNos: La liste des docNo triée
+    :param cursor: Le curseur sur la liste des docNo à exclure
+    :return: La liste triée des docNo absents de la seconde liste
+    :rtype: List
+    '''
+    result = list()
+    for docNo in docNos:
+        cursor.skipTo(docNo)
+        if cursor.docNo != docNo:
+            result.append(docNo)
+    return result
+
+def union(lists):
+    '''
+    Union de listes de docNo triées par fusion
+    :param lists: Les listes de docNo triées
+    :return: La liste triée et sans doublons des docNo
+    :rtype: List
+    '''
+    result = list()
+    for docNo in heapq.merge(*lists):
+        if not result or result[-1] != docNo:
+            result.append(docNo)
+    return result
+
+def intersectNodes(nodes, index):
+    '''
+    Intersection des documents satisfaisant plusieurs nœuds, le plus rare d'abord :
+    chaque intersection coûte au plus la taille du résultat courant
+    :param nodes: Les nœuds
+    :param index: L'index ouvert avec moteurRI.loadIndex
+    :return: La liste triée des docNo satisfaisant tous les nœuds
+    :rtype: List
+    '''
+    nodes = sorted(nodes, key=lambda node: node.estimate(index))
+    result = nodes[0].evaluate(index)
+    for node in nodes[1:]:
+        if not result:
+            break
+        result = intersect(result, node.cursor(index))
+    return result
+
+def requirePositions(index):
+    '''
+    Vérification de la présence des positions dans l'index
+    :param index: L'index ouvert avec moteurRI.loadIndex
+    '''
+    if not index.positional:
+        raise QueryError("L'index ne contient pas les positions des termes : reconstruisez-le avec index --positions")
+
+def phraseMatch(positionLists):
+    '''
+    Recherche d'une occurrence de termes à des positions consécutives
+    :param positionLists: Les listes de positions de chaque terme de l'expression, dans l'ordre de l'expression
+    :return: Vrai si le i-ème terme apparaît à la position p + i pour une même position p
+    :rtype: bool
+    '''
+    starts = set(positionLists[0])
+    for offset, positions in enumerate(positionLists[1:], start=1):
+        starts.intersection_update(position - offset for position in positions)
+        if not starts:
+            return False
+    return True
+
+def nearMatch(first, second, distance):
+    '''
+    Recherche de deux positions proches par fusion des deux listes triées
+    :param first: Les positions du premier terme
+    :param second: Les positions du second terme
+    :param distance: L'écart maximal entre les deux positions
+    :return: Vrai s'il existe deux positions distantes d'au plus distance
+    :rtype: bool
+    '''
+    i, j = 0, 0
+    while i < len(first) and j < len(second):
+        if abs(first[i] - second[j]) <= distance:
+            return True
+        if first[i] < second[j]:
+            i += 1
+        else:
+            j += 1
+    return False
+
+class Node:
+    '''
+    Nœud du plan d'exécution d'une requête
+    '''
+
+    def estimate(self, index):
+        '''
+        Estimation du nombre de documents satisfaisant le nœud, pour ordonner les intersections
+        :param index: L'index ouvert avec moteurRI.loadIndex
+        :rtype: int
+        '''
+        raise NotImplementedError
+
+    def cursor(self, index):
+        '''
+        Curseur à sauts sur les docNo satisfaisant le nœud
+        :param index: L'index ouvert avec moteurRI.loadIndex
+        '''
+        return ListCursor(self.evaluate(index))
+
+    def evaluate(self, index):
+        '''
+        Évaluation du nœud
+        :param index: L'index ouvert avec moteurRI.loadIndex
+        :return: La liste triée des docNo satisfaisant le nœud
+        :rtype: List
+        '''
+        raise NotImplementedError
+
+    def positiveTerms(self):
+        '''
+        Les termes recherchés par le nœud, hors termes exclus
+        :rtype: List
+        '''
+        raise NotImplementedError
+
+    def key(self):
+        '''
+        Forme normalisée du nœud, identique pour deux requêtes équivalentes à l'ordre des clauses près,
+        utilisée comme clé du cache des résultats
+        :rtype: tuple
+        '''
+        raise NotImplementedError
+
+    def expand(self, index):
+        '''
+        Remplacement des motifs avec joker par les termes du lexique qu'ils désignent
+        :param index: L'index ouvert avec moteurRI.loadIndex
+        :return: Le nœud sans motif
+        :rtype: Node
+        '''
+        return self
+
+class Term(Node):
+    '''
+    Un terme de la requête, après normalisation
+    '''
+
+    def __init__(self, term):
+        self.term = term
+
+    def __repr__(self):
+        return 'Term(%r)' % self.term
+
+    def estimate(self, index):
+        return index.docFreq(self.term)
+
+    def cursor(self, index):
+        return index.cursor(self.term)
+
+    def evaluate(self, index):
+        return [docNo for docNo, _ in index.postings(self.term)]
+
+    def positiveTerms(self):
+        return [self.term]
+
+    def key(self):
+        return ('term', self.term)
+
+class Or(Node):
+    '''
+    Disjonction de sous-requêtes (opérateur OR)
+    '''
+
+    def __init__(self, children):
+        self.children = children
+
+    def __repr__(self):
+        return 'Or(%r)' % self.children
+
+    def estimate(self, index):
+        return sum(child.estimate(index) for child in self.children)
+
+    def evaluate(self, index):
+        return union([child.evaluate(index) for child in self.children])
+
+    def positiveTerms(self):
+        return [term for child in self.children for term in child.positiveTerms()]
+
+    def key(self):
+        return ('or', tuple(sorted(child.key() for child in self.children)))
+
+    def expand(self, index):
+        return Or([child.expand(index) for child in self.children])
+
+class Bool(Node):
+    '''
+    Suite de clauses obligatoires ('+' ou AND), facultatives et exclues ('-' ou NOT)
+    S'il y a des clauses obligatoires, les clauses facultatives ne servent qu'à l'affichage (et au classement),
+    sinon au moins une clause facultative doit être satisfaite
+    '''
+
+    def __init__(self, must, should, mustNot):
+        self.must = must
+        self.should = should
+        self.mustNot = mustNot
+
+    def __repr__(self):
+        return 'Bool(must=%r, should=%r, mustNot=%r)' % (self.must, self.should, self.mustNot)
+
+    def estimate(self, index):
+        if self.must:
+            return min(child.estimate(index) for child in self.must)
+        if self.should:
+            return sum(child.estimate(index) for child in self.should)
+        return index.nDocs
+
+    def evaluate(self, index):
+        if self.must:
+            result = intersectNodes(self.must, index)
+        elif self.should:
+            result = union([child.evaluate(index) for child in self.should])
+        else:
+            # requête uniquement négative : on part de tous les documents
+            result = index.docNos()
+
+        for child in self.mustNot:
+            if not result:
+                break
+            result = difference(result, child.cursor(index))
+        return result
+
+    def positiveTerms(self):
+        return [term for child in self.must + self.should for term in child.positiveTerms()]
+
+    def key(self):
+        return ('bool', tuple(sorted(child.key() for child in self.must)),
+                tuple(sorted(child.key() for child in self.should)),
+                tuple(sorted(child.key() for child in self.mustNot)))
+
+    def expand(self, index):
+        return Bool([child.expand(index) for child in self.must], [child.expand(index) for child in self.should],
+                    [child.expand(index) for child in self.mustNot])
+
+class Phrase(Node):
+    '''
+    Expression exacte : des termes à des positions consécutives
+    Les positions comptent les lemmes indexés, les mots vides ne séparent donc pas les termes
+    '''
+
+    def __init__(self, terms):
+        self.terms = [Term(term) for term in terms]
+
+    def __repr__(self):
+        return 'Phrase(%r)' % [term.term for term in self.terms]
+
+    def estimate(self, index):
+        return min(term.estimate(index) for term in self.terms)
+
+    def evaluate(self, index):
+        requirePositions(index)
+        # les positions ne sont lues que pour les documents contenant tous les termes
+        docNos = intersectNodes(self.terms, index)
+        if not docNos:
+            return docNos
+        positions = {term.term: index.positions(term.term, docNos) for term in self.terms}
+        return [docNo for docNo in docNos
+                if phraseMatch([positions[term.term][docNo] for term in self.terms])]
+
+    def positiveTerms(self):
+        return [term.term for term in self.terms]
+
+    def key(self):
+        return ('phrase', tuple(term.term for term in self.terms))
+
+class Near(Node):
+    '''
+    Deux termes séparés d'au plus k positions (opérateur NEAR/k), dans n'importe quel ordre
+    '''
+
+    def __init__(self, first, second, distance):
+        self.first = first
+        self.second = second
+        self.distance = distance
+
+    def __repr__(self):
+        return 'Near(%r, %r, %d)' % (self.first.term, self.second.term, self.distance)
+
+    def estimate(self, index):
+        return min(self.first.estimate(index), self.second.estimate(index))
+
+    def evaluate(self, index):
+        requirePositions(index)
+        docNos = intersectNodes([self.first, self.second], index)
+        if not docNos:
+            return docNos
+        first = index.positions(self.first.term, docNos)
+        second = index.positions(self.second.term, docNos)
+        return [docNo for docNo in docNos if nearMatch(first[docNo], second[docNo], self.distance)]
+
+    def positiveTerms(self):
+        return [self.first.term, self.second.term]
+
+    def key(self):
+        return ('near', tuple(sorted((self.first.term, self.second.term))), self.distance)
+
+class Wildcard(Node):
+    '''
+    Motif avec joker '*' : disjonction des termes du lexique correspondants, trouvés par une recherche de plage
+    dans le lexique trié (chap*) ou dans l'index permuterm (*dessus, ch*au)
+    '''
+
+    def __init__(self, pattern, limit=MAX_EXPANSIONS):
+        '''
+        :param pattern: Le motif, en minuscules
+        :param limit: Le nombre maximal de termes désignés par le motif
+        '''
+        self.pattern = pattern
+        self.limit = limit
+
+    def __repr__(self):
+        return 'Wildcard(%r)' % self.pattern
+
+    def key(self):
+        return ('wildcard', self.pattern)
+
+    def expand(self, index):
+        terms = index.expand(self.pattern, self.limit)
+        if terms is None:
+            raise QueryError("Le motif %s est trop peu sélectif : précisez ses parties fixes" % self.pattern)
+        if len(terms) > self.limit:
+            raise QueryError("Le motif %s désigne plus de %d termes" % (self.pattern, self.limit))
+        # un motif sans correspondance est une disjonction vide : aucun document
+        return Term(terms[0]) if len(terms) == 1 else Or([Term(term) for term in terms])
+
+    def estimate(self, index):
+        return self.expand(index).estimate(index)
+
+    def evaluate(self, index):
+        return self.expand(index).evaluate(index)
+
+    def positiveTerms(self):
+        raise QueryError("Motif non développé : " + self.pattern)
+
+class Fuzzy(Term):
+    '''
+    Terme du mode approché : s'il est absent du lexique, il est remplacé par la disjonction des termes
+    à une distance d'édition d'au plus maxDistance, retrouvés à l'aide de l'index des k-grammes
+    Dans une expression ou un NEAR/k, il reste un terme exact
+    '''
+
+    def __init__(self, term, maxDistance, limit=MAX_EXPANSIONS):
+        '''
+        :param term: Le terme normalisé
+        :param maxDistance: La distance d'édition maximale
+        :param limit: Le nombre maximal de termes proches retenus
+        '''
+        Term.__init__(self, term)
+        self.maxDistance = maxDistance
+        self.limit = limit
+
+    def __repr__(self):
+        return 'Fuzzy(%r, %d)' % (self.term, self.maxDistance)
+
+    def key(self):
+        return ('fuzzy', self.term, self.maxDistance)
+
+    def expand(self, index):
+        if index.docFreq(self.term):
+            return Term(self.term)
+        terms = index.fuzzy(self.term, self.maxDistance, self.limit)
+        return Term(terms[0]) if len(terms) == 1 else Or([Term(term) for term in terms])
+
+def tokenize(query):
+    '''
+    Découpage d'une requête en unités lexicales
+    :param query: La requête sous forme de String
+    :return: La liste des unités : expressions, parenthèses, préfixes '+' et '-', opérateurs et mots
+    :rtype: List
+    '''
+    return TOKEN.findall(query)
+
+class Parser:
+    '''
+    Analyseur descendant de la grammaire :
+        expr   := seq (OR seq)*
+        seq    := clause ((AND)? clause)*
+        clause := ('+' | '-' | NOT)? near
+        near   := atom (NEAR/k atom)?
+        atom   := mot | motif | '"' mots '"' | '(' expr ')'
+    '''
+
+    def __init__(self, tokens, normalize, analyze, maxExpansions=MAX_EXPANSIONS, fuzzy=0):
+        '''
+        :param tokens: Les unités lexicales renvoyées par tokenize
+        :param normalize: La fonction de normalisation des termes de la requête
+        :param analyze: La fonction qui transforme le texte d'une expression en liste de termes normalisés
+        :param maxExpansions: Le nombre maximal de termes désignés par un motif avec joker ou un terme approché
+        :param fuzzy: La distance d'édition maximale du mode approché, 0 pour le désactiver
+        '''
+        self.tokens = tokens
+        self.position = 0
+        self.normalize = normalize
+        self.analyze = analyze
+        self.maxExpansions = maxExpansions
+        self.fuzzy = fuzzy
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def operator(self):
+        return OPERATORS.get(self.peek())
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise QueryError("Requête vide")
+        plan = self.expr()
+        if self.peek() is not None:
+            raise QueryError("Unité inattendue : " + self.peek())
+        return plan
+
+    def expr(self):
+        children = [self.seq()]
+        while self.operator() == 'OR':
+            self.take()
+            children.append(self.seq())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def seq(self):
+        must, should, mustNot = list(), list(), list()
+        clauses = list()
+        joined = False
+        while self.peek() is not None and self.peek() != ')' and self.operator() != 'OR':
+            if self.operator() == 'AND':
+                self.take()
+                if not clauses:
+                    raise QueryError("AND sans opérande gauche")
+                # l'opérande gauche d'un AND devient obligatoire, sauf s'il est exclu
+                if clauses[-1][0] == 'should':
+                    clauses[-1] = ('must', clauses[-1][1])
+                joined = True
+                continue
+            occur, node = self.clause()
+            if joined and occur == 'should':
+                occur = 'must'
+            joined = False
+            clauses.append((occur, node))
+        if joined:
+            raise QueryError("AND sans opérande droit")
+        if not clauses:
+            raise QueryError("Sous-requête vide")
+
+        for occur, node in clauses:
+            {'must': must, 'should': should, 'mustNot': mustNot}[occur].append(node)
+        if len(should) == 1 and not must and not mustNot:
+            return should[0]
+        return Bool(must, should, mustNot)
+
+    def clause(self):
+        token = self.peek()
+        occur = 'should'
+        if token == '+':
+            occur = 'must'
+            self.take()
+        elif token == '-' or self.operator() == 'NOT':
+            occur = 'mustNot'
+            self.take()
+        return occur, self.near()
+
+    def near(self):
+        node = self.atom()
+        match = NEAR.match(self.peek() or '')
+        if match is None:
+            return node
+        self.take()
+        other = self.atom()
+        if not isinstance(node, Term) or not isinstance(other, Term):
+            raise QueryError("NEAR/k ne s'applique qu'à deux termes simples")
+        if NEAR.match(self.peek() or ''):
+            raise QueryError("NEAR/k ne peut pas être enchaîné")
+        return Near(node, other, int(match.group(1)))
+
+    def atom(self):
+        token = self.take()
+        if token is None:
+            raise QueryError("Terme attendu en fin de requête")
+        if token == '(':
+            node = self.expr()
+            if self.take() != ')':
+                raise QueryError("Parenthèse fermante manquante")
+            return node
+        if token.startswith('"'):
+            if len(token) < 2 or not token.endswith('"'):
+                raise QueryError("Guillemet fermant manquant")
+            terms = self.analyze(token[1:-1])
+            if not terms:
+                raise QueryError("Expression vide : " + token)
+            return Term(terms[0]) if len(terms) == 1 else Phrase(terms)
+        if token in ('+', '-', ')') or token in OPERATORS or NEAR.match(token):
+            raise QueryError("Terme attendu à la place de : " + token)
+        if '*' in token:
+            # un motif porte sur les lemmes du lexique : il n'est pas lemmatisé
+            if not token.strip('*'):
+                raise QueryError("Motif sans lettre : " + token)
+            return Wildcard(token.lower(), self.maxExpansions)
+        if self.fuzzy:
+            return Fuzzy(self.normalize(token), self.fuzzy, self.maxExpansions)
+        return Term(self.normalize(token))
+
+def parseQuery(query, normalize=str.lower, analyze=None, maxExpansions=MAX_EXPANSIONS, fuzzy=0):
+    '''
+    Analyse d'une requête en un plan d'exécution
+    :param query: La requête sous forme de String
+    :param normalize: La fonction de normalisation des termes de la requête
+    :param analyze: La fonction qui transforme le texte d'une expression entre guillemets en liste de termes normalisés,
+                    par défaut chaque mot est normalisé
+    :param maxExpansions: Le nombre maximal de termes désignés par un motif avec joker ou un terme approché
+    :param fuzzy: La distance d'édition maximale du mode approché, 0 pour le désactiver
+    :return: La racine du plan (Term, Fuzzy, Wildcard, Phrase, Near, Or ou Bool)
+    '''
+    if analyze is None:
+        analyze = lambda text: [normalize(word) for word in text.split()]
+    return Parser(tokenize(query), normalize, analyze, maxExpansions, fuzzy).parse()
+
+def execute(plan, index):
+    '''
+    Évaluation d'un plan sur l'index et relevé des fréquences des termes positifs de la requête
+    :param plan: Le plan renvoyé par parseQuery
+    :param index: L'index ouvert avec moteurRI.loadIndex
+    :return: La liste des résultats (docNo, {terme: fréqLocale}) triée par docNo
+    :rtype: List
+    '''
+    plan = plan.expand(index)
+    docNos = plan.evaluate(index)
+    frequencies = {docNo: dict() for docNo in docNos}
+    # les termes positifs ne sont relus que pour les documents retenus
+    for term in dict.fromkeys(plan.positiveTerms()):
+        cursor = index.cursor(term)
+        for docNo in docNos:
+            cursor.skipTo(docNo)
+            if cursor.docNo is None:
+                break
+            if cursor.docNo == docNo:
+                frequencies[docNo][term] = cursor.freq
+    return [(docNo, frequencies[docNo]) for docNo in docNos]
+
+# paramètres du modèle BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+RANKINGS = ('none', 'bm25', 'tfidf')
+
+def topArgument(value):
+    '''
+    Lecture de l'option --top, le nombre de documents renvoyés avec un classement
+    :param value: La valeur donnée sur la ligne de commande
+    :return: Le nombre de documents, au moins 1
+    :rtype: int
+    :raise argparse.ArgumentTypeError: Si la valeur n'est pas un entier strictement positif
+    '''
+    try:
+        k = int(value)
+    except ValueError:
+        k = 0
+    if k < 1:
+        raise argparse.ArgumentTypeError("entier strictement positif attendu : " + value)
+    return k
+
+def collectionStats(index, terms):
+    '''
+    Statistiques de la collection nécessaires au classement
+    :param index: L'index ouvert avec moteurRI.loadIndex
+    :param terms: Les termes de la requête
+    :return: Le nombre de documents, le nombre moyen de lemmes par document et les fréquences documentaires {terme: df}
+    :rtype: tuple
+    '''
+    return index.nDocs, index.avgLength, {term: index.docFreq(term) for term in terms}
+
+def score(freqs, docLength, stats, ranking='bm25'):
+    '''
+    Score d'un document pour une requête
+    :param freqs: Les fréquences locales des termes de la requête dans le document {terme: fréqLocale}
+    :param docLength: Le nombre de lemmes du document
+    :param stats: Les statistiques renvoyées par collectionStats
+    :param ranking: Le modèle, 'bm25' ou 'tfidf'
+    :return: Le score du document
+    :rtype: float
+    '''
+    nDocs, avgLength, docFreqs = stats
+    total = 0.0
+    for term, tf in freqs.items():
+        df = docFreqs[term]
+        if ranking == 'bm25':
+            idf = math.log(1 + (nDocs - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * docLength / avgLength) if avgLength else BM25_K1
+            total += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        else:
+            total += (1 + math.log(tf)) * math.log(nDocs / df)
+    return total
+
+def topK(scored, k):
+    '''
+    Sélection des k meilleurs résultats à l'aide d'un tas borné à k éléments
+    :param scored: Un itérable de triplets (score, docNo, {terme: fréqLocale})
+    :param k: Le nombre de résultats à conserver
+    :return: Les k meilleurs triplets, par score décroissant puis par docNo croissant, aucun si k <= 0
+    :rtype: List
+    '''
+    if k <= 0:
+        return []
+    heap = list()
+    for entry in scored:
+        # à score égal, le plus petit docNo l'emporte : il est donc « plus grand » dans le tas minimum
+        item = (entry[0], -entry[1], entry[2])
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+    return [(itemScore, -negDocNo, freqs) for itemScore, negDocNo, freqs in sorted(heap, key=lambda item: item[:2], reverse=True)]
+
+def rank(plan, index, k=10, ranking='bm25', stats=None):
+    '''
+    Évaluation d'un plan et classement des documents retenus
+    :param plan: Le plan renvoyé par parseQuery
+    :param index: L'index ouvert avec moteurRI.loadIndex
+    :param k: Le nombre de résultats à renvoyer
+    :param ranking: Le modèle, 'bm25' ou 'tfidf'
+    :param stats: Les statistiques de la collection, calculées sur l'index si elles ne sont pas fournies
+    :return: La liste des k meilleurs résultats (score, docNo, {terme: fréqLocale})
+    :rtype: List
+    '''
+    plan = plan.expand(index)
+    results = execute(plan, index)
+    if stats is None:
+        stats = collectionStats(index, dict.fromkeys(plan.positiveTerms()))
+    scored = ((score(freqs, index.docLength(docNo), stats, ranking), docNo, freqs) for docNo, freqs in results)
+    return topK(scored, k)
+
+class ResultCache:
+    '''
+    Cache LRU des résultats des requêtes, indexé par la forme normalisée du plan (Node.key)
+    Il est borné en nombre d'entrées et en taille estimée, et vidé dès que la génération de l'index change
+    '''
+
+    def __init__(self, maxEntries=1000, maxBytes=64 * 1024 * 1024):
+        '''
+        :param maxEntries: Le nombre maximal de requêtes conservées
+        :param maxBytes: La taille estimée maximale des résultats conservés, en octets
+        '''
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, generation):
+        '''
+        Lecture des résultats d'une requête
+        :param key: La clé de la requête
+        :param generation: La génération de l'index interrogé, le cache est vidé si elle a changé
+        :return: Les résultats, None s'ils ne sont pas dans le cache
+        '''
+        if generation != self.generation:
+            if self.entries:
+                self.invalidations += 1
+            self.clear()
+            self.generation = generation
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, results):
+        '''
+        Ajout des résultats d'une requête, en retirant les moins récemment utilisés au-delà des bornes
+        :param key: La clé de la requête
+        :param results: Les résultats, qui ne doivent plus être modifiés
+        '''
+        size = estimateSize(results)
+        if size > self.maxBytes or self.maxEntries <= 0:
+            return
+        if key in self.entries:
+            self.size -= self.entries.pop(key)[1]
+        self.entries[key] = (results, size)
+        self.size += size
+        while len(self.entries) > self.maxEntries or self.size > self.maxBytes:
+            _, (_, evictedSize) = self.entries.popitem(last=False)
+            self.size -= evictedSize
+            self.evictions += 1
+
+    def clear(self):
+        '''
+        Suppression de tous les résultats
+        '''
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self):
+        '''
+        Statistiques d'utilisation du cache
+        :rtype: dict
+        '''
+        lookups = self.hits + self.misses
+        return {'entrees': len(self.entries), 'octets': self.size, 'succes': self.hits, 'echecs': self.misses,
+                'tauxSucces': self.hits / lookups if lookups else 0.0, 'evictions': self.evictions,
+                'invalidations': self.invalidations}
+
+def estimateSize(results):
+    '''
+    Estimation de la mémoire occupée par une liste de résultats
+    :param results: La liste des résultats (score, docNo, {terme: fréqLocale})
+    :return: La taille approximative en octets
+    :rtype: int
+    '''
+    # liste, triplet, entiers et flottant, dictionnaire et ses entrées (les termes sont partagés avec l'index)
+    return 56 + sum(8 + 64 + 56 + 232 + 24 * len(freqs) for _, _, freqs in results)
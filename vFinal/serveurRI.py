@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+###############################
+###########SYNOPSIS############
+###############################
+#
+# Auteurs : Sotiria BAMPATZANI
+#           Morgane DEHARENG
+#
+# But : service HTTP de recherche (asyncio) sur un index construit avec la commande index de moteurRI.py
+#
+# Usage : python3 serveurRI.py [--index DOSSIER] [--hote ADRESSE] [--port PORT] [--ranking bm25]
+#
+# Routes : GET /search?q=requête[&top=k][&ranking=bm25|tfidf|none][&fuzzy=distance][&extraits=1]
+#                          résultats classés au format JSON, comme une ligne de la commande batch
+#          GET /status     génération de l'index servi et nombre de requêtes traitées
+###############################
+
+import sys
+import json
+import time
+import signal
+import traceback
+import asyncio
+import argparse
+import collections
+import concurrent.futures
+from urllib.parse import urlsplit, parse_qs
+import indexRI
+import requeteRI
+import moteurRI
+import partitionRI
+
+# taille maximale de la ligne de requête et des en-têtes HTTP
+MAX_HEADER = 65536
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error'}
+
+class SearchServer:
+    '''
+    Serveur de recherche partageant entre toutes les connexions un index ouvert une seule fois et un lemmatiseur
+    La boucle d'événements ne fait qu'aiguiller les requêtes : la lemmatisation des termes est confiée au fil
+    du lemmatiseur, l'évaluation, le classement et les extraits au fil d'évaluation. Chaque requête garde
+    la génération de l'index qu'elle a commencé à interroger ; une génération remplacée sur le disque n'est
+    fermée qu'à la fin de ses dernières requêtes
+    '''
+
+    def __init__(self, args):
+        '''
+        :param args: Les arguments de la ligne de commande
+        '''
+        self.args = args
+        self.index = moteurRI.loadIndex(args.index, args.processus)
+        self.lemmatizer, self.cachePath = moteurRI.openLemmatizer(args, moteurRI.queryBackend(self.index))
+        # un seul fil : le lemmatiseur et son cache ne sont pas prévus pour des appels simultanés
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        # un seul fil d'évaluation : les lectures de l'index se succèdent, le cache des résultats reste dans la boucle
+        self.evaluator = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        # nombre de requêtes en cours par index ouvert, et générations remplacées en attente de fermeture
+        self.inFlight = collections.Counter()
+        self.retired = list()
+        self.slots = asyncio.Semaphore(args.concurrence)
+        self.resultCache = moteurRI.openResultCache(args)
+        self.nQueries = 0
+        self.nReloads = 0
+
+    def parse(self, query, fuzzy, tokenizer, lemmatizer):
+        '''
+        Analyse et lemmatisation d'une requête, exécutée dans le fil du lemmatiseur
+        :param query: La requête
+        :param fuzzy: La distance d'édition maximale du mode approché, 0 pour le désactiver
+        :param tokenizer: Le découpage en tokens de l'index servi
+        :param lemmatizer: Le lemmatiseur de la normalisation de l'index servi
+        :return: Le plan d'exécution
+        :rtype: requeteRI.Node
+        '''
+        return moteurRI.word2index(query, lemmatizer, fuzzy, tokenizer)
+
+    def acquire(self):
+        '''
+        Réservation de l'index servi pour une requête, avec le lemmatiseur de sa normalisation
+        :return: L'index et le lemmatiseur, à libérer avec release
+        :rtype: tuple
+        '''
+        self.inFlight[self.index] += 1
+        return self.index, self.lemmatizer
+
+    def release(self, index):
+        '''
+        Fin d'une requête sur un index : une génération remplacée est fermée après sa dernière requête
+        :param index: L'index réservé avec acquire
+        '''
+        self.inFlight[index] -= 1
+        if self.inFlight[index] <= 0:
+            del self.inFlight[index]
+            if index in self.retired:
+                self.retired.remove(index)
+                self.close(index)
+
+    def close(self, index):
+        '''
+        Fermeture d'une génération remplacée hors de la boucle d'événements : l'arrêt des processus d'évaluation
+        d'un index partitionné attend leur fin
+        :param index: L'index à fermer
+        '''
+        asyncio.get_running_loop().run_in_executor(None, index.close)
+
+    async def evaluate(self, plan, index, ranking, k):
+        '''
+        Évaluation d'un plan hors de la boucle d'événements, à l'aide du cache des résultats, voir moteurRI.evaluatePlan
+        :param plan: Le plan d'exécution
+        :param index: L'index réservé pour la requête
+        :param ranking: Le modèle de classement
+        :param k: Le nombre de documents à renvoyer avec un classement
+        :return: La liste des résultats (score, docNo, {mot: fréqLocale}), partagée avec le cache
+        :rtype: List
+        '''
+        # une requête commencée sur une génération remplacée ne lit ni n'écrit le cache : sa génération
+        # le viderait et le ramènerait en arrière, aux dépens des requêtes sur la nouvelle
+        cached = self.resultCache is not None and index is self.index
+        if cached:
+            key = moteurRI.resultKey(plan, ranking, k)
+            results = self.resultCache.get(key, index.generation)
+            if results is not None:
+                return results
+        loop = asyncio.get_running_loop()
+        if isinstance(index, partitionRI.PartitionedIndex):
+            # index partitionné : aucun fil n'attend les processus d'évaluation des partitions
+            if ranking != 'none':
+                results = await index.rankAsync(plan, k, ranking, self.evaluator)
+            else:
+                results = [(None, docNo, freqs) for docNo, freqs in await index.executeAsync(plan, self.evaluator)]
+        else:
+            results = await loop.run_in_executor(self.evaluator, moteurRI.evaluatePlan, plan, index, ranking, k)
+        # les résultats d'une génération remplacée pendant l'évaluation ne vont pas dans le cache de la nouvelle
+        if cached and index is self.index:
+            self.resultCache.put(key, results)
+        return results
+
+    async def search(self, params):
+        '''
+        Réponse à la route /search
+        :param params: Les paramètres de l'URL {nom: [valeurs]}
+        :return: Le code HTTP et le corps de la réponse
+        :rtype: tuple
+        '''
+        query = params.get('q', [''])[0].strip()
+        if not query:
+            return 400, {'erreur': "Paramètre q manquant"}
+        ranking = params.get('ranking', [self.args.ranking])[0]
+        if ranking not in requeteRI.RANKINGS:
+            return 400, {'erreur': "Classement inconnu : " + ranking}
+        try:
+            k = int(params.get('top', [self.args.top])[0])
+            fuzzy = int(params.get('fuzzy', [self.args.fuzzy])[0])
+            snippets = bool(int(params.get('extraits', [0])[0]))
+        except ValueError:
+            return 400, {'erreur': "Paramètre top, fuzzy ou extraits invalide"}
+        if k < 1:
+            return 400, {'erreur': "Paramètre top inférieur à 1"}
+
+        async with self.slots:
+            start = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            # la même génération sert à toute la requête, même si l'index est rechargé entre-temps
+            index, lemmatizer = self.acquire()
+            try:
+                try:
+                    plan = await loop.run_in_executor(self.executor, self.parse, query, fuzzy,
+                                                      moteurRI.queryTokenizer(index), lemmatizer)
+                    results = await self.evaluate(plan, index, ranking, k)
+                except requeteRI.QueryError as error:
+                    return 400, {'requete': query, 'erreur': str(error)}
+                self.nQueries += 1
+                # les extraits lisent les fichiers du corpus : hors de la boucle eux aussi
+                record = await loop.run_in_executor(self.evaluator, moteurRI.resultRecord, query, results, index,
+                                                    time.perf_counter() - start, snippets)
+            finally:
+                self.release(index)
+        record['generation'] = index.generation
+        return 200, record
+
+    def status(self):
+        '''
+        Réponse à la route /status
+        :return: Le code HTTP et le corps de la réponse
+        :rtype: tuple
+        '''
+        return 200, {'index': self.args.index, 'generation': self.index.generation, 'documents': self.index.nDocs,
+                     'termes': len(self.index), 'requetes': self.nQueries, 'rechargements': self.nReloads,
+                     'cache': self.resultCache.stats() if self.resultCache is not None else None}
+
+    async def route(self, method, target):
+        '''
+        Aiguillage d'une requête HTTP
+        :param method: La méthode HTTP
+        :param target: La cible de la requête (chemin et paramètres)
+        :return: Le code HTTP et le corps de la réponse
+        :rtype: tuple
+        '''
+        if method != 'GET':
+            return 405, {'erreur': "Seule la méthode GET est acceptée"}
+        url = urlsplit(target)
+        if url.path == '/search':
+            return await self.search(parse_qs(url.query))
+        if url.path == '/status':
+            return self.status()
+        return 404, {'erreur': "Route inconnue : " + url.path}
+
+    async def handle(self, reader, writer):
+        '''
+        Traitement d'une connexion HTTP/1.1, éventuellement maintenue pour plusieurs requêtes
+        :param reader: Le flux de lecture de la connexion
+        :param writer: Le flux d'écriture de la connexion
+        '''
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    await self.respond(writer, 400, {'erreur': "Requête HTTP mal formée"}, False)
+                    break
+                headers = dict()
+                for line in lines[1:]:
+                    name, _, value = line.partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                # le corps éventuel est ignoré
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    # fin de la requête inconnue : la connexion ne peut pas servir à la suivante
+                    await self.respond(writer, 400, {'erreur': "En-tête Content-Length invalide"}, False)
+                    break
+                if length:
+                    try:
+                        await reader.readexactly(length)
+                    except asyncio.IncompleteReadError:
+                        break
+                connection = headers.get('connection', '').lower()
+                keepAlive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+                try:
+                    status, body = await self.route(method, target)
+                except Exception as error:
+                    # erreur imprévue : réponse 500, détail dans le journal, le serveur continue
+                    traceback.print_exc(file=sys.stderr)
+                    status, body = 500, {'erreur': "Erreur interne : %s" % type(error).__name__}
+                await self.respond(writer, status, body, keepAlive)
+                if not keepAlive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, body, keepAlive):
+        '''
+        Envoi d'une réponse JSON
+        :param writer: Le flux d'écriture de la connexion
+        :param status: Le code HTTP
+        :param body: Le corps de la réponse, sérialisé en JSON
+        :param keepAlive: La connexion reste ouverte après la réponse
+        '''
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        head = ("HTTP/1.1 %d %s\r\nContent-Type: application/json; charset=utf-8\r\nContent-Length: %d\r\n"
+                "Connection: %s\r\n\r\n" % (status, REASONS[status], len(payload),
+                                             'keep-alive' if keepAlive else 'close'))
+        writer.write(head.encode('latin-1') + payload)
+        await writer.drain()
+
+    async def reload(self):
+        '''
+        Ouverture de la nouvelle génération de l'index si elle a changé sur le disque
+        L'index et le lemmatiseur sont ouverts hors de la boucle d'événements (un index partitionné y lance
+        ses processus d'évaluation), puis remplacent les anciens dans la boucle, entre deux requêtes.
+        L'ancien index est fermé aussitôt s'il n'a plus de requête en cours, sinon à la fin de la dernière
+        :return: L'index a été rechargé
+        :rtype: bool
+        '''
+        meta = indexRI.readMeta(self.args.index)
+        if meta is None or meta.get('generation') == self.index.generation:
+            return False
+        loop = asyncio.get_running_loop()
+        try:
+            index = await loop.run_in_executor(None, moteurRI.loadIndex, self.args.index, self.args.processus)
+        except (OSError, ValueError) as error:
+            # génération en cours de remplacement ou d'un format dépassé : nouvel essai au prochain tour
+            print("Rechargement de l'index impossible :", error, file=sys.stderr)
+            return False
+        lemmatizer, cachePath = self.lemmatizer, self.cachePath
+        backend = moteurRI.queryBackend(index)
+        if backend != lemmatizer.backend:
+            # index reconstruit avec une autre normalisation : lemmatiseur et cache des lemmes propres à celle-ci,
+            # l'ancien cache étant sauvegardé dans le fil du lemmatiseur
+            if lemmatizer.cache.dirty:
+                self.executor.submit(lemmatizer.cache.save, cachePath)
+            lemmatizer, cachePath = await loop.run_in_executor(None, moteurRI.openLemmatizer, self.args, backend)
+        previous = self.index
+        self.index, self.lemmatizer, self.cachePath = index, lemmatizer, cachePath
+        if previous in self.inFlight:
+            self.retired.append(previous)
+        else:
+            self.close(previous)
+        self.nReloads += 1
+        print("Index rechargé : génération", index.generation, file=sys.stderr)
+        return True
+
+    async def watch(self):
+        '''
+        Surveillance périodique de l'index sur le disque et sauvegarde du cache des lemmes
+        '''
+        while True:
+            await asyncio.sleep(self.args.rechargement)
+            await self.reload()
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.saveCache)
+
+    def saveCache(self):
+        '''
+        Sauvegarde du cache des lemmes s'il a appris de nouveaux tokens, dans le fil du lemmatiseur
+        '''
+        if self.lemmatizer.cache.dirty:
+            self.lemmatizer.cache.save(self.cachePath)
+
+    async def serve(self):
+        '''
+        Écoute des connexions jusqu'à l'arrêt du serveur par SIGINT ou SIGTERM
+        '''
+        server = await asyncio.start_server(self.handle, self.args.hote, self.args.port, limit=MAX_HEADER)
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                # Windows : KeyboardInterrupt interrompt asyncio.run
+                pass
+        watcher = asyncio.ensure_future(self.watch()) if self.args.rechargement > 0 else None
+        print("Écoute sur http://%s:%d - index %s, génération %d"
+              % (self.args.hote, self.args.port, self.args.index, self.index.generation), file=sys.stderr)
+        async with server:
+            await stop.wait()
+        if watcher is not None:
+            watcher.cancel()
+        await loop.run_in_executor(self.executor, self.saveCache)
+        self.executor.shutdown()
+        self.evaluator.shutdown()
+        for index in self.retired + [self.index]:
+            await loop.run_in_executor(None, index.close)
+
+def parseArgs(argv=None):
+    '''
+    Analyse de la ligne de commande
+    :param argv: La liste des arguments, sys.argv par défaut
+    :return: Les arguments analysés
+    :rtype: argparse.Namespace
+    '''
+    parser = argparse.ArgumentParser(description="Service HTTP de recherche sur un index construit par moteurRI.py")
+    parser.add_argument('--index', default='indexInverse', help="dossier de l'index")
+    parser.add_argument('--lemma-cache', help="fichier du cache des lemmes (par défaut celui de la "
+                                                   "normalisation de l'index, voir moteurRI.lemmaCachePath)")
+    parser.add_argument('--lemma-cache-size', type=int, default=100000,
+                        help="nombre maximal de tokens dans le cache des lemmes")
+    parser.add_argument('--hote', default='127.0.0.1', help="adresse d'écoute")
+    parser.add_argument('--port', type=int, default=8080, help="port d'écoute")
+    parser.add_argument('--ranking', choices=requeteRI.RANKINGS, default='bm25',
+                        help="classement par défaut, modifiable par le paramètre ranking de l'URL")
+    parser.add_argument('--top', type=requeteRI.topArgument, default=10, help="nombre de documents renvoyés par défaut")
+    parser.add_argument('--fuzzy', type=int, default=0, metavar='DISTANCE',
+                        help="distance d'édition par défaut du mode approché, modifiable par le paramètre fuzzy de l'URL")
+    parser.add_argument('--cache-requetes', type=int, default=1000,
+                        help="nombre maximal de requêtes dont les résultats sont conservés (0 pour désactiver le cache)")
+    parser.add_argument('--cache-octets', type=int, default=64 * 1024 * 1024,
+                        help="taille estimée maximale des résultats conservés, en octets")
+    parser.add_argument('--processus', type=int, default=0,
+                        help="nombre de processus d'évaluation d'un index partitionné (0 pour un par partition)")
+    parser.add_argument('--concurrence', type=int, default=64, help="nombre maximal de requêtes traitées simultanément")
+    parser.add_argument('--rechargement', type=float, default=2.0,
+                        help="intervalle en secondes de la surveillance de l'index sur le disque (0 pour la désactiver)")
+    return parser.parse_args(argv)
+
+# main
+if __name__ == "__main__":
+    args = parseArgs()
+    if indexRI.readMeta(args.index) is None:
+        print("Index introuvable, lancez d'abord la commande index de moteurRI.py :", args.index)
+        sys.exit(1)
+
+    async def main():
+        try:
+            server = SearchServer(args)
+        except ValueError as error:
+            print(error, "- reconstruisez l'index avec la commande index --full de moteurRI.py")
+            return
+        await server.serve()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    print("\nDone")